@@ -44,10 +44,15 @@ INSTALLED_APPS = [
     'user',
     'book',
     'order',
+    'job',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -91,6 +96,77 @@ DATABASES = {
 }
 
 
+# Cache
+# Replica pins, rankings and reference table versions are shared between
+# processes through the default cache. Set MEMCACHED_LOCATION to
+# host:port of a memcached server, without it every process has its own
+# local memory cache, which REQUIRE_SHARED_CACHE rejects at startup.
+# Compressed response bodies go to a separate per-process 'compression'
+# cache, so they never evict shared entries.
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+CACHES['compression'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'compression',
+    'OPTIONS': {'MAX_ENTRIES': 256},
+}
+REQUIRE_SHARED_CACHE = os.environ.get(
+    'REQUIRE_SHARED_CACHE', str(not DEBUG)
+) in ('1', 'True', 'true')
+
+
+# Read replicas
+# Set DB_REPLICA_HOSTS to comma separated host[:port] of streaming
+# replicas of the default database to serve read-only API actions from
+# them. After a write a user reads from the primary for
+# REPLICA_STICKY_SECONDS to see their own changes, pins are kept in the
+# default cache, which must be shared by all processes for this to hold.
+# Replicas more than REPLICA_MAX_LAG seconds behind are skipped, lag is
+# checked every REPLICA_LAG_CHECK_INTERVAL seconds.
+
+DATABASE_REPLICAS = []
+for index, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        HOST=host,
+        PORT=port,
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 30))
+REPLICA_LAG_CHECK_INTERVAL = 5.0
+
+
+# Reference cache
+# Every process keeps up to REFERENCE_CACHE_SIZE genres, authors,
+# languages, bookshelves and publishers each in memory. Changes made by
+# other processes are noticed through a version in the default cache,
+# checked every REFERENCE_CACHE_CHECK_INTERVAL seconds. Rows are dropped
+# REFERENCE_CACHE_TTL seconds after they were cached in any case.
+
+REFERENCE_CACHE_SIZE = int(os.environ.get('REFERENCE_CACHE_SIZE', 1000))
+REFERENCE_CACHE_CHECK_INTERVAL = 1.0
+REFERENCE_CACHE_TTL = float(os.environ.get('REFERENCE_CACHE_TTL', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -138,4 +214,147 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # FastJSONRenderer/FastJSONParser use orjson when it is installed.
+    # Swap them for rest_framework's JSONRenderer/JSONParser to go back
+    # to the stdlib json implementation.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Also turns violations of database constraints into API errors.
+    'EXCEPTION_HANDLER': 'core.exceptions.exception_handler',
+}
+
+# Cart reservations
+# Cart items older than this release their reserved stock when
+# `manage.py expire_carts` runs.
+
+CART_RESERVATION_TTL_MINUTES = int(
+    os.environ.get('CART_RESERVATION_TTL_MINUTES', 24 * 60)
+)
+
+
+# Response compression
+# Responses smaller than COMPRESSION_MIN_SIZE bytes are not compressed.
+# Compressed bodies up to COMPRESSION_CACHE_MAX_SIZE bytes are kept in
+# the COMPRESSION_CACHE_ALIAS cache, set it to '' to disable caching.
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_CACHE_ALIAS = os.environ.get(
+    'COMPRESSION_CACHE_ALIAS', 'compression'
+)
+COMPRESSION_CACHE_MAX_SIZE = 1024 * 1024
+COMPRESSION_CACHE_TIMEOUT = 60 * 60
+
+
+# Query instrumentation
+# Adds Server-Timing headers and per-request query logs. Queries repeated
+# QUERY_INSTRUMENTATION_DUPLICATES times in one request are logged as
+# likely N+1 problems.
+
+QUERY_INSTRUMENTATION = os.environ.get('QUERY_INSTRUMENTATION') == '1'
+QUERY_INSTRUMENTATION_DUPLICATES = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
+
+
+# Deferred work
+# Work such as book rating recalculation runs after the writing
+# transaction commits. With DEFERRED_TASKS_DELAY > 0 it runs in a
+# background thread every DEFERRED_TASKS_DELAY seconds instead, which
+# coalesces bursts from many requests, and once more at exit. Schedule the
+# recompute_ratings job to catch up work lost to errors or killed
+# processes.
+
+DEFERRED_TASKS_DELAY = float(os.environ.get('DEFERRED_TASKS_DELAY', 0))
+
+
+# Background jobs
+# `manage.py run_workers` polls for due jobs every JOBS_POLL_INTERVAL
+# seconds. Failed jobs are retried after JOBS_BACKOFF_BASE seconds,
+# doubling per attempt up to JOBS_BACKOFF_MAX. Workers renew the lease of
+# running jobs every JOBS_HEARTBEAT_INTERVAL seconds, jobs whose lease was
+# not renewed for JOBS_TIMEOUT seconds are assumed lost with their worker
+# and rerun.
+
+JOBS_POLL_INTERVAL = 1.0
+JOBS_BACKOFF_BASE = 10
+JOBS_BACKOFF_MAX = 3600
+JOBS_HEARTBEAT_INTERVAL = 60
+JOBS_TIMEOUT = 300
+
+
+# Review pagination
+# Reviews of a book are served REVIEWS_PAGE_SIZE at a time, clients may
+# ask for up to REVIEWS_MAX_PAGE_SIZE with ?page_size=.
+
+REVIEWS_PAGE_SIZE = 20
+REVIEWS_MAX_PAGE_SIZE = 100
+
+
+# Book rankings
+# Rankings served by /api/book/books/popular/ hold RANKINGS_SIZE books,
+# overall and per genre, and are recomputed by `manage.py
+# refresh_rankings` or the refresh_rankings job. Books need
+# RANKINGS_MIN_REVIEWS reviews to be ranked by rating.
+
+RANKINGS_SIZE = 20
+RANKINGS_MIN_REVIEWS = 3
+RANKINGS_CACHE_TIMEOUT = 3600
+
+
+# Metrics
+# Set METRICS_DIR to a directory shared by all worker processes of a host
+# to have /metrics report totals of every process. Counters and
+# histograms of processes that exited are kept in an aggregate, their
+# gauges, and gauges of processes that did not write a snapshot for
+# METRICS_SNAPSHOT_TTL seconds, are left out.
+# /metrics is served to staff users, to requests from METRICS_ALLOWED_IPS
+# (comma separated) and to requests with "Authorization: Bearer
+# <METRICS_TOKEN>".
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1.0
+METRICS_SNAPSHOT_TTL = 3600
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip.strip()
+    for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',')
+    if ip.strip()
+]
+
+
+# Profiling
+# With PROFILING enabled, PROFILING_SAMPLE_RATE of requests are profiled
+# by sampling their stack every PROFILING_INTERVAL seconds. The last
+# PROFILING_BUFFER_SIZE profiles of requests slower than
+# PROFILING_SLOW_THRESHOLD_MS are kept per process and served to admins
+# at /profiles/.
+
+PROFILING = os.environ.get('PROFILING') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_INTERVAL = 0.005
+PROFILING_SLOW_THRESHOLD_MS = int(
+    os.environ.get('PROFILING_SLOW_THRESHOLD_MS', 500)
+)
+PROFILING_BUFFER_SIZE = 50
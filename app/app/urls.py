@@ -20,8 +20,13 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import metrics_view, profile_view, profiles_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('profiles/', profiles_view, name='profiles'),
+    path('profiles/<uuid:profile_id>/', profile_view, name='profile'),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
     path(
         'api/docs/',
@@ -31,4 +36,5 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/book/', include('book.urls')),
     path('api/order/', include('order.urls')),
+    path('api/job/', include('job.urls')),
 ]
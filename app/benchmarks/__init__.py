@@ -0,0 +1,17 @@
+"""
+Benchmark suites run with `manage.py benchmark <suite>`.
+
+Each suite module exposes ``run(rows, repeat)`` which seeds the throwaway
+benchmark database and returns a list of result dicts.
+"""
+import time
+
+
+def best_of(func, repeat):
+    """Call func repeat times and return the fastest run in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
@@ -0,0 +1,121 @@
+"""
+Benchmark throughput and latency of the API through the full Django stack.
+
+Requests go through the test client, so middleware, authentication,
+serializers and renderers all run, without a network or web server in
+the way. Writes run in a transaction that is rolled back, so every
+request sees the same data.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+
+from benchmarks import catalog
+from core.models import Book, OrderItem
+
+REQUESTS = 50
+CART_ITEMS = 10
+
+
+def percentile(timings, fraction):
+    """Return the value at fraction of sorted timings."""
+    index = min(int(len(timings) * fraction), len(timings) - 1)
+    return timings[index]
+
+
+def endpoints(book, user):
+    """Return (name, method, path, data, write) of benchmarked requests."""
+    return [
+        ('book_list', 'get', '/api/book/books/', None, False),
+        ('book_list_sparse', 'get',
+         '/api/book/books/?fields=id,title,price,rating', None, False),
+        ('book_detail', 'get', f'/api/book/books/{book.id}/', None, False),
+        ('book_reviews', 'get',
+         f'/api/book/books/{book.id}/reviews/', None, False),
+        ('review_create', 'post',
+         f'/api/book/books/{book.id}/create-review/',
+         {'value': 4, 'comment': 'Benchmark.'}, True),
+        ('cart_list', 'get', '/api/order/cart/', None, False),
+        ('cart_summary', 'get', '/api/order/cart/summary/', None, False),
+        ('cart_add', 'post', '/api/order/cart/',
+         {'book': book.id, 'quantity': 1}, True),
+        ('auth_token', 'post', '/api/user/token/',
+         {'email': user.email, 'password': catalog.PASSWORD}, False),
+    ]
+
+
+def measure(client, method, path, data, write, repeat):
+    """Return latencies of every request and the best round's throughput."""
+    if method == 'get':
+        def call():
+            return client.get(path)
+    else:
+        def call():
+            return client.post(path, data, content_type='application/json')
+
+    def request():
+        if not write:
+            return call()
+        with transaction.atomic():
+            res = call()
+            transaction.set_rollback(True)
+        return res
+
+    res = request()
+    assert res.status_code < 300, f'{path}: {res.status_code}'
+
+    latencies = []
+    best_rps = 0.0
+    for _ in range(repeat):
+        round_start = time.perf_counter()
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            request()
+            latencies.append(time.perf_counter() - start)
+        best_rps = max(
+            best_rps,
+            REQUESTS / (time.perf_counter() - round_start),
+        )
+    latencies.sort()
+    return latencies, best_rps
+
+
+def run(rows, repeat):
+    """Benchmark catalog, review, cart and auth endpoints per book count."""
+    results = []
+    for count in rows:
+        Book.objects.all().delete()
+        catalog.generate(books=count)
+        book, *cart = Book.objects.order_by('id')[:CART_ITEMS + 1]
+        user = get_user_model().objects.create_user(
+            f'bench{count}@example.com',
+            catalog.PASSWORD,
+        )
+        # Created one by one, so the cart items reserve stock.
+        for item in cart:
+            OrderItem.objects.create(user=user, book=item)
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION=f'Token {token.key}',
+        )
+
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']):
+            for name, method, path, data, write in endpoints(book, user):
+                latencies, rps = measure(
+                    client, method, path, data, write, repeat
+                )
+                results.append({
+                    'name': name,
+                    'rows': count,
+                    'requests': len(latencies),
+                    'rps': round(rps, 1),
+                    'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+                    'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+                    'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+                })
+    return results
@@ -0,0 +1,287 @@
+"""
+Synthetic catalog generator used by `manage.py seed_catalog` and the
+HTTP benchmark suite.
+
+Everything is written with batched bulk inserts and no signal handlers
+run, so book ratings are computed from the generated reviews up front
+and cart and order items take their copies from the stock of their books
+like reservations do. Every chunk of books, and of users' carts and
+orders, commits on its own, so a large catalog is not one huge
+transaction. Generation is deterministic for a given seed.
+"""
+import random
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, When
+from django.utils import timezone
+
+from core import references
+from core.models import (
+    Author,
+    Book,
+    BookShelf,
+    Genre,
+    Language,
+    LikedItem,
+    Order,
+    OrderItem,
+    OwnedBook,
+    Publisher,
+    Review,
+    recompute_review_stats,
+)
+
+PASSWORD = 'benchpass123'
+
+ATTRIBUTES = {
+    'genres': Genre,
+    'authors': Author,
+    'languages': Language,
+    'bookshelves': BookShelf,
+    'publishers': Publisher,
+}
+
+
+def batched(iterable, size):
+    """Yield lists of up to size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, objs, batch_size):
+    """Bulk insert objs in batches and return the number of rows."""
+    count = 0
+    for batch in batched(objs, batch_size):
+        model.objects.bulk_create(batch)
+        count += len(batch)
+    return count
+
+
+def new_ids(model, after_id, count):
+    """Return ids of the count rows inserted after after_id."""
+    return list(
+        model.objects.filter(id__gt=after_id)
+        .order_by('id')
+        .values_list('id', flat=True)[:count]
+    )
+
+
+def last_id(model):
+    """Return the largest id of model, or 0 for an empty table."""
+    return model.objects.order_by('-id').values_list('id', flat=True) \
+        .first() or 0
+
+
+def reserve(quantities):
+    """Take quantities, a dict by book id, from stock of the books."""
+    reserved = Case(
+        *[When(id=book_id, then=quantity)
+          for book_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    Book.objects.filter(id__in=quantities).update(
+        available_quantity=F('available_quantity') - reserved,
+    )
+
+
+def generate_books(rng, batch_start, size, user_ids, attr_ids,
+                   review_count, batch_size, counts):
+    """Insert size books with attributes, reviews and their statistics."""
+    values = [
+        [rng.randint(0, 5) for _ in range(review_count)]
+        for _ in range(size)
+    ]
+    after = last_id(Book)
+    counts['books'] += insert(Book, (
+        Book(
+            title=f'Book {batch_start + i}',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(1950, 1, 1)
+            + timedelta(days=rng.randrange(27000)),
+            available_quantity=rng.randrange(1000),
+            price=Decimal(rng.randrange(100, 10000)) / 100,
+            rating=(
+                round(Decimal(sum(ratings)) / len(ratings), 1)
+                if ratings else Decimal('0.0')
+            ),
+        )
+        for i, ratings in enumerate(values)
+    ), batch_size)
+    book_ids = new_ids(Book, after, size)
+
+    for name, ids in attr_ids.items():
+        through = getattr(Book, name).through
+        column = f'{ATTRIBUTES[name]._meta.model_name}_id'
+        counts['attribute_links'] += insert(through, (
+            through(book_id=book_id, **{column: attr_id})
+            for book_id in book_ids
+            for attr_id in rng.sample(ids, min(2, len(ids)))
+        ), batch_size)
+
+    counts['reviews'] += insert(Review, (
+        Review(
+            user_id=user_id,
+            book_id=book_id,
+            value=value,
+            comment='Generated review.',
+        )
+        for book_id, ratings in zip(book_ids, values)
+        for user_id, value in zip(
+            rng.sample(user_ids, review_count), ratings
+        )
+    ), batch_size)
+    recompute_review_stats(book_ids)
+
+
+def generate_orders(rng, user_ids, book_ids, cart_items, orders,
+                    items_per_order, batch_size, counts):
+    """Insert carts and paid orders of users, taking copies from stock.
+
+    Only the stock of the books drawn for these users is read.
+    """
+    # A user has one cart item per book, so carts and orders of a user
+    # are drawn from one sample and split: cart first, then each order.
+    per_user = min(cart_items + orders * items_per_order, len(book_ids))
+    drawn = [rng.sample(book_ids, per_user) for _ in user_ids]
+    stock = {}
+    for batch in batched({book_id for sample in drawn for book_id in sample},
+                         batch_size):
+        stock.update(
+            Book.objects.filter(id__in=batch)
+            .values_list('id', 'available_quantity')
+        )
+    samples = []
+    reserved = Counter()
+    for sample in drawn:
+        available = [
+            book_id for book_id in sample
+            if stock[book_id] > reserved[book_id]
+        ]
+        reserved.update(available)
+        samples.append(available)
+
+    after = last_id(OrderItem)
+    item_count = insert(OrderItem, (
+        OrderItem(user_id=user_id, book_id=book_id)
+        for user_id, sample in zip(user_ids, samples)
+        for book_id in sample
+    ), batch_size)
+    item_ids = iter(new_ids(OrderItem, after, item_count))
+    for batch in batched(sorted(reserved), batch_size):
+        reserve({book_id: reserved[book_id] for book_id in batch})
+
+    ordered = {}
+    after = last_id(Order)
+    order_count = insert(Order, (
+        Order(user_id=user_id, is_paid=True, paid_at=timezone.now())
+        for user_id in user_ids
+        for _ in range(orders)
+    ), batch_size)
+    order_ids = iter(new_ids(Order, after, order_count))
+    for sample in samples:
+        cart = min(cart_items, len(sample))
+        items = [next(item_ids) for _ in sample]
+        for start in range(cart, cart + orders * items_per_order,
+                           items_per_order):
+            ordered[next(order_ids)] = items[start:start + items_per_order]
+    counts['orders'] += order_count
+    counts['cart_items'] += item_count - sum(map(len, ordered.values()))
+
+    through = Order.ordered_items.through
+    insert(through, (
+        through(order_id=order_id, orderitem_id=item_id)
+        for order_id, items in ordered.items()
+        for item_id in items
+    ), batch_size)
+
+
+def generate(books, users=None, attributes=None, reviews_per_book=5,
+             cart_items=3, liked_items=3, owned_books=3, orders=1,
+             items_per_order=2, batch_size=5000, seed=0, log=None):
+    """Fill the database with a synthetic catalog and return row counts.
+
+    Every user gets cart_items, liked_items and owned_books random books
+    and orders paid orders of items_per_order books each, books out of
+    stock are left out of carts and orders. Users share the password
+    PASSWORD.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    users = users or max(books // 10, reviews_per_book, 1)
+    attributes = attributes or max(books // 50, 10)
+    counts = {}
+
+    User = get_user_model()
+    password = make_password(PASSWORD)
+    start = User.objects.count()
+    after = last_id(User)
+    counts['users'] = insert(User, (
+        User(
+            email=f'reader{start + i}@example.com',
+            name=f'Reader {start + i}',
+            password=password,
+        )
+        for i in range(users)
+    ), batch_size)
+    user_ids = new_ids(User, after, users)
+    log(f'{users} users')
+
+    attr_ids = {}
+    for name, model in ATTRIBUTES.items():
+        after = last_id(model)
+        insert(model, (
+            # names are unique, continue after earlier runs
+            model(name=f'{model.__name__} {after + i}')
+            for i in range(attributes)
+        ), batch_size)
+        attr_ids[name] = new_ids(model, after, attributes)
+    references.invalidate()
+    counts['attributes'] = attributes * len(ATTRIBUTES)
+    log(f'{attributes} of each book attribute')
+
+    review_count = min(reviews_per_book, len(user_ids))
+    counts.update(books=0, attribute_links=0, reviews=0)
+    for batch_start in range(0, books, batch_size):
+        with transaction.atomic():
+            generate_books(
+                rng, batch_start, min(batch_size, books - batch_start),
+                user_ids, attr_ids, review_count, batch_size, counts,
+            )
+        log(f'{min(batch_start + batch_size, books)} books')
+
+    all_book_ids = list(
+        Book.objects.order_by('id').values_list('id', flat=True)
+    )
+    for key, model, per_user in (
+        ('liked_items', LikedItem, liked_items),
+        ('owned_books', OwnedBook, owned_books),
+    ):
+        per_user = min(per_user, len(all_book_ids))
+        counts[key] = insert(model, (
+            model(user_id=user_id, book_id=book_id)
+            for user_id in user_ids
+            for book_id in rng.sample(all_book_ids, per_user)
+        ), batch_size)
+        log(f'{counts[key]} {key.replace("_", " ")}')
+
+    counts.update(cart_items=0, orders=0)
+    for chunk in batched(user_ids, batch_size):
+        with transaction.atomic():
+            generate_orders(
+                rng, chunk, all_book_ids, cart_items, orders,
+                items_per_order, batch_size, counts,
+            )
+    log(f'{counts["cart_items"]} cart items')
+    log(f'{counts["orders"]} orders')
+
+    return counts
@@ -0,0 +1,40 @@
+"""
+Benchmark FastJSONRenderer against DRF's JSONRenderer on the book list.
+"""
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import best_of
+from benchmarks.serializers import seed
+from core.models import Book
+from core.renderers import FastJSONRenderer
+from core.serializers import optimize_queryset
+from book.serializers import BookSerializer
+
+
+def run(rows, repeat):
+    """Time rendering of the /api/book/books/ payload for every row count."""
+    results = []
+    for count in rows:
+        seed(count)
+        queryset = optimize_queryset(
+            Book.objects.order_by('-id'),
+            BookSerializer()
+        )
+        data = BookSerializer(queryset, many=True).data
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        assert stock.render(data) == fast.render(data), 'output differs'
+
+        stock_time = best_of(lambda: stock.render(data), repeat)
+        fast_time = best_of(lambda: fast.render(data), repeat)
+        body_size = len(fast.render(data))
+        results.append({
+            'name': 'book_list_render',
+            'rows': count,
+            'bytes': body_size,
+            'stock_s': round(stock_time, 6),
+            'fast_s': round(fast_time, 6),
+            'stock_mb_per_s': round(body_size / stock_time / 1e6, 1),
+            'fast_mb_per_s': round(body_size / fast_time / 1e6, 1),
+            'speedup': round(stock_time / fast_time, 2),
+        })
+    return results
@@ -0,0 +1,103 @@
+"""
+Benchmark compiled list serializers against stock DRF list serializers.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import best_of
+from core.models import (
+    Author,
+    Book,
+    BookShelf,
+    Genre,
+    Language,
+    Publisher,
+    Review,
+)
+from core.serializers import optimize_queryset
+from book.serializers import BookSerializer, ReviewDetailSerializer
+
+
+def seed(count):
+    """Create count books, each with attributes and one review."""
+    Book.objects.all().delete()
+    attrs = {
+        'genres': Genre.objects.get_or_create(name='Fiction')[0],
+        'authors': Author.objects.get_or_create(name='Author')[0],
+        'languages': Language.objects.get_or_create(name='English')[0],
+        'bookshelves': BookShelf.objects.get_or_create(name='Classics')[0],
+        'publishers': Publisher.objects.get_or_create(name='Publisher')[0],
+    }
+    Book.objects.bulk_create(
+        Book(
+            title=f'Book {i}',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=10,
+            price=Decimal('5.50'),
+        )
+        for i in range(count)
+    )
+    book_ids = list(Book.objects.values_list('id', flat=True))
+    for name, attr in attrs.items():
+        through = getattr(Book, name).through
+        attr_column = f'{attr._meta.model_name}_id'
+        through.objects.bulk_create(
+            through(book_id=book_id, **{attr_column: attr.id})
+            for book_id in book_ids
+        )
+    user, _ = get_user_model().objects.get_or_create(
+        email='bench@example.com'
+    )
+    Review.objects.bulk_create(
+        Review(user=user, book_id=book_id, value=4, comment='Fine.')
+        for book_id in book_ids
+    )
+
+
+def compare(name, serializer_class, queryset, count, repeat):
+    """Time compiled and stock rendering of queryset."""
+    queryset = optimize_queryset(queryset, serializer_class())
+    items = list(queryset)
+    renderer = JSONRenderer()
+
+    def compiled():
+        return renderer.render(serializer_class(items, many=True).data)
+
+    def stock():
+        serializer = serializers.ListSerializer(
+            items,
+            child=serializer_class()
+        )
+        return renderer.render(serializer.data)
+
+    assert compiled() == stock(), f'{name} output differs'
+    stock_time = best_of(stock, repeat)
+    compiled_time = best_of(compiled, repeat)
+    return {
+        'name': name,
+        'rows': count,
+        'stock_s': round(stock_time, 6),
+        'compiled_s': round(compiled_time, 6),
+        'speedup': round(stock_time / compiled_time, 2),
+    }
+
+
+def run(rows, repeat):
+    """Run the serializer benchmarks for every row count."""
+    results = []
+    for count in rows:
+        seed(count)
+        results.append(compare(
+            'book_list', BookSerializer,
+            Book.objects.order_by('-id'), count, repeat
+        ))
+        results.append(compare(
+            'review_list', ReviewDetailSerializer,
+            Review.objects.order_by('-id'), count, repeat
+        ))
+    return results
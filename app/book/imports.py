@@ -0,0 +1,190 @@
+"""
+Bulk import of reviews.
+
+Reviews are read as a stream of rows, inserted in batches with one
+INSERT ... ON CONFLICT DO NOTHING RETURNING id each, so reviews a user
+already wrote for a book are skipped and the inserted ones are counted
+exactly, and ratings and review statistics of the
+affected books are recomputed once at the end with set-based updates.
+No review signal handlers run.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import sql
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import (
+    Book,
+    Review,
+    recompute_ratings,
+    recompute_review_stats,
+)
+
+
+class ImportAborted(ValueError):
+    """Reading rows failed, rows read before were imported."""
+
+    def __init__(self, message, counts):
+        super().__init__(message)
+        self.counts = counts
+
+
+def parse_jsonl(lines):
+    """Yield review rows of JSON lines."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode()
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def parse_csv(lines):
+    """Yield review rows of CSV lines with a header row."""
+    lines = (
+        line.decode() if isinstance(line, bytes) else line for line in lines
+    )
+    yield from csv.DictReader(lines)
+
+
+def clean_row(row):
+    """Return (user, book_id, value, comment, created_at) of row or None.
+
+    user is a user id or an email address.
+    """
+    try:
+        user = str(row['user']).strip()
+        book_id = int(row['book'])
+        value = int(row['value'])
+        created_at = row.get('created_at') or None
+        if created_at is not None:
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                return None
+            if timezone.is_naive(created_at):
+                created_at = timezone.make_aware(created_at)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+    if not user or not 0 <= value <= 5:
+        return None
+    return user, book_id, value, str(row.get('comment') or ''), created_at
+
+
+def resolve_users(keys):
+    """Return dict of user ids by the ids or emails in keys."""
+    User = get_user_model()
+    ids = {int(key) for key in keys if key.isdigit()}
+    emails = {key for key in keys if not key.isdigit()}
+    users = {
+        str(user_id): user_id
+        for user_id in User.objects.filter(id__in=ids)
+        .values_list('id', flat=True)
+    }
+    if emails:
+        users.update(
+            User.objects.filter(email__in=emails).values_list('email', 'id')
+        )
+    return users
+
+
+def insert_reviews(reviews):
+    """Insert reviews, skipping existing ones, and return number inserted.
+
+    Like bulk_create(ignore_conflicts=True), which can't tell which rows
+    were inserted.
+    """
+    if not reviews:
+        return 0
+    connection = connections[router.db_for_write(Review)]
+    fields = [
+        field for field in Review._meta.concrete_fields
+        if not field.primary_key
+    ]
+    query = sql.InsertQuery(Review, ignore_conflicts=True)
+    query.insert_values(fields, reviews)
+    [(statement, params)] = query.get_compiler(connection=connection) \
+        .as_sql()
+    pk = connection.ops.quote_name(Review._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{statement} RETURNING {pk}', params)
+        return len(cursor.fetchall())
+
+
+def import_reviews(rows, batch_size=5000, recompute_batch_size=1000):
+    """Insert review rows in batches and return counts of the import.
+
+    Rows are dicts with user (id or email), book (id), value, and
+    optionally comment and created_at. Invalid rows and rows of unknown
+    users or books are skipped, reviews that already exist are kept and
+    counted as duplicates.
+
+    Batches commit as they are inserted. Ratings and statistics of their
+    books are recomputed even when the import fails midway, and rows
+    that are not valid UTF-8 raise ImportAborted with the counts of the
+    rows imported before.
+    """
+    counts = {
+        'received': 0, 'imported': 0, 'duplicates': 0, 'skipped': 0,
+        'books': 0,
+    }
+    book_ids = set()
+    rows = iter(rows)
+    try:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            counts['received'] += len(batch)
+            cleaned = [row for row in map(clean_row, batch) if row]
+
+            users = resolve_users({row[0] for row in cleaned})
+            books = set(
+                Book.objects.filter(id__in={row[1] for row in cleaned})
+                .values_list('id', flat=True)
+            )
+            reviews = []
+            for user, book_id, value, comment, created_at in cleaned:
+                if user not in users or book_id not in books:
+                    continue
+                review = Review(
+                    user_id=users[user],
+                    book_id=book_id,
+                    value=value,
+                    comment=comment,
+                )
+                if created_at is not None:
+                    review.created_at = created_at
+                reviews.append(review)
+                book_ids.add(book_id)
+            counts['skipped'] += len(batch) - len(reviews)
+
+            with transaction.atomic():
+                imported = insert_reviews(reviews)
+            counts['imported'] += imported
+            counts['duplicates'] += len(reviews) - imported
+    except UnicodeDecodeError as exc:
+        raise ImportAborted(
+            f'Rows are not valid UTF-8: {exc}', counts
+        ) from exc
+    finally:
+        recompute(book_ids, recompute_batch_size)
+        counts['books'] = len(book_ids)
+    return counts
+
+
+def recompute(book_ids, batch_size):
+    """Recompute ratings and review statistics of imported books."""
+    book_ids = sorted(book_ids)
+    for start in range(0, len(book_ids), batch_size):
+        chunk = book_ids[start:start + batch_size]
+        with transaction.atomic():
+            recompute_ratings(chunk)
+            recompute_review_stats(chunk)
@@ -0,0 +1,185 @@
+"""
+Book popularity rankings.
+
+Rankings are computed in the background by refresh() and stored in the
+BookRanking table, overall and per genre. A refresh replaces a ranking
+in one transaction, so readers keep seeing the previous ranking until
+the new one is committed. Rendered rankings are cached with the time of
+the refresh they show. A refresh publishes its time in the shared cache
+when it commits, so every process serves the new ranking from then on,
+and readers only query the table for that time when the cache lost it.
+Rankings never refreshed are not cached.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from core import metrics
+from core.models import Book, BookRanking, LikedItem, OrderItem
+
+REFRESHED_KEY = 'rankings:refreshed:{}'
+
+
+def bestseller_scores(by_genre):
+    """Return (genre, book, copies sold) rows, best first per genre."""
+    fields = ['book__genres', 'book'] if by_genre else ['book']
+    return OrderItem.objects.filter(order__is_paid=True) \
+        .values_list(*fields).annotate(score=Sum('quantity')) \
+        .order_by(*fields[:-1], '-score', 'book')
+
+
+def most_liked_scores(by_genre):
+    """Return (genre, book, likes) rows, best first per genre."""
+    fields = ['book__genres', 'book'] if by_genre else ['book']
+    return LikedItem.objects.values_list(*fields) \
+        .annotate(score=Count('id')) \
+        .order_by(*fields[:-1], '-score', 'book')
+
+
+def top_rated_scores(by_genre):
+    """Return (genre, book, rating) rows of books with enough reviews."""
+    fields = ['genres', 'id'] if by_genre else ['id']
+    return Book.objects.annotate(reviews=Count('review', distinct=True)) \
+        .filter(reviews__gte=settings.RANKINGS_MIN_REVIEWS) \
+        .values_list(*fields, 'rating') \
+        .order_by(*fields[:-1], '-rating', '-reviews', 'id')
+
+
+SCORES = {
+    BookRanking.BESTSELLERS: bestseller_scores,
+    BookRanking.MOST_LIKED: most_liked_scores,
+    BookRanking.TOP_RATED: top_rated_scores,
+}
+
+
+def top_per_genre(scores, size):
+    """Return (genre, book, score, position) rows of the top size books.
+
+    scores is a by_genre queryset of SCORES. Rows are numbered per genre
+    with ROW_NUMBER() in its order and cut at size in SQL, as Django
+    cannot filter on window functions.
+    """
+    genre, *order = scores.query.order_by
+    numbered = scores.annotate(position=Window(
+        expression=RowNumber(),
+        partition_by=F(genre),
+        order_by=[
+            F(name[1:]).desc() if name.startswith('-') else F(name).asc()
+            for name in order
+        ],
+    )).order_by()
+    sql, params = numbered.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT * FROM ({sql}) ranked WHERE "position" <= %s'
+            ' ORDER BY 1, 4',
+            [*params, size],
+        )
+        return cursor.fetchall()
+
+
+def compute(kind, size):
+    """Return BookRanking rows of kind, overall and per genre."""
+    now = timezone.now()
+    rows = [
+        (None, book_id, score, position)
+        for position, (book_id, score) in enumerate(
+            SCORES[kind](by_genre=False)[:size], 1
+        )
+    ]
+    rows += [
+        row for row in top_per_genre(SCORES[kind](by_genre=True), size)
+        if row[0] is not None
+    ]
+
+    rankings = []
+    for genre_id, book_id, score, position in rows:
+        rankings.append(BookRanking(
+            kind=kind,
+            genre_id=genre_id,
+            position=position,
+            book_id=book_id,
+            score=float(score),
+            refreshed_at=now,
+        ))
+    return rankings
+
+
+def refresh(kinds=None, size=None):
+    """Recompute rankings of kinds, all by default, and return row count."""
+    size = size or settings.RANKINGS_SIZE
+    count = 0
+    for kind in kinds or SCORES:
+        rankings = compute(kind, size)
+        with transaction.atomic():
+            BookRanking.objects.filter(kind=kind).delete()
+            BookRanking.objects.bulk_create(rankings)
+            transaction.on_commit(partial(
+                publish, kind, rankings[0].refreshed_at if rankings else None
+            ))
+        count += len(rankings)
+    return count
+
+
+def publish(kind, refreshed):
+    """Tell every process rankings of kind were refreshed at refreshed."""
+    key = REFRESHED_KEY.format(kind)
+    if refreshed is None:
+        cache.delete(key)
+    else:
+        cache.set(key, refreshed, settings.RANKINGS_CACHE_TIMEOUT)
+
+
+def refreshed_at(kinds):
+    """Return dict of the last refresh time of rankings by kind.
+
+    Times the cache lost are read from the table in one query.
+    """
+    keys = {kind: REFRESHED_KEY.format(kind) for kind in kinds}
+    found = cache.get_many(keys.values())
+    refreshed = {
+        kind: found[key] for kind, key in keys.items() if key in found
+    }
+    missing = [kind for kind in kinds if kind not in refreshed]
+    if missing:
+        loaded = dict(
+            BookRanking.objects.filter(kind__in=missing)
+            .values_list('kind').annotate(Max('refreshed_at'))
+        )
+        for kind, value in loaded.items():
+            # add: a refresh committed meanwhile published a newer time.
+            cache.add(keys[kind], value, settings.RANKINGS_CACHE_TIMEOUT)
+        refreshed.update(loaded)
+    return refreshed
+
+
+def ranking(kind, genre_id=None):
+    """Return ranked BookRanking rows of kind with their books."""
+    return BookRanking.objects.filter(kind=kind, genre_id=genre_id) \
+        .select_related('book') \
+        .prefetch_related('book__authors') \
+        .order_by('position')
+
+
+def cached(kind, genre_id, render, refreshed):
+    """Return render(ranking(kind, genre_id)), cached per refresh time.
+
+    refreshed is the time of the last refresh of kind, None when it was
+    never refreshed.
+    """
+    key = f'rankings:{kind}:{genre_id}'
+    entry = cache.get(key) if refreshed is not None else None
+    if entry is not None and entry[0] == refreshed:
+        metrics.CACHE_REQUESTS.inc(cache='rankings', result='hit')
+        return entry[1]
+
+    metrics.CACHE_REQUESTS.inc(cache='rankings', result='miss')
+    data = render(ranking(kind, genre_id))
+    if refreshed is not None:
+        cache.set(key, (refreshed, data), settings.RANKINGS_CACHE_TIMEOUT)
+    return data
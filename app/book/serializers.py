@@ -2,8 +2,12 @@
 Serializers for book APIs
 """
 from rest_framework import serializers
+from core import references
+from core.serializers import CompiledListSerializer, DynamicFieldsMixin
 from core.models import (
     Book,
+    BookRanking,
+    BookReviewStats,
     Genre,
     Author,
     Language,
@@ -13,7 +17,7 @@ from core.models import (
 )
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Genre Serializer."""
 
     class Meta:
@@ -22,7 +26,7 @@ class GenreSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Author Serializer."""
 
     class Meta:
@@ -31,7 +35,7 @@ class AuthorSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class LanguageSerializer(serializers.ModelSerializer):
+class LanguageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Language Serializer."""
 
     class Meta:
@@ -40,7 +44,7 @@ class LanguageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class BookShelfSerializer(serializers.ModelSerializer):
+class BookShelfSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """BookShelf Serializer."""
 
     class Meta:
@@ -49,7 +53,7 @@ class BookShelfSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class PublisherSerializer(serializers.ModelSerializer):
+class PublisherSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Publisher Serializer."""
 
     class Meta:
@@ -58,7 +62,37 @@ class PublisherSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSummarySerializer(DynamicFieldsMixin,
+                            serializers.ModelSerializer):
+    """Serializer for books without nested attribute lists."""
+    author = serializers.SerializerMethodField()
+
+    field_lookups = {'author': ['authors']}
+
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'price', 'rating', 'author']
+        read_only_fields = fields
+
+    def get_author(self, obj):
+        """Return name of the first author of the book."""
+        authors = obj.authors.all()
+        if not authors:
+            return None
+        return min(authors, key=lambda author: author.id).name
+
+
+class BookRankingSerializer(serializers.ModelSerializer):
+    """Serializer for a ranked book."""
+    book = BookSummarySerializer(read_only=True)
+
+    class Meta:
+        model = BookRanking
+        fields = ['position', 'score', 'book']
+        read_only_fields = fields
+
+
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for books."""
     genres = GenreSerializer(many=True, required=False)
     authors = AuthorSerializer(many=True, required=False)
@@ -80,36 +114,37 @@ class BookSerializer(serializers.ModelSerializer):
             'publishers',
         ]
         read_only_fields = ['id']
+        list_serializer_class = CompiledListSerializer
 
     def _get_or_create_genres(self, genres, book):
         """Handle getting or creating genres as needed."""
-        for genre in genres:
-            genre_obj, created = Genre.objects.get_or_create(**genre)
-            book.genres.add(genre_obj)
+        genres = references.resolve(Genre, genres)
+        if genres:
+            book.genres.add(*genres)
 
     def _get_or_create_authors(self, authors, book):
         """Handle getting or creating authors as needed."""
-        for author in authors:
-            author_obj, created = Author.objects.get_or_create(**author)
-            book.authors.add(author_obj)
+        authors = references.resolve(Author, authors)
+        if authors:
+            book.authors.add(*authors)
 
     def _get_or_create_languages(self, languages, book):
         """Handle getting or creating languages as needed."""
-        for language in languages:
-            language_obj, created = Language.objects.get_or_create(**language)
-            book.languages.add(language_obj)
+        languages = references.resolve(Language, languages)
+        if languages:
+            book.languages.add(*languages)
 
     def _get_or_create_bookshelves(self, bookshelves, book):
         """Handle getting or creating bookshelves as needed."""
-        for bkshlf in bookshelves:
-            bookshelf_obj, created = BookShelf.objects.get_or_create(**bkshlf)
-            book.bookshelves.add(bookshelf_obj)
+        bookshelves = references.resolve(BookShelf, bookshelves)
+        if bookshelves:
+            book.bookshelves.add(*bookshelves)
 
     def _get_or_create_publishers(self, publishers, book):
         """Handle getting or creating publishers as needed."""
-        for pblshr in publishers:
-            publisher_obj, created = Publisher.objects.get_or_create(**pblshr)
-            book.publishers.add(publisher_obj)
+        publishers = references.resolve(Publisher, publishers)
+        if publishers:
+            book.publishers.add(*publishers)
 
     def create(self, validated_data):
         """Create a book."""
@@ -129,13 +164,21 @@ class BookSerializer(serializers.ModelSerializer):
         return book
 
     def update(self, instance, validated_data):
-        """Update book."""
+        """Update book, unless it changed since instance was loaded."""
         genres = validated_data.pop('genres', None)
         authors = validated_data.pop('authors', None)
         languages = validated_data.pop('languages', None)
         bookshelves = validated_data.pop('bookshelves', None)
         publishers = validated_data.pop('publishers', None)
 
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+
+        # Writes only the given columns and bumps the version even if
+        # just the attribute lists change, before touching them, so a
+        # stale update fails without side effects.
+        instance.save(update_fields=list(validated_data) or ['version'])
+
         if genres is not None:
             instance.genres.clear()
             self._get_or_create_genres(genres, instance)
@@ -156,23 +199,37 @@ class BookSerializer(serializers.ModelSerializer):
             instance.publishers.clear()
             self._get_or_create_publishers(publishers, instance)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
         return instance
 
 
+class ReviewStatsSerializer(serializers.ModelSerializer):
+    """Serializer for review statistics of a book."""
+    mean = serializers.FloatField(read_only=True)
+    histogram = serializers.DictField(
+        child=serializers.IntegerField(),
+        read_only=True,
+    )
+
+    class Meta:
+        model = BookReviewStats
+        fields = ['review_count', 'mean', 'histogram', 'last_review_at']
+        read_only_fields = fields
+
+
 class BookDetailSerializer(BookSerializer):
     """Serializer for book detail view."""
+    review_stats = ReviewStatsSerializer(read_only=True)
 
     class Meta(BookSerializer.Meta):
         fields = BookSerializer.Meta.fields + [
             'isbn13',
             'publication_date',
             'available_quantity',
-            'description'
+            'description',
+            'version',
+            'review_stats',
         ]
+        read_only_fields = ['id', 'version']
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -181,11 +238,17 @@ class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'comment', 'value', 'created_at']
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'created_at']
+        list_serializer_class = CompiledListSerializer
 
 
-class ReviewDetailSerializer(serializers.ModelSerializer):
-    """Serializer for book reviews."""
+class ReviewDetailSerializer(DynamicFieldsMixin,
+                             serializers.ModelSerializer):
+    """Serializer for book reviews, ?expand=book renders book summary."""
+    reviewer = serializers.CharField(source='user.name', read_only=True)
+
+    expandable_fields = {'book': BookSummarySerializer}
+    field_lookups = {'reviewer': ['user']}
 
     class Meta(ReviewSerializer.Meta):
-        fields = ReviewSerializer.Meta.fields+['book']
+        fields = ReviewSerializer.Meta.fields+['book', 'reviewer']
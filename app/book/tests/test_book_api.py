@@ -2,16 +2,22 @@
 Tests for book APIs.
 """
 
+import base64
+import json
 from datetime import date
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import references
 from core.models import (
     Book,
     Genre,
@@ -24,7 +30,8 @@ from core.models import (
 from book.serializers import (
     BookSerializer,
     BookDetailSerializer,
-    ReviewDetailSerializer
+    ReviewDetailSerializer,
+    ReviewSerializer,
 )
 
 
@@ -69,6 +76,7 @@ class PublicBookAPITests(TestCase):
 
     def setUp(self):
         self.client = APIClient()
+        references.clear()
 
     def test_auth_not_required(self):
         """Test auth is not required to call API."""
@@ -161,10 +169,104 @@ class PublicBookAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
         reviews = Review.objects.all().filter(book=book) \
-            .order_by('-book__title')
+            .order_by('-created_at', '-id')
         serializer = ReviewDetailSerializer(reviews, many=True)
 
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertIsNone(res.data['next'])
+
+    def test_get_reviews_paginated(self):
+        """Test reviews are paged with a cursor in the chosen order."""
+        book = create_book()
+        for i, value in enumerate((3, 5, 1, 4, 2)):
+            user = get_user_model().objects.create_user(
+                f'user{i}@example.com',
+                'testpass123',
+                name=f'User {i}',
+            )
+            Review.objects.create(user=user, book=book, value=value)
+
+        url = detail_reviews_url(book.id)
+        values, reviewers = [], []
+        params = {'ordering': '-value', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            values += [review['value'] for review in res.data['results']]
+            reviewers += [review['reviewer'] for review in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(values, [5, 4, 3, 2, 1])
+        self.assertEqual(reviewers[0], 'User 1')
+
+    def test_get_reviews_invalid_params(self):
+        """Test unknown orderings and broken cursors are rejected."""
+        url = detail_reviews_url(create_book().id)
+
+        res = self.client.get(url, {'ordering': 'comment'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(url, {'cursor': 'garbage'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_get_reviews_invalid_cursor_values(self):
+        """Test well-formed cursors with invalid values are rejected."""
+        url = detail_reviews_url(create_book().id)
+
+        for values in (['garbage', 1], [None, 'x'], [[1], 1]):
+            data = json.dumps({'o': '-created_at', 'v': values})
+            cursor = base64.urlsafe_b64encode(data.encode()).decode()
+            with self.subTest(values=values):
+                res = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_retrieve_books_sparse_fields(self):
+        """Test ?fields= returns only requested fields in one query."""
+        book = create_book()
+        book.genres.add(Genre.objects.create(name='Fiction'))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(BOOK_URL, {'fields': 'id,title,price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            [{'id': book.id, 'title': book.title, 'price': '5.50'}]
+        )
+
+    def test_retrieve_books_omit_fields(self):
+        """Test ?omit= drops top level and nested fields."""
+        book = create_book()
+        book.genres.add(Genre.objects.create(name='Fiction'))
+
+        res = self.client.get(BOOK_URL, {'omit': 'authors,genres.description'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('authors', res.data[0])
+        self.assertIn('publishers', res.data[0])
+        self.assertEqual(res.data[0]['genres'][0], {
+            'id': book.genres.get().id,
+            'name': 'Fiction',
+        })
+
+    def test_retrieve_books_query_count(self):
+        """Test book list prefetches attributes for all books."""
+        genre = Genre.objects.create(name='Fiction')
+        for i in range(5):
+            create_book(title=f'Book {i}').genres.add(genre)
+
+        with self.assertNumQueries(6):
+            res = self.client.get(BOOK_URL)
+        self.assertEqual(len(res.data), 5)
+
+    def test_get_book_detail_sparse_fields(self):
+        """Test ?fields= on book detail."""
+        book = create_book()
+
+        res = self.client.get(detail_url(book.id), {'fields': 'isbn13'})
+
+        self.assertEqual(res.data, {'isbn13': book.isbn13})
 
 
 class PrivateBookAPITests(TestCase):
@@ -237,6 +339,43 @@ class PrivateBookAPITests(TestCase):
         for k, v in payload.items():
             self.assertEqual(getattr(book, k), v)
 
+    def test_update_if_match(self):
+        """Test updates with a current If-Match version succeed."""
+        book = create_book()
+        url = detail_url(book.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.patch(url, {'price': '6.00'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], f'"{book.version + 1}"')
+        self.assertEqual(res.data['version'], book.version + 1)
+
+    def test_update_stale_if_match(self):
+        """Test updates based on an old version are rejected."""
+        book = create_book(title='Original title')
+        url = detail_url(book.id)
+        etag = self.client.get(url)['ETag']
+        self.client.patch(url, {'price': '6.00'})
+
+        res = self.client.patch(url, {'title': 'New'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Original title')
+
+    def test_update_keeps_concurrent_stock_changes(self):
+        """Test updates write only their own columns."""
+        book = create_book(available_quantity=10)
+        Book.objects.filter(id=book.id).update(available_quantity=7)
+
+        res = self.client.patch(detail_url(book.id), {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'New')
+        self.assertEqual(book.available_quantity, 7)
+
     def test_delete_book(self):
         """Test deleting a book successful."""
         book = create_book()
@@ -309,6 +448,31 @@ class PrivateBookAPITests(TestCase):
             exists = book.genres.filter(name=genre['name']).exists()
             self.assertTrue(exists)
 
+    def test_create_book_matches_genre_names(self):
+        """Test genres are matched by name whatever case and description."""
+        genre_fantasy = Genre.objects.create(
+            name='Fantasy',
+            description='Dragons.'
+        )
+        payload = {
+            'title': 'Test title',
+            'isbn13': '978-3-15-148410-0',
+            'price': Decimal('5.70'),
+            'genres': [
+                {'name': 'fantasy ', 'description': 'Other description'},
+                {'name': 'FANTASY'},
+            ]
+        }
+
+        res = self.client.post(BOOK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        book = Book.objects.get()
+        self.assertEqual(list(book.genres.all()), [genre_fantasy])
+        self.assertEqual(Genre.objects.count(), 1)
+        genre_fantasy.refresh_from_db()
+        self.assertEqual(genre_fantasy.description, 'Dragons.')
+
     def test_create_genre_on_update(self):
         """Test creating genre when updating a book."""
         book = create_book()
@@ -789,7 +953,7 @@ class PrivateBookAPITests(TestCase):
         url = detail_create_review_url(book.id)
         res = self.client.post(url, payload)
 
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
         reviews = Review.objects.all()
         review = reviews[0]
 
@@ -798,3 +962,56 @@ class PrivateBookAPITests(TestCase):
         self.assertEqual(review.user, self.user)
         self.assertEqual(review.comment, payload['comment'])
         self.assertEqual(review.value, payload['value'])
+        self.assertEqual(res.data['id'], review.id)
+
+    def test_create_review_queries(self):
+        """Test reviewing runs one INSERT and one UPDATE."""
+        book = create_book()
+        url = detail_create_review_url(book.id)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(url, {'comment': 'Good.', 'value': 4})
+
+        statements = [
+            query['sql'].split()[0] for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+
+    def test_create_review_twice(self):
+        """Test reviewing a book twice is a conflict."""
+        book = create_book()
+        url = detail_create_review_url(book.id)
+        self.client.post(url, {'comment': 'Good.', 'value': 4})
+
+        res = self.client.post(url, {'comment': 'Bad.', 'value': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['detail'].code, 'duplicate_review')
+        self.assertEqual(Review.objects.get().comment, 'Good.')
+
+    def test_create_review_missing_book(self):
+        """Test reviewing a book that does not exist is 404."""
+        url = detail_create_review_url(create_book().id + 1)
+
+        res = self.client.post(url, {'comment': 'Good.', 'value': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Review.objects.exists())
+
+    def test_create_review_invalid_book_id(self):
+        """Test reviewing a book with a non-numeric id is 404."""
+        url = detail_create_review_url('abc')
+
+        res = self.client.post(url, {'comment': 'Good.', 'value': 4})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_review_other_integrity_error(self):
+        """Test violations of other constraints are not duplicates."""
+        url = detail_create_review_url(create_book().id)
+        error = IntegrityError('violates constraint "other"')
+
+        with patch.object(ReviewSerializer, 'save', side_effect=error):
+            with self.assertRaises(IntegrityError):
+                self.client.post(url, {'comment': 'Good.', 'value': 4})
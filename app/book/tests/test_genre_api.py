@@ -63,6 +63,17 @@ class PrivateGenresApiTests(TestCase):
         genre.refresh_from_db()
         self.assertEqual(genre.name, payload['name'])
 
+    def test_genres_patch_duplicate_name(self):
+        """Test renaming a genre to the name of another one fails."""
+        Genre.objects.create(name='Fantasy')
+        genre = Genre.objects.create(name='Test 1')
+
+        res = self.client.patch(detail_url(genre.id), {'name': ' FANTASY'})
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        genre.refresh_from_db()
+        self.assertEqual(genre.name, 'Test 1')
+
     def test_genres_put(self):
         """Test genre update."""
         genre = Genre.objects.create(name='Test 1', description='Test also 1')
@@ -0,0 +1,207 @@
+"""
+Tests for book rankings.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Book,
+    BookRanking,
+    Genre,
+    LikedItem,
+    Order,
+    OrderItem,
+    Review,
+)
+from book import rankings
+
+POPULAR_URL = reverse('book:book-popular')
+
+
+def create_book(**params):
+    """Create and return a sample book."""
+    defaults = {
+        'title': 'Sample book title',
+        'isbn13': '978-3-16-148410-0',
+        'publication_date': date(2022, 5, 7),
+        'available_quantity': 100,
+        'price': Decimal('5.50'),
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+def create_user(number):
+    """Create and return a sample user."""
+    return get_user_model().objects.create_user(
+        f'user{number}@example.com',
+        'testpass123',
+    )
+
+
+@override_settings(RANKINGS_SIZE=2, RANKINGS_MIN_REVIEWS=2)
+class RankingTests(TestCase):
+    """Test computing and serving book rankings."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.fantasy = Genre.objects.create(name='Fantasy')
+        self.books = [create_book(title=f'Book {i}') for i in range(3)]
+        self.books[0].genres.add(self.fantasy)
+        self.books[2].genres.add(self.fantasy)
+        self.users = [create_user(i) for i in range(3)]
+
+    def buy(self, user, book, quantity, paid=True):
+        """Create an order of quantity copies of book."""
+        order = Order.objects.create(user=user, is_paid=paid)
+        order.ordered_items.add(
+            OrderItem.objects.create(user=user, book=book, quantity=quantity)
+        )
+
+    def test_refresh_rankings(self):
+        """Test rankings are computed overall and per genre."""
+        self.buy(self.users[0], self.books[1], 5)
+        self.buy(self.users[1], self.books[2], 2)
+        self.buy(self.users[2], self.books[2], 1)
+        self.buy(self.users[0], self.books[0], 9, paid=False)
+        LikedItem.objects.create(user=self.users[0], book=self.books[0])
+        for user, value in zip(self.users, (5, 3)):
+            Review.objects.create(user=user, book=self.books[2], value=value)
+        Book.objects.filter(id=self.books[2].id).update(rating=4)
+
+        call_command('refresh_rankings', stdout=StringIO())
+
+        def ranked(kind, genre=None):
+            return [
+                (row.book_id, row.score)
+                for row in rankings.ranking(kind, genre)
+            ]
+
+        self.assertEqual(ranked(BookRanking.BESTSELLERS), [
+            (self.books[1].id, 5), (self.books[2].id, 3),
+        ])
+        self.assertEqual(
+            ranked(BookRanking.BESTSELLERS, self.fantasy.id),
+            [(self.books[2].id, 3)],
+        )
+        self.assertEqual(
+            ranked(BookRanking.MOST_LIKED), [(self.books[0].id, 1)]
+        )
+        self.assertEqual(
+            ranked(BookRanking.TOP_RATED, self.fantasy.id),
+            [(self.books[2].id, 4)],
+        )
+
+    def test_refresh_keeps_top_of_each_genre(self):
+        """Test per genre rankings are cut to size in every genre."""
+        horror = Genre.objects.create(name='Horror')
+        self.books[1].genres.add(horror)
+        self.books[2].genres.add(horror)
+        for user, book in ((self.users[0], self.books[0]),
+                           (self.users[1], self.books[0]),
+                           (self.users[0], self.books[2]),
+                           (self.users[0], self.books[1]),
+                           (self.users[1], self.books[1])):
+            LikedItem.objects.create(user=user, book=book)
+
+        rankings.refresh([BookRanking.MOST_LIKED], size=1)
+
+        self.assertCountEqual(
+            BookRanking.objects.values_list('genre', 'position', 'book'),
+            [
+                (None, 1, self.books[0].id),
+                (self.fantasy.id, 1, self.books[0].id),
+                (horror.id, 1, self.books[1].id),
+            ],
+        )
+
+    def test_popular_books(self):
+        """Test popular endpoint serves rankings with books."""
+        LikedItem.objects.create(user=self.users[0], book=self.books[0])
+        LikedItem.objects.create(user=self.users[1], book=self.books[0])
+        LikedItem.objects.create(user=self.users[0], book=self.books[1])
+        rankings.refresh()
+
+        res = self.client.get(POPULAR_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(res.data), {'bestsellers', 'most_liked', 'top_rated'}
+        )
+        first, second = res.data['most_liked']
+        self.assertEqual(first['position'], 1)
+        self.assertEqual(first['score'], 2)
+        self.assertEqual(first['book']['id'], self.books[0].id)
+        self.assertEqual(second['book']['title'], 'Book 1')
+
+    def test_popular_books_filtered(self):
+        """Test filtering popular books by kind and genre."""
+        LikedItem.objects.create(user=self.users[0], book=self.books[1])
+        LikedItem.objects.create(user=self.users[0], book=self.books[2])
+        rankings.refresh()
+
+        res = self.client.get(
+            POPULAR_URL, {'kind': 'most_liked', 'genre': self.fantasy.id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(res.data), ['most_liked'])
+        self.assertEqual(
+            [row['book']['id'] for row in res.data['most_liked']],
+            [self.books[2].id],
+        )
+
+        res = self.client.get(POPULAR_URL, {'kind': 'newest'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_popular_books_cached_until_refresh(self):
+        """Test rankings are served from cache until refreshed."""
+        LikedItem.objects.create(user=self.users[0], book=self.books[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            rankings.refresh()
+        self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+        self.assertEqual(len(res.data['most_liked']), 1)
+
+        LikedItem.objects.create(user=self.users[0], book=self.books[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            rankings.refresh()
+
+        res = self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+        self.assertEqual(len(res.data['most_liked']), 2)
+
+    def test_popular_books_refresh_time_lost(self):
+        """Test the refresh time is read again when the cache lost it."""
+        LikedItem.objects.create(user=self.users[0], book=self.books[1])
+        rankings.refresh()
+        self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+        LikedItem.objects.create(user=self.users[0], book=self.books[2])
+        rankings.refresh()
+        cache.delete(rankings.REFRESHED_KEY.format('most_liked'))
+
+        res = self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+
+        self.assertEqual(len(res.data['most_liked']), 2)
+
+    def test_popular_books_never_refreshed_not_cached(self):
+        """Test rankings that were never refreshed are not cached."""
+        self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+        LikedItem.objects.create(user=self.users[0], book=self.books[1])
+        rankings.refresh()
+
+        res = self.client.get(POPULAR_URL, {'kind': 'most_liked'})
+
+        self.assertEqual(len(res.data['most_liked']), 1)
@@ -99,6 +99,21 @@ class PublicReviewsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_reviews_expand_book(self):
+        """Test ?expand=book renders book summary for reviews."""
+        book = sample_book()
+        sample_review(sample_user(), book)
+
+        res = self.client.get(
+            REVIEW_URL,
+            {'expand': 'book', 'fields': 'value,book'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['value'], 4)
+        self.assertEqual(res.data[0]['book']['title'], book.title)
+        self.assertEqual(set(res.data[0]), {'value', 'book'})
+
 
 class PrivateReviewsApiTests(TestCase):
     """Test reviews requests for authorized user."""
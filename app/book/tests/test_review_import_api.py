@@ -0,0 +1,186 @@
+"""
+Tests for the review import API.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from book import imports
+from core.models import Book, BookReviewStats, Review
+
+IMPORT_URL = reverse('book:review-import-reviews')
+
+
+def create_book(**params):
+    """Create and return a sample book."""
+    defaults = {
+        'title': 'Sample book title',
+        'isbn13': '978-3-16-148410-0',
+        'publication_date': date(2022, 5, 7),
+        'available_quantity': 100,
+        'price': Decimal('5.50'),
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+def create_user(number):
+    """Create and return a sample user."""
+    return get_user_model().objects.create_user(
+        f'user{number}@example.com',
+        'testpass123',
+    )
+
+
+class PrivateReviewImportTests(TestCase):
+    """Test unauthorized review import requests."""
+
+    def test_import_requires_admin(self):
+        """Test users who are not admins cannot import reviews."""
+        client = APIClient()
+        client.force_authenticate(create_user(0))
+
+        res = client.post(IMPORT_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AdminReviewImportTests(TestCase):
+    """Test importing reviews as an admin."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.admin)
+        self.book = create_book()
+        self.users = [create_user(i) for i in range(3)]
+
+    def test_import_json_list(self):
+        """Test importing reviews recomputes rating and statistics."""
+        Review.objects.create(user=self.users[0], book=self.book, value=1)
+        payload = [
+            {'user': self.users[0].id, 'book': self.book.id, 'value': 5},
+            {'user': self.users[1].id, 'book': self.book.id, 'value': 4,
+             'comment': 'Good.', 'created_at': '2020-01-02T03:04:05Z'},
+            {'user': self.users[2].email, 'book': self.book.id, 'value': 3},
+            {'user': self.users[2].id, 'book': self.book.id + 1, 'value': 3},
+            {'user': 'nobody@example.com', 'book': self.book.id, 'value': 3},
+            {'user': self.users[2].id, 'book': self.book.id, 'value': 9},
+            {'book': self.book.id, 'value': 3},
+        ]
+
+        res = self.client.post(IMPORT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'received': 7, 'imported': 2, 'duplicates': 1, 'skipped': 4,
+            'books': 1,
+        })
+        self.assertEqual(
+            Review.objects.get(user=self.users[0]).value, 1
+        )
+        self.assertEqual(
+            Review.objects.get(user=self.users[1]).created_at,
+            datetime(2020, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating, Decimal('2.7'))
+        stats = BookReviewStats.objects.get(book=self.book)
+        self.assertEqual(stats.review_count, 3)
+        self.assertEqual(stats.value_sum, 8)
+
+    def test_import_json_lines(self):
+        """Test reviews can be streamed as JSON lines."""
+        body = (
+            f'{{"user": {self.users[0].id}, "book": {self.book.id}, '
+            f'"value": 4}}\n'
+            'not json\n'
+            '\n'
+            f'{{"user": {self.users[1].id}, "book": {self.book.id}, '
+            f'"value": 2}}\n'
+        )
+
+        res = self.client.post(
+            IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported'], 2)
+        self.assertEqual(res.data['skipped'], 1)
+        self.assertEqual(Review.objects.filter(book=self.book).count(), 2)
+
+    def test_import_csv(self):
+        """Test reviews can be sent as CSV with a header row."""
+        body = (
+            'user,book,value,comment\n'
+            f'{self.users[0].email},{self.book.id},5,"Great, really."\n'
+        )
+
+        res = self.client.post(IMPORT_URL, body, content_type='text/csv')
+
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(
+            Review.objects.get(user=self.users[0]).comment, 'Great, really.'
+        )
+
+    def test_import_counts_duplicates_per_batch(self):
+        """Test duplicates within and across batches are counted."""
+        Review.objects.create(user=self.users[0], book=self.book, value=1)
+        body = ''.join(
+            f'{{"user": {user.id}, "book": {self.book.id}, "value": 4}}\n'
+            for user in (self.users[0], self.users[1], self.users[1])
+        )
+
+        res = self.client.post(
+            IMPORT_URL, body, content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(res.data['duplicates'], 2)
+        stats = BookReviewStats.objects.get(book=self.book)
+        self.assertEqual(stats.review_count, 2)
+
+    def test_import_invalid_encoding(self):
+        """Test a body that is not UTF-8 is rejected."""
+        res = self.client.post(
+            IMPORT_URL,
+            b'\xff\xfeuser,book,value\n',
+            content_type='text/csv',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Review.objects.exists())
+        self.assertEqual(res.data['imported'], 0)
+
+    def test_import_aborted_recomputes_imported_books(self):
+        """Test batches imported before a failure update their books."""
+        lines = [
+            f'{{"user": {self.users[0].id}, "book": {self.book.id}, '
+            f'"value": 4}}\n'.encode(),
+            b'\xff\xfe\n',
+        ]
+
+        with self.assertRaises(imports.ImportAborted) as aborted:
+            imports.import_reviews(imports.parse_jsonl(lines), batch_size=1)
+
+        self.assertEqual(aborted.exception.counts['imported'], 1)
+        self.assertEqual(aborted.exception.counts['books'], 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating, 4)
+        stats = BookReviewStats.objects.get(book=self.book)
+        self.assertEqual(stats.review_count, 1)
+
+    def test_import_requires_list(self):
+        """Test a JSON body that is not a list is rejected."""
+        res = self.client.post(IMPORT_URL, {'user': 1}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
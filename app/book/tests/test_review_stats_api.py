@@ -0,0 +1,172 @@
+"""
+Tests for book review statistics.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Book, BookReviewStats, Review, recompute_review_stats
+
+
+def stats_url(book_id):
+    """Create and return a review statistics URL."""
+    return reverse('book:book-review-stats', args=[book_id])
+
+
+def create_book(**params):
+    """Create and return a sample book."""
+    defaults = {
+        'title': 'Sample book title',
+        'isbn13': '978-3-16-148410-0',
+        'publication_date': date(2022, 5, 7),
+        'available_quantity': 100,
+        'price': Decimal('5.50'),
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+def create_user(number):
+    """Create and return a sample user."""
+    return get_user_model().objects.create_user(
+        f'user{number}@example.com',
+        'testpass123',
+    )
+
+
+class ReviewStatsTests(TestCase):
+    """Test review statistics are maintained and served."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.book = create_book()
+        self.users = [create_user(i) for i in range(3)]
+
+    def stats(self):
+        """Return current statistics of the sample book."""
+        return BookReviewStats.objects.get(book=self.book)
+
+    def test_stats_follow_reviews(self):
+        """Test creating, editing and deleting reviews updates stats."""
+        reviews = [
+            Review.objects.create(user=user, book=self.book, value=value)
+            for user, value in zip(self.users, (5, 4, 4))
+        ]
+        stats = self.stats()
+        self.assertEqual(stats.review_count, 3)
+        self.assertEqual(stats.mean, 4.33)
+        self.assertEqual(stats.count_4, 2)
+        self.assertEqual(stats.last_review_at, reviews[-1].created_at)
+
+        review = Review.objects.get(id=reviews[1].id)
+        review.value = 1
+        review.save()
+        reviews[0].delete()
+
+        stats = self.stats()
+        self.assertEqual(stats.review_count, 2)
+        self.assertEqual(stats.value_sum, 5)
+        self.assertEqual(
+            stats.histogram,
+            {'0': 0, '1': 1, '2': 0, '3': 0, '4': 1, '5': 0},
+        )
+
+    def test_stats_follow_review_moved_to_other_book(self):
+        """Test moving a review counts it for its new book only."""
+        other = create_book(title='Other')
+        self.client.force_authenticate(self.users[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(
+                user=self.users[0], book=self.book, value=5
+            )
+            res = self.client.patch(
+                reverse('book:review-detail', args=[review.id]),
+                {'book': other.id},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.stats().review_count, 0)
+        self.assertIsNone(self.stats().last_review_at)
+        other_stats = BookReviewStats.objects.get(book=other)
+        self.assertEqual(other_stats.review_count, 1)
+        self.assertEqual(other_stats.count_5, 1)
+        self.book.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.book.rating, 0)
+        self.assertEqual(other.rating, 5)
+
+    def test_last_review_at_is_latest(self):
+        """Test backdated and deleted reviews keep the latest time."""
+        now = timezone.now()
+        latest = Review.objects.create(
+            user=self.users[0], book=self.book, value=3, created_at=now
+        )
+        Review.objects.create(
+            user=self.users[1],
+            book=self.book,
+            value=3,
+            created_at=now - timedelta(days=2),
+        )
+        self.assertEqual(self.stats().last_review_at, now)
+
+        latest.delete()
+
+        self.assertEqual(
+            self.stats().last_review_at, now - timedelta(days=2)
+        )
+
+    def test_stats_batched_on_user_delete(self):
+        """Test deleting a reviewer removes their reviews from stats."""
+        other = create_book(title='Other')
+        for book in (self.book, other):
+            Review.objects.create(user=self.users[0], book=book, value=3)
+        Review.objects.create(user=self.users[1], book=self.book, value=5)
+
+        self.users[0].delete()
+
+        self.assertEqual(self.stats().review_count, 1)
+        self.assertEqual(self.stats().count_3, 0)
+        self.assertEqual(
+            BookReviewStats.objects.get(book=other).review_count, 0
+        )
+
+    def test_recompute_matches_incremental(self):
+        """Test rebuilding stats from reviews gives the same numbers."""
+        for user, value in zip(self.users, (2, 5, 0)):
+            Review.objects.create(user=user, book=self.book, value=value)
+        incremental = self.stats()
+
+        recompute_review_stats([self.book.id])
+
+        rebuilt = self.stats()
+        self.assertEqual(rebuilt.histogram, incremental.histogram)
+        self.assertEqual(rebuilt.value_sum, incremental.value_sum)
+        self.assertEqual(rebuilt.last_review_at, incremental.last_review_at)
+
+    def test_get_review_stats(self):
+        """Test review stats endpoint and book detail include stats."""
+        Review.objects.create(user=self.users[0], book=self.book, value=4)
+
+        res = self.client.get(stats_url(self.book.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['review_count'], 1)
+        self.assertEqual(res.data['mean'], 4.0)
+        self.assertEqual(res.data['histogram']['4'], 1)
+
+        res = self.client.get(reverse('book:book-detail', args=[self.book.id]))
+        self.assertEqual(res.data['review_stats']['review_count'], 1)
+
+    def test_get_review_stats_not_found(self):
+        """Test review stats of a missing book is 404."""
+        res = self.client.get(stats_url(self.book.id + 1))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
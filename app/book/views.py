@@ -1,35 +1,81 @@
 """
 Views for the book APIs.
 """
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.http import parse_etags
 
 from rest_framework import viewsets, mixins, status
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 
 from core.models import (
     Book,
+    BookRanking,
+    BookReviewStats,
     Genre,
     Author,
     Language,
     BookShelf,
     Publisher,
-    Review
+    Review,
+    StaleBookError,
 )
-from book import serializers
+from core.authentication import TokenAuthentication
+from core.exceptions import (
+    Conflict, PreconditionFailed, constraint_error, constraint_name,
+)
+from core.pagination import KeysetPagination
+from core.replicas import ReplicaReadMixin
+from core.serializers import optimize_queryset
+from book import imports, rankings, serializers
+
+
+class ReviewPagination(KeysetPagination):
+    """Keyset pagination of the reviews of a book."""
+    orderings = {
+        '-created_at': ['-created_at', '-id'],
+        'created_at': ['created_at', 'id'],
+        '-value': ['-value', '-created_at', '-id'],
+        'value': ['value', 'created_at', 'id'],
+    }
+    default_ordering = '-created_at'
+    page_size = settings.REVIEWS_PAGE_SIZE
+    max_page_size = settings.REVIEWS_MAX_PAGE_SIZE
+
+
+def book_etag(version):
+    """Return ETag of a book version."""
+    return f'"{version}"'
+
+
+def etag_matches(header, version):
+    """Return whether an If-Match header matches a book version.
+
+    Weak tags match too, as compression turns ETags weak.
+    """
+    etags = [etag[2:] if etag.startswith('W/') else etag
+             for etag in parse_etags(header)]
+    return '*' in etags or book_etag(version) in etags
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """View for manage book APIs."""
     serializer_class = serializers.BookDetailSerializer
     queryset = Book.objects.all()
     authentication_classes = [TokenAuthentication]
+    # Retrieve emits the version as ETag, which If-Match updates are
+    # checked against on the primary, so it reads from the primary too.
+    replica_actions = ('list', 'reviews', 'review_stats', 'popular')
 
     def get_permissions(self):
         """Instantiates and returns the list of permissions for view."""
         if self.action == 'list' or self.action == 'retrieve' \
-                or self.action == 'reviews':
+                or self.action == 'reviews' or self.action == 'popular' \
+                or self.action == 'review_stats':
             permission_classes = [AllowAny]
         elif self.action == 'create_review':
             permission_classes = [IsAuthenticated]
@@ -39,7 +85,8 @@ class BookViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """retrieve recipes for authenticated user."""
-        return self.queryset.order_by('-id')
+        queryset = self.queryset.order_by('-id')
+        return optimize_queryset(queryset, self.get_serializer())
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
@@ -48,43 +95,119 @@ class BookViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        """Return book with its version as ETag."""
+        response = super().retrieve(request, *args, **kwargs)
+        if 'version' in response.data:
+            response['ETag'] = book_etag(response.data['version'])
+        return response
+
+    def update(self, request, *args, **kwargs):
+        """Update book and return its new version as ETag."""
+        response = super().update(request, *args, **kwargs)
+        if 'version' in response.data:
+            response['ETag'] = book_etag(response.data['version'])
+        return response
+
+    def perform_update(self, serializer):
+        """Save book unless it changed since the version in If-Match."""
+        if_match = self.request.headers.get('If-Match')
+        if if_match is not None and \
+                not etag_matches(if_match, serializer.instance.version):
+            raise PreconditionFailed()
+        try:
+            serializer.save()
+        except StaleBookError:
+            raise PreconditionFailed()
+
     @action(detail=True, methods=['post'],
             serializer_class=serializers.ReviewSerializer,
             url_path='create-review')
     def create_review(self, request, pk=None):
-        book = self.get_object()
-        user = self.request.user
-        serializer = serializers.ReviewSerializer(data=request.data)
-
-        if serializer.is_valid():
-            Review.objects.create(
-                user=user,
-                book=book,
-                comment=serializer.validated_data['comment'],
-                value=serializer.validated_data['value']
-            )
-            return Response(status.HTTP_201_CREATED)
-        else:
-            return Response(serializer.errors,
-                            status.HTTP_400_BAD_REQUEST)
+        """Review the book and return the review."""
+        try:
+            book_id = int(pk)
+        except ValueError:
+            raise NotFound()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # The book is not loaded: the statistics UPDATE of the review
+        # hook finds no row when the book does not exist, so the insert
+        # and that update are all it takes.
+        try:
+            with transaction.atomic():
+                serializer.save(user=request.user, book_id=book_id)
+        except Book.DoesNotExist:
+            raise NotFound()
+        except IntegrityError as exc:
+            if constraint_name(exc) != 'review_unique_user_book':
+                raise
+            raise constraint_error(exc)
+        return Response(serializer.data, status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['get'],
             serializer_class=serializers.ReviewDetailSerializer)
     def reviews(self, request, pk=None):
+        """Return a page of reviews of the book, newest first by default."""
         book = self.get_object()
-        reviews = Review.objects.all().filter(book=book) \
-            .order_by('-book__title')
+        reviews = Review.objects.filter(book=book).select_related('user')
+        reviews = optimize_queryset(reviews, self.get_serializer())
+
+        paginator = ReviewPagination()
+        page = paginator.paginate_queryset(reviews, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(reviews, many=True)
+    @action(detail=True, methods=['get'],
+            serializer_class=serializers.ReviewStatsSerializer,
+            url_path='reviews/stats')
+    def review_stats(self, request, pk=None):
+        """Return review statistics of the book."""
+        stats = get_object_or_404(BookReviewStats, book_id=pk)
+        serializer = self.get_serializer(stats)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'],
+            serializer_class=serializers.BookRankingSerializer)
+    def popular(self, request):
+        """Return precomputed rankings, ?kind= and ?genre= narrow them."""
+        kinds = [kind for kind, _ in BookRanking.KIND_CHOICES]
+        kind = request.query_params.get('kind')
+        if kind:
+            if kind not in kinds:
+                return Response(
+                    {'kind': [f'Choose one of {", ".join(kinds)}.']},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+            kinds = [kind]
+        genre = request.query_params.get('genre')
+        if genre is not None and not genre.isdigit():
+            return Response(
+                {'genre': ['A valid integer is required.']},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        genre_id = int(genre) if genre else None
+
+        def render(rows):
+            return self.get_serializer(rows, many=True).data
 
-class BaseBookAttrViewSet(mixins.DestroyModelMixin,
+        refreshed = rankings.refreshed_at(kinds)
+        return Response({
+            kind: rankings.cached(
+                kind, genre_id, render, refreshed.get(kind)
+            )
+            for kind in kinds
+        })
+
+
+class BaseBookAttrViewSet(ReplicaReadMixin,
+                          mixins.DestroyModelMixin,
                           mixins.UpdateModelMixin,
                           mixins.ListModelMixin,
                           viewsets.GenericViewSet):
     """Base ViewSet for book attributes."""
     authentication_classes = [TokenAuthentication]
+    replica_actions = ('list', 'retrieve')
 
     def get_permissions(self):
         """Instantiates and returns the list of permissions for view."""
@@ -98,6 +221,17 @@ class BaseBookAttrViewSet(mixins.DestroyModelMixin,
         """Return query filtered by id."""
         return self.queryset.order_by('-name')
 
+    def perform_update(self, serializer):
+        """Save attribute unless another one has the same name."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise Conflict(
+                'An attribute with this name already exists.',
+                'duplicate_name',
+            )
+
 
 class GenreViewSet(BaseBookAttrViewSet):
     """Manage genres in database."""
@@ -138,14 +272,51 @@ class ReviewViewSet(BaseBookAttrViewSet):
         """Instantiates and returns the list of permissions for view."""
         if self.action == 'list' or self.action == 'retrieve':
             permission_classes = [AllowAny]
+        elif self.action == 'import_reviews':
+            permission_classes = [IsAdminUser]
         else:
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
         """retrieve recipes fro authenticated user."""
-        return self.queryset.order_by('-book__title')
+        queryset = self.queryset.order_by('-book__title') \
+            .select_related('user')
+        return optimize_queryset(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """Save the review, reviews have no unique names."""
+        serializer.save()
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_reviews(self, request):
+        """Import reviews in bulk and return counts of the import.
+
+        The body is a JSON list of reviews, or JSON lines or CSV read as
+        a stream, encoded in UTF-8.
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'application/json':
+            rows = request.data
+            if not isinstance(rows, list):
+                return Response(
+                    {'detail': 'Expected a list of reviews.'},
+                    status.HTTP_400_BAD_REQUEST,
+                )
+        elif content_type == 'text/csv':
+            rows = imports.parse_csv(request.stream or [])
+        else:
+            rows = imports.parse_jsonl(request.stream or [])
+        try:
+            counts = imports.import_reviews(rows)
+        except imports.ImportAborted as exc:
+            # Rows before the undecodable line are imported already.
+            return Response(
+                {'detail': 'Body is not valid UTF-8.', **exc.counts},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(counts)
@@ -54,3 +54,6 @@ admin.site.register(models.Publisher)
 admin.site.register(models.Review)
 admin.site.register(models.OrderItem)
 admin.site.register(models.LikedItem)
+admin.site.register(models.Job)
+admin.site.register(models.BookRanking)
+admin.site.register(models.BookReviewStats)
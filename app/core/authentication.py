@@ -0,0 +1,20 @@
+"""
+Authentication classes for the APIs.
+"""
+from rest_framework import authentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import metrics
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication counting token lookups."""
+
+    def authenticate_credentials(self, key):
+        try:
+            credentials = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            metrics.TOKEN_AUTH_LOOKUPS.inc(result='failure')
+            raise
+        metrics.TOKEN_AUTH_LOOKUPS.inc(result='success')
+        return credentials
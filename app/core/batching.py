@@ -0,0 +1,46 @@
+"""
+Batching of signal handler work.
+
+Handlers of per-row signals such as post_delete run once per row, so
+deleting many rows, directly or by cascade, would run their queries many
+times. Inside signals_batched() handlers collect their work with
+batched() instead, and it is applied once per handler when the block
+exits, within the same transaction as the rows it belongs to.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+@contextmanager
+def signals_batched():
+    """Collect signal handler work in the block and apply it on exit."""
+    if getattr(_local, 'batch', None) is not None:
+        # Nested blocks join the outermost batch.
+        yield
+        return
+
+    _local.batch = {}
+    try:
+        with transaction.atomic():
+            yield
+            while _local.batch:
+                # Applying work may batch more, e.g. through cascades.
+                flush, items = _local.batch.popitem()
+                flush(items)
+    finally:
+        _local.batch = None
+
+
+def batched(flush):
+    """Return dict collecting work for flush, None outside a batch.
+
+    flush is called with the dict when the batch is applied.
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch is None:
+        return None
+    return batch.setdefault(flush, {})
@@ -0,0 +1,25 @@
+"""
+System checks of the deployment.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Reject a per-process default cache when REQUIRE_SHARED_CACHE."""
+    if not settings.REQUIRE_SHARED_CACHE:
+        return []
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return [Error(
+            'The default cache is not shared between processes.',
+            hint=(
+                'Set MEMCACHED_LOCATION, or REQUIRE_SHARED_CACHE=0 to run '
+                'a single process.'
+            ),
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,154 @@
+"""
+Deferred work queues.
+
+Signal handlers queue keys, such as ids of books whose rating changed,
+and the work runs after the surrounding transaction commits, so it
+neither slows down nor holds row locks in the writing transaction. A key
+queued many times before the queue is drained is handled once, and keys
+are handled in batches of batch_size.
+
+With DEFERRED_TASKS_DELAY set, committed keys are handed to a background
+thread draining the queue every DEFERRED_TASKS_DELAY seconds, so bursts
+of many requests coalesce too and requests do not wait for the work.
+The queue is drained once more when the process exits. Otherwise keys
+are handled right after commit.
+
+Handler errors are logged, the committed writes stand. Keys lost to a
+failing handler or a killed process are caught up by the
+recompute_ratings job, which recomputes every book.
+"""
+import atexit
+import logging
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredQueue:
+    """Coalescing queue of keys handled in batches after commit."""
+
+    def __init__(self, name, handler, batch_size=500):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self._local = threading.local()
+        self._ready = set()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._exit_registered = False
+        self._queued = 0
+        self._handled = 0
+
+    def add(self, key, using=None):
+        """Queue key to be handled once the current transaction commits.
+
+        Keys of one transaction share a single on-commit callback; keys
+        of a rolled back transaction are dropped with the callback.
+        """
+        connection = transaction.get_connection(using)
+        batches = self._local.__dict__.setdefault('batches', {})
+        keys, callback = batches.get(connection.alias, (None, None))
+        registered = connection.in_atomic_block and any(
+            func is callback for _, func in connection.run_on_commit
+        )
+        with self._lock:
+            self._queued += 1
+        metrics.DEFERRED_TASKS_QUEUED.inc(queue=self.name)
+
+        if registered:
+            keys.add(key)
+            return
+        keys = {key}
+        callback = partial(self._committed, connection.alias, keys)
+        batches[connection.alias] = (keys, callback)
+        transaction.on_commit(callback, using=connection.alias)
+
+    def _committed(self, alias, keys):
+        batches = self._local.__dict__.get('batches', {})
+        if batches.get(alias, (None, None))[0] is keys:
+            del batches[alias]
+
+        if settings.DEFERRED_TASKS_DELAY > 0:
+            with self._lock:
+                self._ready |= keys
+            self._update_depth()
+            self._ensure_worker()
+            return
+        try:
+            self.run(keys)
+        except Exception:
+            # The transaction is committed, failing its caller now would
+            # only hide that and skip later on-commit callbacks.
+            logger.exception('Deferred %s batch failed', self.name)
+
+    def run(self, keys):
+        """Handle keys in batches of batch_size."""
+        keys = sorted(keys)
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            self.handler(batch)
+            with self._lock:
+                self._handled += len(batch)
+                ratio = self._queued / self._handled
+            metrics.DEFERRED_TASKS_HANDLED.inc(len(batch), queue=self.name)
+            metrics.DEFERRED_TASKS_COALESCING.set(ratio, queue=self.name)
+
+    def drain(self):
+        """Handle every key committed so far."""
+        with self._lock:
+            keys, self._ready = self._ready, set()
+        self._update_depth()
+        if not keys:
+            return
+        try:
+            self.run(keys)
+        except Exception:
+            # Handlers are idempotent, retry the whole lot next time.
+            with self._lock:
+                self._ready |= keys
+            self._update_depth()
+            raise
+
+    def _update_depth(self):
+        with self._lock:
+            depth = len(self._ready)
+        metrics.DEFERRED_TASKS_DEPTH.set(depth, queue=self.name)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._work,
+                name=f'deferred-{self.name}',
+                daemon=True,
+            )
+            self._worker.start()
+            if not self._exit_registered:
+                atexit.register(self._drain_at_exit)
+                self._exit_registered = True
+
+    def _work(self):
+        while True:
+            time.sleep(settings.DEFERRED_TASKS_DELAY)
+            try:
+                self.drain()
+            except Exception:
+                logger.exception('Deferred %s batch failed', self.name)
+            finally:
+                connections.close_all()
+
+    def _drain_at_exit(self):
+        try:
+            self.drain()
+        except Exception:
+            logger.exception('Deferred %s batch failed at exit', self.name)
+        finally:
+            connections.close_all()
@@ -0,0 +1,66 @@
+"""
+Exceptions for the APIs.
+"""
+from django.db import IntegrityError
+
+from rest_framework import exceptions, status, views
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    """Object changed since the version the client based its request on."""
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Resource was changed since you loaded it.'
+    default_code = 'precondition_failed'
+
+
+class Conflict(APIException):
+    """Request conflicts with the current state of the data."""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Request conflicts with the current state.'
+    default_code = 'conflict'
+
+
+# Database constraints whose violations are reported to clients, with
+# the error reported for them.
+CONSTRAINT_ERRORS = {
+    'book_available_quantity_non_negative': lambda: Conflict(
+        'Not enough copies of the book are available.', 'out_of_stock'
+    ),
+    'review_unique_user_book': lambda: Conflict(
+        'You have already reviewed this book.', 'duplicate_review'
+    ),
+    'review_value_range': lambda: exceptions.ValidationError(
+        {'value': ['Ensure this value is between 0 and 5.']}
+    ),
+}
+
+
+def constraint_name(exc):
+    """Return name of the constraint an IntegrityError violated, if any."""
+    diag = getattr(exc.__cause__, 'diag', None)
+    return getattr(diag, 'constraint_name', None)
+
+
+def constraint_error(exc):
+    """Return API error for an IntegrityError of a known constraint.
+
+    The constraint is named by the database driver, the error message is
+    searched for names only when the driver does not tell.
+    """
+    name = constraint_name(exc)
+    if name is not None:
+        error = CONSTRAINT_ERRORS.get(name)
+        return error() if error else None
+    message = str(exc)
+    for name, error in CONSTRAINT_ERRORS.items():
+        if name in message:
+            return error()
+    return None
+
+
+def exception_handler(exc, context):
+    """Handle errors like rest_framework, plus constraint violations."""
+    if isinstance(exc, IntegrityError):
+        exc = constraint_error(exc) or exc
+    return views.exception_handler(exc, context)
@@ -0,0 +1,104 @@
+"""
+Per-request SQL and timing instrumentation.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+_current = ContextVar('request_stats', default=None)
+
+_in_list_re = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    """Return sql with IN lists collapsed so N+1 variants match."""
+    return _in_list_re.sub('IN (...)', sql)
+
+
+def view_name(view_func, request):
+    """Return 'ViewSet.action' style name of a resolved view."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__qualname__', repr(view_func))
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{cls.__name__}.{action}'
+
+
+class RequestStats:
+    """SQL and timing measurements collected while serving one request."""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.timings = Counter()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook counting and timing queries."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        """Return (sql, count) of queries repeated often enough to flag."""
+        threshold = settings.QUERY_INSTRUMENTATION_DUPLICATES
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def server_timing(self, total):
+        """Return value of the Server-Timing header."""
+        sql_ms = self.sql_time * 1000
+        metrics = [f'db;dur={sql_ms:.2f};desc="{self.queries} queries"']
+        for name, duration in self.timings.items():
+            metrics.append(f'{name};dur={duration * 1000:.2f}')
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+
+def current_stats():
+    """Return RequestStats of the request being served, if instrumented."""
+    return _current.get()
+
+
+@contextmanager
+def timer(name):
+    """Add time spent in the block to the current request's timings."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] += time.perf_counter() - start
+
+
+@contextmanager
+def collect(stats, timers=True):
+    """Record queries on every connection, and timers if asked, in stats."""
+    token = _current.set(stats) if timers else None
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(stats.execute_wrapper)
+                )
+            yield stats
+    finally:
+        if token is not None:
+            _current.reset(token)
@@ -0,0 +1,80 @@
+"""
+Django command to run a benchmark suite against a throwaway database.
+"""
+import importlib
+import json
+import platform
+import subprocess
+
+from django.utils import timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+SUITES = ['api', 'renderers', 'serializers']
+
+
+class Command(BaseCommand):
+    """Django command to run benchmarks."""
+    help = 'Run a benchmark suite from the benchmarks package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=SUITES)
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000],
+            help='Dataset sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement, the fastest one is reported.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write results as JSON to this file.',
+        )
+
+    def environment(self):
+        """Return commit and platform details stored with results."""
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'date': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+        }
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        suite = importlib.import_module(f'benchmarks.{options["suite"]}')
+        old_name = connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+        )
+        try:
+            results = suite.run(options['rows'], options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for result in results:
+            self.stdout.write(json.dumps(result))
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'suite': options['suite'],
+                    'repeat': options['repeat'],
+                    **self.environment(),
+                    'results': results,
+                }, output, indent=2)
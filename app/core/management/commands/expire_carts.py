@@ -0,0 +1,51 @@
+"""
+Django command to release stock reserved by abandoned carts.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import OrderItem
+
+
+class Command(BaseCommand):
+    """Django command to expire stale cart items."""
+    help = 'Release stock reserved by cart items older than the TTL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl',
+            type=int,
+            default=settings.CART_RESERVATION_TTL_MINUTES,
+            help='Reservation lifetime in minutes.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of cart items released per transaction.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and sweep every INTERVAL seconds.',
+        )
+
+    def sweep(self, ttl, batch_size):
+        """Release every reservation older than ttl minutes."""
+        cutoff = timezone.now() - timedelta(minutes=ttl)
+        released = OrderItem.objects.release_stale(cutoff, batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(f'Released {released} cart items.')
+        )
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        self.sweep(options['ttl'], options['batch_size'])
+        while options['interval'] > 0:
+            time.sleep(options['interval'])
+            self.sweep(options['ttl'], options['batch_size'])
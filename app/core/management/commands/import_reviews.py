@@ -0,0 +1,64 @@
+"""
+Django command to import reviews in bulk.
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book import imports
+
+
+class Command(BaseCommand):
+    """Django command to import reviews from a file."""
+    help = (
+        'Import reviews from a JSON lines or CSV file with user (id or '
+        'email), book, value, comment and created_at fields.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, '-' for stdin.")
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'csv'],
+            help='Format of the file, guessed from its extension.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Reviews inserted per statement.',
+        )
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        parse = imports.parse_csv if file_format == 'csv' \
+            else imports.parse_jsonl
+
+        try:
+            if path == '-':
+                counts = imports.import_reviews(
+                    parse(sys.stdin), options['batch_size']
+                )
+            else:
+                with open(path, newline='', encoding='utf-8') as lines:
+                    counts = imports.import_reviews(
+                        parse(lines), options['batch_size']
+                    )
+        except imports.ImportAborted as exc:
+            raise CommandError(
+                f'{path} is not valid UTF-8 after {self.summary(exc.counts)}'
+            )
+
+        self.stdout.write(self.style.SUCCESS(self.summary(counts)))
+
+    def summary(self, counts):
+        """Return counts of an import as a sentence."""
+        return (
+            'Imported {imported} reviews of {books} books, '
+            '{duplicates} duplicates and {skipped} invalid rows '
+            'skipped.'.format(**counts)
+        )
@@ -0,0 +1,47 @@
+"""
+Django command to recompute book popularity rankings.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from book import rankings
+from core.models import BookRanking
+
+
+class Command(BaseCommand):
+    """Django command to refresh book rankings."""
+    help = 'Recompute bestseller, most liked and top rated rankings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            action='append',
+            choices=[kind for kind, _ in BookRanking.KIND_CHOICES],
+            help='Ranking to refresh, all by default. Can be repeated.',
+        )
+        parser.add_argument(
+            '--size',
+            type=int,
+            help='Books per ranking.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and refresh every INTERVAL seconds.',
+        )
+
+    def refresh(self, kinds, size):
+        """Recompute rankings once."""
+        count = rankings.refresh(kinds, size)
+        self.stdout.write(
+            self.style.SUCCESS(f'Stored {count} ranking rows.')
+        )
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        self.refresh(options['kind'], options['size'])
+        while options['interval'] > 0:
+            time.sleep(options['interval'])
+            self.refresh(options['kind'], options['size'])
@@ -0,0 +1,86 @@
+"""
+Django command to run background job workers.
+"""
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from job.runner import work, worker_name
+
+
+def run_worker(index, poll_interval, burst, stop):
+    """Entry point of a forked worker process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(worker_name(index), poll_interval, burst, stop)
+
+
+class Command(BaseCommand):
+    """Django command to process queued jobs."""
+    help = 'Run workers claiming and executing background jobs.'
+    context = multiprocessing.get_context('fork')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Number of worker processes.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            help='Seconds to wait when no job is due.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due.',
+        )
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        stop = self.context.Event()
+        poll_interval = options['poll_interval']
+        burst = options['burst']
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        previous = {
+            signum: signal.signal(signum, shutdown)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            self.start_workers(
+                options['concurrency'], poll_interval, burst, stop
+            )
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def start_workers(self, concurrency, poll_interval, burst, stop):
+        """Run workers in this process, or in concurrency forks."""
+        if concurrency == 1:
+            count = work(worker_name(), poll_interval, burst, stop)
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs.'))
+            return
+
+        # Forked children must not share the parent's connections.
+        connections.close_all()
+        processes = [
+            self.context.Process(
+                target=run_worker,
+                args=(index, poll_interval, burst, stop),
+                daemon=True,
+            )
+            for index in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stopped {len(processes)} workers.'
+        ))
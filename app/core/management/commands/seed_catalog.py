@@ -0,0 +1,97 @@
+"""
+Django command to fill the database with a synthetic catalog.
+"""
+from django.core.management.base import BaseCommand
+
+from benchmarks import catalog
+
+
+class Command(BaseCommand):
+    """Django command to generate books, reviews, carts and orders."""
+    help = 'Bulk insert a synthetic catalog for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--books',
+            type=int,
+            default=100000,
+            help='Number of books.',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help='Number of users, defaults to a tenth of the books.',
+        )
+        parser.add_argument(
+            '--attributes',
+            type=int,
+            help='Number of genres, authors, languages, bookshelves and '
+                 'publishers each, defaults to a fiftieth of the books.',
+        )
+        parser.add_argument(
+            '--reviews-per-book',
+            type=int,
+            default=5,
+        )
+        parser.add_argument(
+            '--cart-items',
+            type=int,
+            default=3,
+            help='Cart items per user.',
+        )
+        parser.add_argument(
+            '--liked-items',
+            type=int,
+            default=3,
+            help='Liked books per user.',
+        )
+        parser.add_argument(
+            '--owned-books',
+            type=int,
+            default=3,
+            help='Purchased books per user.',
+        )
+        parser.add_argument(
+            '--orders',
+            type=int,
+            default=1,
+            help='Paid orders per user.',
+        )
+        parser.add_argument(
+            '--items-per-order',
+            type=int,
+            default=2,
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per INSERT statement, and books or users per '
+                 'transaction.',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed, the same seed generates the same data.',
+        )
+
+    def handle(self, *args, **options):
+        """Endpoint for command."""
+        counts = catalog.generate(
+            books=options['books'],
+            users=options['users'],
+            attributes=options['attributes'],
+            reviews_per_book=options['reviews_per_book'],
+            cart_items=options['cart_items'],
+            liked_items=options['liked_items'],
+            owned_books=options['owned_books'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        summary = ', '.join(f'{count} {name}' for name, count in
+                            counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Created {summary}.'))
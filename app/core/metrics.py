@@ -0,0 +1,422 @@
+"""
+Prometheus-style metrics.
+
+Every process keeps its metrics in memory. With METRICS_DIR set, each
+process also dumps a snapshot to METRICS_DIR/metrics_<pid>.json at most
+every METRICS_FLUSH_INTERVAL seconds, and the /metrics endpoint merges
+the snapshots of all worker processes sharing the directory. Once a
+process flushed, a background thread keeps flushing it, so snapshots of
+idle workers stay fresh.
+
+Counters and histograms of processes that exited are folded into
+METRICS_DIR/metrics_dead.json before their snapshot is deleted, so
+totals never go backwards. Gauges of exited processes, and of processes
+whose snapshot is older than METRICS_SNAPSHOT_TTL seconds, are left out.
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Metric:
+    """Base class for metrics with optional labels."""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        """Return JSON serializable description and values of metric."""
+        with self._lock:
+            values = [
+                [list(key), self._copy(value)]
+                for key, value in self._values.items()
+            ]
+        return {
+            'type': self.type,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'values': values,
+        }
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    """Monotonically increasing value."""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down.
+
+    Values of several processes are summed, or with ``mode='max'`` the
+    largest one is reported.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), mode='sum'):
+        super().__init__(name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['mode'] = self.mode
+        return snapshot
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    'buckets': [0] * len(self.buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def snapshot(self):
+        snapshot = super().snapshot()
+        snapshot['bounds'] = list(self.buckets)
+        return snapshot
+
+    def _copy(self, value):
+        return dict(value, buckets=list(value['buckets']))
+
+
+class Registry:
+    """Collection of metrics of this process."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._flushed = 0.0
+        self._flusher = None
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def snapshot(self):
+        """Return snapshot of every metric keyed by name."""
+        return {
+            name: metric.snapshot()
+            for name, metric in self._metrics.items()
+        }
+
+    def _path(self, name=None):
+        return os.path.join(
+            settings.METRICS_DIR,
+            f'metrics_{name or os.getpid()}.json'
+        )
+
+    def flush(self, force=False):
+        """Write snapshot for other processes if METRICS_DIR is set."""
+        if not settings.METRICS_DIR:
+            return
+        self._ensure_flusher()
+        now = time.monotonic()
+        if not force and now - self._flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed = now
+        write(self._path(), self.snapshot())
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_periodically,
+                name='metrics-flush',
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush(force=True)
+            except Exception:
+                logger.exception('Flushing metrics failed')
+
+    def collect(self):
+        """Return merged snapshot of all processes."""
+        snapshots = [self.snapshot()]
+        if settings.METRICS_DIR:
+            lock_path = os.path.join(settings.METRICS_DIR, 'metrics.lock')
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                snapshots += self._read_snapshots()
+        return merge(snapshots)
+
+    def _read_snapshots(self):
+        own_path = self._path()
+        dead_path = self._path('dead')
+        pattern = os.path.join(settings.METRICS_DIR, 'metrics_*.json')
+        oldest = time.time() - settings.METRICS_SNAPSHOT_TTL
+        dead = read(dead_path) or {}
+        snapshots = []
+        for path in glob.glob(pattern):
+            pid = os.path.basename(path)[len('metrics_'):-len('.json')]
+            if path == own_path or not pid.isdigit():
+                continue
+            try:
+                stale = os.path.getmtime(path) < oldest
+            except OSError:
+                continue
+            snapshot = read(path)
+            if snapshot is None:
+                continue
+            if process_alive(int(pid)):
+                snapshots.append(
+                    without_gauges(snapshot) if stale else snapshot
+                )
+                continue
+            dead = merge([dead, without_gauges(snapshot)], values=list)
+            write(dead_path, dead)
+            os.remove(path)
+        snapshots.append(dead)
+        return snapshots
+
+    def render(self):
+        """Return metrics in the Prometheus text exposition format."""
+        return render(self.collect())
+
+
+def process_alive(pid):
+    """Return whether a process with pid runs on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read(path):
+    """Return snapshot stored at path, or None if it cannot be read."""
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write(path, snapshot):
+    """Atomically store snapshot at path."""
+    with open(f'{path}.tmp', 'w') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+    os.replace(f'{path}.tmp', path)
+
+
+def without_gauges(snapshot):
+    """Return snapshot without gauges, which only live processes report."""
+    return {
+        name: metric
+        for name, metric in snapshot.items()
+        if metric['type'] != 'gauge'
+    }
+
+
+def merge(snapshots, values=dict):
+    """Merge snapshots of several processes into one.
+
+    Values of each merged metric are a dict keyed by label tuples, or
+    with ``values=list`` a JSON serializable list like in snapshots.
+    """
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, dict(metric, values={}))
+            for labels, value in metric['values']:
+                key = tuple(labels)
+                current = target['values'].get(key)
+                if current is None:
+                    target['values'][key] = (
+                        dict(value, buckets=list(value['buckets']))
+                        if metric['type'] == 'histogram' else value
+                    )
+                elif metric['type'] == 'histogram':
+                    current['sum'] += value['sum']
+                    current['count'] += value['count']
+                    current['buckets'] = [
+                        a + b for a, b in zip(current['buckets'],
+                                              value['buckets'])
+                    ]
+                elif metric.get('mode') == 'max':
+                    target['values'][key] = max(current, value)
+                else:
+                    target['values'][key] = current + value
+    if values is list:
+        for metric in merged.values():
+            metric['values'] = [
+                [list(key), value] for key, value in metric['values'].items()
+            ]
+    return merged
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render(merged):
+    """Render merged snapshot in the Prometheus text format."""
+    lines = []
+    for name, metric in sorted(merged.items()):
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        names = metric['labelnames']
+        for key, value in sorted(metric['values'].items()):
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_format_labels(names, key)} {value}')
+                continue
+            for bound, count in zip(metric['bounds'], value['buckets']):
+                labels = _format_labels(names, key, [('le', bound)])
+                lines.append(f'{name}_bucket{labels} {count}')
+            labels = _format_labels(names, key, [('le', '+Inf')])
+            lines.append(f'{name}_bucket{labels} {value["count"]}')
+            labels = _format_labels(names, key)
+            lines.append(f'{name}_sum{labels} {value["sum"]}')
+            lines.append(f'{name}_count{labels} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Request latency by route and view action.',
+    ['route', 'view', 'method'],
+)
+DB_QUERIES = REGISTRY.counter(
+    'db_queries_total',
+    'Database queries run by view action.',
+    ['view'],
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total',
+    'Cache lookups by cache and result (hit or miss).',
+    ['cache', 'result'],
+)
+RESERVATION_CONFLICTS = REGISTRY.counter(
+    'inventory_reservation_conflicts_total',
+    'Cart items rejected because the book is out of stock.',
+)
+RATING_RECOMPUTES = REGISTRY.counter(
+    'rating_recomputes_total',
+    'Book rating recalculations.',
+)
+TOKEN_AUTH_LOOKUPS = REGISTRY.counter(
+    'token_auth_lookups_total',
+    'Token authentication lookups by result.',
+    ['result'],
+)
+DEFERRED_TASKS_QUEUED = REGISTRY.counter(
+    'deferred_tasks_queued_total',
+    'Keys queued for deferred work, before coalescing.',
+    ['queue'],
+)
+DEFERRED_TASKS_HANDLED = REGISTRY.counter(
+    'deferred_tasks_handled_total',
+    'Keys handled by deferred work after coalescing.',
+    ['queue'],
+)
+DEFERRED_TASKS_DEPTH = REGISTRY.gauge(
+    'deferred_tasks_depth',
+    'Committed keys waiting for the deferred work thread.',
+    ['queue'],
+)
+DEFERRED_TASKS_COALESCING = REGISTRY.gauge(
+    'deferred_tasks_coalescing_ratio',
+    'Queued keys per handled key since process start.',
+    ['queue'],
+    mode='max',
+)
+JOBS_RUN = REGISTRY.counter(
+    'jobs_run_total',
+    'Background job runs by task and resulting status.',
+    ['name', 'status'],
+)
+JOB_DURATION = REGISTRY.histogram(
+    'job_duration_seconds',
+    'Background job run time by task.',
+    ['name'],
+)
+REPLICA_LAG = REGISTRY.gauge(
+    'db_replica_lag_seconds',
+    'Replication lag of read replicas when last checked.',
+    ['database'],
+    mode='max',
+)
+REPLICA_READS = REGISTRY.counter(
+    'db_replica_reads_total',
+    'Replica routed API requests by whether a replica or, for users'
+    ' pinned after a write, the primary served them.',
+    ['target'],
+)
@@ -0,0 +1,266 @@
+"""
+Middleware for the APIs.
+"""
+import hashlib
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils import timezone
+from django.utils.text import compress_sequence, compress_string
+
+import brotli
+
+from core import instrumentation, metrics, profiling
+from core.instrumentation import RequestStats
+
+logger = logging.getLogger('core.instrumentation')
+
+
+def accepted_encodings(header):
+    """Return encodings from an Accept-Encoding header with q > 0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _brotli_sequence(sequence):
+    """Like compress_sequence, but with brotli."""
+    compressor = brotli.Compressor(quality=5)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with brotli or gzip, whichever client accepts.
+
+    Responses shorter than COMPRESSION_MIN_SIZE bytes are sent as is and
+    streaming responses are compressed chunk by chunk. When
+    COMPRESSION_CACHE_ALIAS names a cache, compressed bodies are stored
+    there keyed by a digest of the body, so repeated responses are not
+    compressed again.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and \
+                len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                compressed = _brotli_sequence(response.streaming_content)
+            else:
+                compressed = compress_sequence(response.streaming_content)
+            response.streaming_content = compressed
+            del response.headers['Content-Length']
+        else:
+            content = self.compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+    def compress(self, content, encoding):
+        """Return content compressed with encoding, cached if enabled."""
+        alias = settings.COMPRESSION_CACHE_ALIAS
+        if not alias or len(content) > settings.COMPRESSION_CACHE_MAX_SIZE:
+            return self._compress(content, encoding)
+
+        cache = caches[alias]
+        digest = hashlib.sha1(content).hexdigest()
+        key = f'compressed:{encoding}:{digest}'
+        compressed = cache.get(key)
+        if compressed is None:
+            metrics.CACHE_REQUESTS.inc(cache='compression', result='miss')
+            compressed = self._compress(content, encoding)
+            cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='compression', result='hit')
+        return compressed
+
+    def _compress(self, content, encoding):
+        if encoding == 'br':
+            return brotli.compress(content, quality=5)
+        return compress_string(content)
+
+
+class QueryInstrumentationMiddleware:
+    """Measure queries, SQL time and serializer time of every request.
+
+    Results go to the Server-Timing header and the core.instrumentation
+    logger; repeated query fingerprints (likely N+1) are logged as
+    warnings naming the view action. Enable with QUERY_INSTRUMENTATION.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with instrumentation.collect(RequestStats()) as stats:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = stats.server_timing(total)
+        self.log(request, response, stats, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = instrumentation.current_stats()
+        if stats is not None:
+            stats.view = instrumentation.view_name(view_func, request)
+
+    def log(self, request, response, stats, total):
+        """Write request measurements to the instrumentation logger."""
+        view = stats.view or request.path
+        extra = {
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'timings_ms': {
+                name: round(duration * 1000, 2)
+                for name, duration in stats.timings.items()
+            },
+        }
+        logger.info(
+            '%s %s: %d queries in %.2fms',
+            request.method, view, stats.queries, stats.sql_time * 1000,
+            extra=extra,
+        )
+        for sql, count in stats.duplicates():
+            logger.warning(
+                'Duplicate query in %s, %d times: %s', view, count, sql,
+                extra={'view': view, 'count': count, 'sql': sql},
+            )
+
+
+class MetricsMiddleware:
+    """Record request latency and query counts per route and view action."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        start = time.perf_counter()
+        with instrumentation.collect(stats, timers=False):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        view = getattr(request, '_metrics_view', route)
+        metrics.REQUEST_LATENCY.observe(
+            duration,
+            route=route,
+            view=view,
+            method=request.method,
+        )
+        metrics.DB_QUERIES.inc(stats.queries, view=view)
+        metrics.REGISTRY.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = instrumentation.view_name(view_func, request)
+
+
+class ProfilingMiddleware:
+    """Keep sampled stack profiles of slow requests for admins.
+
+    A PROFILING_SAMPLE_RATE fraction of requests is profiled; profiles of
+    those taking at least PROFILING_SLOW_THRESHOLD_MS are kept in the
+    ring buffer, tagged with the view action. Enable with PROFILING.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        sampler = profiling.StackSampler(
+            settings.PROFILING_INTERVAL,
+            root=type(self).__call__.__code__,
+        )
+        started = timezone.now()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if duration_ms >= settings.PROFILING_SLOW_THRESHOLD_MS \
+                and sampler.stacks:
+            view = getattr(request, '_profiling_view', request.path)
+            profile_id = profiling.PROFILES.add({
+                'view': view,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'started': started.isoformat(),
+                'duration_ms': round(duration_ms, 2),
+                'interval_ms': settings.PROFILING_INTERVAL * 1000,
+                'samples': sum(sampler.stacks.values()),
+                'stacks': sampler.stacks,
+            })
+            logger.warning(
+                'Slow request %s %s took %.2fms, profile %s',
+                request.method, view, duration_ms, profile_id,
+                extra={'view': view, 'profile': profile_id},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_view = instrumentation.view_name(
+            view_func, request
+        )
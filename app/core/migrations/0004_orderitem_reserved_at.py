@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2022-11-20 10:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_auto_20221113_1110'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='reserved_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
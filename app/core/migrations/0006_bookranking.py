@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2022-12-04 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('bestsellers', 'Bestsellers'), ('most_liked', 'Most liked'), ('top_rated', 'Top rated')], max_length=20)),
+                ('position', models.IntegerField()),
+                ('score', models.FloatField()),
+                ('refreshed_at', models.DateTimeField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.book')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.genre')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookranking',
+            index=models.Index(fields=['kind', 'genre', 'position'], name='core_bookra_kind_4d9c4a_idx'),
+        ),
+    ]
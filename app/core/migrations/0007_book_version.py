@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2022-12-06 18:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_bookranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.16 on 2022-12-08 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_book_version'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.CheckConstraint(check=models.Q(('available_quantity__gte', 0)), name='book_available_quantity_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='review',
+            constraint=models.CheckConstraint(check=models.Q(('value__gte', 0), ('value__lte', 5)), name='review_value_range'),
+        ),
+    ]
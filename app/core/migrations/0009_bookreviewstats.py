@@ -0,0 +1,56 @@
+# Generated by Django 3.2.16 on 2022-12-10 12:31
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+import django.db.models.deletion
+
+
+def create_review_stats(apps, schema_editor):
+    """Compute statistics of existing books from their reviews."""
+    Book = apps.get_model('core', 'Book')
+    Review = apps.get_model('core', 'Review')
+    BookReviewStats = apps.get_model('core', 'BookReviewStats')
+
+    rows = Review.objects.values('book_id').annotate(
+        review_count=Count('id'),
+        value_sum=Sum('value'),
+        last_review_at=Max('created_at'),
+        **{
+            f'count_{value}': Count('id', filter=Q(value=value))
+            for value in range(6)
+        }
+    ).order_by()
+    stats = {row['book_id']: BookReviewStats(**row) for row in rows}
+    BookReviewStats.objects.bulk_create(
+        (
+            stats.get(book_id, BookReviewStats(book_id=book_id))
+            for book_id in Book.objects.values_list('id', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_check_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookReviewStats',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='core.book')),
+                ('review_count', models.IntegerField(default=0)),
+                ('value_sum', models.IntegerField(default=0)),
+                ('count_0', models.IntegerField(default=0)),
+                ('count_1', models.IntegerField(default=0)),
+                ('count_2', models.IntegerField(default=0)),
+                ('count_3', models.IntegerField(default=0)),
+                ('count_4', models.IntegerField(default=0)),
+                ('count_5', models.IntegerField(default=0)),
+                ('last_review_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_review_stats, migrations.RunPython.noop),
+    ]
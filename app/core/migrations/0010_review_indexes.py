@@ -0,0 +1,21 @@
+# Generated by Django 3.2.16 on 2022-12-12 09:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_bookreviewstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'created_at'], name='core_review_book_id_c2048d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['book', 'value', 'created_at'], name='core_review_book_id_56bc2c_idx'),
+        ),
+    ]
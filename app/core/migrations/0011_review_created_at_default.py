@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2022-12-14 16:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_review_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
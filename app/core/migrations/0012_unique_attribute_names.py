@@ -0,0 +1,135 @@
+# Generated by Django 3.2.16 on 2022-12-16 10:21
+
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+import core.references
+
+ATTRIBUTES = {
+    'genres': 'Genre',
+    'authors': 'Author',
+    'languages': 'Language',
+    'bookshelves': 'BookShelf',
+    'publishers': 'Publisher',
+}
+
+
+def merge_duplicates(apps, schema_editor):
+    """Keep the oldest row of every normalized name, repoint books to it.
+
+    Rankings of merged genres are deleted with them and come back on the
+    next refresh. Deferred foreign key checks of the changed rows are run
+    at the end, as PostgreSQL refuses to alter tables with pending ones.
+    """
+    Book = apps.get_model('core', 'Book')
+    for relation, model_name in ATTRIBUTES.items():
+        model = apps.get_model('core', model_name)
+        has_description = any(
+            field.name == 'description' for field in model._meta.fields
+        )
+        keep, merged, updated = {}, {}, []
+        for row in model.objects.order_by('id'):
+            row.name_key = core.references.normalize_name(row.name)
+            kept = keep.setdefault(row.name_key, row)
+            if kept is row:
+                updated.append(row)
+                continue
+            merged[row.id] = kept.id
+            if has_description and not kept.description:
+                kept.description = row.description
+        model.objects.bulk_update(
+            updated,
+            ['name_key', 'description'] if has_description else ['name_key'],
+            batch_size=1000,
+        )
+        if not merged:
+            continue
+
+        field = Book._meta.get_field(relation)
+        through = field.remote_field.through
+        column = field.m2m_reverse_field_name() + '_id'
+        links = through.objects.filter(
+            **{f'{column}__in': [*merged, *set(merged.values())]}
+        ).order_by('id').values_list('id', 'book_id', column)
+        linked, duplicate_links = set(), []
+        for link_id, book_id, related_id in links:
+            key = book_id, merged.get(related_id, related_id)
+            if key in linked:
+                duplicate_links.append(link_id)
+            linked.add(key)
+        through.objects.filter(id__in=duplicate_links).delete()
+        through.objects.filter(**{f'{column}__in': merged}).update(**{
+            column: Case(*(
+                When(**{column: old_id}, then=Value(new_id))
+                for old_id, new_id in merged.items()
+            ))
+        })
+        model.objects.filter(id__in=merged).delete()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_review_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='name_key',
+            field=core.references.NameKeyField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='bookshelf',
+            name='name_key',
+            field=core.references.NameKeyField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='genre',
+            name='name_key',
+            field=core.references.NameKeyField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='language',
+            name='name_key',
+            field=core.references.NameKeyField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='publisher',
+            name='name_key',
+            field=core.references.NameKeyField(default='', max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='author',
+            constraint=models.UniqueConstraint(
+                fields=('name_key',), name='author_unique_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookshelf',
+            constraint=models.UniqueConstraint(
+                fields=('name_key',), name='bookshelf_unique_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='genre',
+            constraint=models.UniqueConstraint(
+                fields=('name_key',), name='genre_unique_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='language',
+            constraint=models.UniqueConstraint(
+                fields=('name_key',), name='language_unique_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='publisher',
+            constraint=models.UniqueConstraint(
+                fields=('name_key',), name='publisher_unique_name'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+
+
+def rename_unique_together(apps, schema_editor, old=None, new=None):
+    """Rename the unique constraint of a review's user and book."""
+    Review = apps.get_model('core', 'Review')
+    table = Review._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        constraints = schema_editor.connection.introspection \
+            .get_constraints(cursor, table)
+    for name, constraint in constraints.items():
+        if constraint['unique'] and not constraint['primary_key'] and \
+                constraint['columns'] == ['user_id', 'book_id'] and \
+                (old is None or name == old):
+            schema_editor.execute(
+                'ALTER TABLE %s RENAME CONSTRAINT %s TO %s' % (
+                    schema_editor.quote_name(table),
+                    schema_editor.quote_name(name),
+                    schema_editor.quote_name(new),
+                )
+            )
+
+
+def name_constraint(apps, schema_editor):
+    rename_unique_together(apps, schema_editor, new='review_unique_user_book')
+
+
+def unname_constraint(apps, schema_editor):
+    rename_unique_together(
+        apps, schema_editor,
+        old='review_unique_user_book',
+        new='core_review_user_id_book_id_191f9f07_uniq',
+    )
+
+
+class Migration(migrations.Migration):
+    """Name the unique constraint of reviews so violations are reported.
+
+    Renaming keeps the index, so no table is rebuilt.
+    """
+
+    dependencies = [
+        ('core', '0012_unique_attribute_names'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(name_constraint, unname_constraint),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name='review',
+                    unique_together=set(),
+                ),
+                migrations.AddConstraint(
+                    model_name='review',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'book'),
+                        name='review_unique_user_book',
+                    ),
+                ),
+            ],
+        ),
+    ]
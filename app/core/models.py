@@ -2,22 +2,50 @@
 Database models.
 """
 
-from django.db import models
+from django.db import DatabaseError, IntegrityError, models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import MaxValueValidator, MinValueValidator
 
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
-from django.db.models import Avg
+from django.db.models import (
+    Avg,
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce, Greatest
 from decimal import Decimal
 
+from core import metrics, references
+from core.batching import batched, signals_batched
+from core.deferred import DeferredQueue
+
+
+class UserQuerySet(models.QuerySet):
+    """QuerySet for users."""
 
-class UserManager(BaseUserManager):
+    def delete(self):
+        """Delete users, handling their carts and reviews in batches."""
+        with signals_batched():
+            return super().delete()
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     """Manager for users."""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -57,49 +85,104 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def delete(self, *args, **kwargs):
+        """Delete user, handling their cart and reviews in batches."""
+        with signals_batched():
+            return super().delete(*args, **kwargs)
+
 
+@references.register
 class Publisher(models.Model):
     """Publishers for book."""
     name = models.CharField(max_length=255)
+    name_key = references.NameKeyField()
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name_key'],
+                name='publisher_unique_name',
+            ),
+        ]
+
 
+@references.register
 class BookShelf(models.Model):
     """Bookshelfs for book."""
     name = models.CharField(max_length=255)
+    name_key = references.NameKeyField()
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name_key'],
+                name='bookshelf_unique_name',
+            ),
+        ]
+
 
+@references.register
 class Language(models.Model):
     """Languages for book."""
     name = models.CharField(max_length=255)
+    name_key = references.NameKeyField()
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name_key'],
+                name='language_unique_name',
+            ),
+        ]
+
 
+@references.register
 class Author(models.Model):
     """Authors for book."""
     name = models.CharField(max_length=255)
+    name_key = references.NameKeyField()
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name_key'],
+                name='author_unique_name',
+            ),
+        ]
 
+
+@references.register
 class Genre(models.Model):
     """Genres for book."""
     name = models.CharField(max_length=255)
+    name_key = references.NameKeyField()
     description = models.TextField(blank=True)
 
     def __str__(self):
         return self.name
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name_key'],
+                name='genre_unique_name',
+            ),
+        ]
+
 
 class Book(models.Model):
     """Book object."""
@@ -121,10 +204,80 @@ class Book(models.Model):
     bookshelves = models.ManyToManyField(BookShelf)
     publishers = models.ManyToManyField(Publisher)
     rating = models.DecimalField(max_digits=2, decimal_places=1, default=0.0)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = references.ReferenceQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=Q(available_quantity__gte=0),
+                name='book_available_quantity_non_negative',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        book = super().from_db(db, field_names, values)
+        # Stock as loaded, so saves leave reservations made since alone.
+        book._saved_quantity = book.__dict__.get('available_quantity')
+        return book
+
+    def _do_insert(self, manager, using, fields, returning_fields, raw):
+        results = super()._do_insert(manager, using, fields,
+                                     returning_fields, raw)
+        self._saved_quantity = self.available_quantity
+        return results
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        """Update the row only if it still has this version, bump it.
+
+        Saves of a stale book raise StaleBookError instead of overwriting
+        changes made since it was loaded. Cart reservations do not bump
+        the version, so an unchanged available_quantity is not written.
+        """
+        if self._state.adding:
+            return super()._do_update(base_qs, using, pk_val, values,
+                                      update_fields, forced_update)
+        version = self._meta.get_field('version')
+        quantity = self._meta.get_field('available_quantity')
+        unchanged = getattr(self, '_saved_quantity', None) \
+            == self.available_quantity
+        values = [
+            value for value in values
+            if value[0] is not version
+            and not (value[0] is quantity and unchanged)
+        ]
+        values.append((version, None, F('version') + 1))
+        updated = super()._do_update(
+            base_qs.filter(version=self.version), using, pk_val, values,
+            update_fields, forced_update,
+        )
+        if not updated:
+            raise StaleBookError(
+                f'Book {pk_val} changed since version {self.version}.'
+            )
+        self.version += 1
+        self._saved_quantity = self.available_quantity
+        return updated
+
+
+class StaleBookError(DatabaseError):
+    """Book was changed by someone else since it was loaded."""
+
+
+class ReviewQuerySet(models.QuerySet):
+    """QuerySet for reviews."""
+
+    def delete(self):
+        """Delete reviews, updating statistics once per book."""
+        with signals_batched():
+            return super().delete()
+
 
 class Review(models.Model):
     """Review object for book."""
@@ -141,37 +294,287 @@ class Review(models.Model):
             MinValueValidator(0)
         ]
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so imported reviews keep their original date.
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = ReviewQuerySet.as_manager()
 
     def __str__(self):
         return f"{str(self.book)} | {str(self.user)} | {self.value}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        # Value and book as stored, so review_created_handler can move
+        # the review between star counts or books when they are edited.
+        review._saved_value = review.__dict__.get('value')
+        review._saved_book_id = review.__dict__.get('book_id')
+        return review
+
     class Meta:
-        # user can't have more than one review to one book
-        unique_together = (("user", "book"),)
+        # Back the orderings of the paginated reviews of a book.
+        indexes = [
+            models.Index(fields=['book', 'created_at']),
+            models.Index(fields=['book', 'value', 'created_at']),
+        ]
+        constraints = [
+            # user can't have more than one review to one book
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                name='review_unique_user_book',
+            ),
+            models.CheckConstraint(
+                check=Q(value__gte=0) & Q(value__lte=5),
+                name='review_value_range',
+            ),
+        ]
+
+
+def recompute_ratings(book_ids):
+    """Set rating of books to the average value of their reviews."""
+    average = Review.objects.filter(book=OuterRef('pk')) \
+        .order_by().values('book').annotate(avg=Avg('value')).values('avg')
+    Book.objects.filter(id__in=book_ids).update(
+        rating=Coalesce(
+            Subquery(average, output_field=Book._meta.get_field('rating')),
+            Value(Decimal('0.0')),
+        )
+    )
+    metrics.RATING_RECOMPUTES.inc(len(book_ids))
+
+
+rating_updates = DeferredQueue('ratings', recompute_ratings)
+
+
+class BookReviewStats(models.Model):
+    """Review statistics of a book, kept up to date by review hooks."""
+    VALUES = range(6)
+
+    book = models.OneToOneField(
+        Book,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='review_stats',
+    )
+    review_count = models.IntegerField(default=0)
+    value_sum = models.IntegerField(default=0)
+    count_0 = models.IntegerField(default=0)
+    count_1 = models.IntegerField(default=0)
+    count_2 = models.IntegerField(default=0)
+    count_3 = models.IntegerField(default=0)
+    count_4 = models.IntegerField(default=0)
+    count_5 = models.IntegerField(default=0)
+    last_review_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{str(self.book)} | {self.review_count} reviews"
+
+    @property
+    def mean(self):
+        """Return average review value."""
+        if not self.review_count:
+            return 0.0
+        return round(self.value_sum / self.review_count, 2)
+
+    @property
+    def histogram(self):
+        """Return number of reviews by value."""
+        return {
+            str(value): getattr(self, f'count_{value}')
+            for value in self.VALUES
+        }
+
+
+def recompute_review_stats(book_ids):
+    """Rebuild review statistics of books from their reviews.
+
+    The statistics rows are locked before the reviews are counted and
+    updated in place, so increments of concurrent review hooks wait and
+    apply on top of the rebuilt numbers instead of being lost.
+    """
+    book_ids = list(book_ids)
+    fields = [
+        'review_count', 'value_sum', 'last_review_at',
+        *(f'count_{value}' for value in BookReviewStats.VALUES),
+    ]
+    with transaction.atomic():
+        existing = set(
+            BookReviewStats.objects.select_for_update()
+            .filter(book_id__in=book_ids).order_by('book_id')
+            .values_list('book_id', flat=True)
+        )
+        rows = Review.objects.filter(book_id__in=book_ids) \
+            .values('book_id') \
+            .annotate(
+                review_count=Count('id'),
+                value_sum=Sum('value'),
+                last_review_at=Max('created_at'),
+                **{
+                    f'count_{value}': Count('id', filter=Q(value=value))
+                    for value in BookReviewStats.VALUES
+                }
+            ).order_by()
+        stats = {row['book_id']: BookReviewStats(**row) for row in rows}
+        stats = [
+            stats.get(book_id, BookReviewStats(book_id=book_id))
+            for book_id in book_ids
+        ]
+        BookReviewStats.objects.bulk_update(
+            [row for row in stats if row.book_id in existing], fields
+        )
+        BookReviewStats.objects.bulk_create(
+            [row for row in stats if row.book_id not in existing],
+            ignore_conflicts=True,
+        )
+
+
+def apply_review_stats(changes):
+    """Add changes, {book_id: {field: change}}, to review statistics.
+
+    Books with equal changes are updated together. The time of the latest
+    review is read again, as it may belong to a removed review.
+    """
+    books = {}
+    for book_id, book_changes in changes.items():
+        key = tuple(sorted(
+            (field, change)
+            for field, change in book_changes.items() if change
+        ))
+        books.setdefault(key, []).append(book_id)
+    for key, book_ids in books.items():
+        if key:
+            BookReviewStats.objects.filter(book_id__in=book_ids).update(
+                **{field: F(field) + change for field, change in key}
+            )
+    latest = Review.objects.filter(book=OuterRef('book')) \
+        .order_by('-created_at').values('created_at')[:1]
+    BookReviewStats.objects.filter(book_id__in=changes).update(
+        last_review_at=Subquery(latest)
+    )
+
+
+@receiver(post_save, sender=Book)
+def book_created_handler(sender, instance, created, *args, **kwargs):
+    """Create empty review statistics of a new book."""
+    if created:
+        BookReviewStats.objects.create(book=instance)
 
 
 @receiver(post_save, sender=Review)
 def review_created_handler(sender, instance, created, *args, **kwargs):
-    """Handle create review event to recalculate book rating"""
+    """Count the review in statistics, queue rating recalculation."""
+    rating_updates.add(instance.book_id)
+
+    value = instance.value
+    old_value = None if created else getattr(instance, '_saved_value', None)
+    old_book_id = None if created \
+        else getattr(instance, '_saved_book_id', None)
+    instance._saved_value = value
+    instance._saved_book_id = instance.book_id
+    if old_book_id is not None and old_book_id != instance.book_id:
+        # The review moved to another book, count both books again.
+        rating_updates.add(old_book_id)
+        recompute_review_stats([old_book_id, instance.book_id])
+        return
+    stats = BookReviewStats.objects.filter(book_id=instance.book_id)
     if created:
-        book = Book.objects.get(id=instance.book.id)
-        book.rating = Review.objects.filter(book=instance.book) \
-            .aggregate(Avg('value'))['value__avg']
-        book.save()
+        # Reviews may be inserted out of order, keep the latest time.
+        updated = stats.update(
+            review_count=F('review_count') + 1,
+            value_sum=F('value_sum') + value,
+            last_review_at=Greatest(
+                'last_review_at', Value(instance.created_at)
+            ),
+            **{f'count_{value}': F(f'count_{value}') + 1},
+        )
+    elif old_value is None:
+        # Value before the edit is unknown, count the reviews again.
+        updated = 0
+    elif old_value != value:
+        updated = stats.update(
+            value_sum=F('value_sum') + value - old_value,
+            **{
+                f'count_{old_value}': F(f'count_{old_value}') - 1,
+                f'count_{value}': F(f'count_{value}') + 1,
+            },
+        )
+    else:
+        return
+    if not updated:
+        # No statistics means a missing book, or one inserted in bulk.
+        if not Book.objects.filter(id=instance.book_id).exists():
+            raise Book.DoesNotExist(f'Book {instance.book_id} not found.')
+        recompute_review_stats([instance.book_id])
 
 
 @receiver(post_delete, sender=Review)
 def review_deleted_handler(sender, instance, *args, **kwargs):
-    """Handle create review event to recalculate book rating"""
-    book = Book.objects.get(id=instance.book.id)
-    if Review.objects.filter(book=instance.book):
-        book.rating = Review.objects.filter(book=instance.book) \
-            .aggregate(Avg('value'))['value__avg']
-        book.save()
-    else:
-        book.rating = 0
-        book.save()
+    """Remove the review from statistics, queue rating recalculation."""
+    rating_updates.add(instance.book_id)
+
+    value = instance.value
+    changes = batched(apply_review_stats)
+    in_batch = changes is not None
+    if not in_batch:
+        changes = {}
+    book_changes = changes.setdefault(instance.book_id, {})
+    for field, change in (('review_count', -1), ('value_sum', -value),
+                          (f'count_{value}', -1)):
+        book_changes[field] = book_changes.get(field, 0) + change
+    if not in_batch:
+        apply_review_stats(changes)
+
+
+class OrderItemQuerySet(models.QuerySet):
+    """QuerySet for shopping cart items."""
+
+    def stale(self, cutoff):
+        """Return cart items reserved before cutoff and not yet ordered."""
+        return self.filter(reserved_at__lt=cutoff, order__isnull=True)
+
+    def delete(self):
+        """Delete cart items, returning their stock in one update."""
+        with signals_batched():
+            return super().delete()
+
+
+class OrderItemManager(models.Manager.from_queryset(OrderItemQuerySet)):
+    """Manager for shopping cart items."""
+
+    def release_stale(self, cutoff, batch_size=5000):
+        """Delete stale cart items and return their stock to books.
+
+        Works in batches, each in its own short transaction: lock a batch
+        of stale rows (skipping rows locked by running requests), add the
+        reserved quantities back with one UPDATE grouped by book and
+        delete the batch without firing per-row post_delete handlers.
+        Return the number of released cart items.
+        """
+        released = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                ids = list(
+                    self.stale(cutoff)
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .order_by('id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+
+                batch = self.filter(id__in=ids)
+                reserved = batch.values('book_id') \
+                    .annotate(quantity=Sum('quantity')).order_by()
+                return_stock({
+                    row['book_id']: row['quantity'] for row in reserved
+                })
+                # Stock is already returned above, so skip the collector
+                # and its orderitem_deleted_handler calls.
+                batch._raw_delete(self.db)
+
+            released += len(ids)
+
+        return released
 
 
 class OrderItem(models.Model):
@@ -182,6 +585,9 @@ class OrderItem(models.Model):
     )
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=1)
+    reserved_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = OrderItemManager()
 
     def __str__(self):
         return (f"Book: {str(self.book)} | "
@@ -194,21 +600,45 @@ class OrderItem(models.Model):
 
 @receiver(post_save, sender=OrderItem)
 def orderitem_created_handler(sender, instance, created, *args, **kwargs):
-    """Handle create orderitem event to recalculate book quantity"""
+    """Reserve stock of the book put in the cart."""
     if created:
-        book = Book.objects.get(id=instance.book.id)
-        book.available_quantity = book.available_quantity-instance.quantity
-        book.full_clean()  # ADD SERIALIZER VALIDAION
-        book.save()
+        # Only the stock columns are written, so concurrent edits of the
+        # book are neither overwritten nor need row locks. Running out of
+        # stock violates the book_available_quantity_non_negative
+        # constraint, which the API reports as a conflict.
+        # The version is left alone, stock moving does not make edits of
+        # the book stale.
+        try:
+            Book.objects.filter(id=instance.book_id).update(
+                available_quantity=F('available_quantity')
+                - instance.quantity,
+            )
+        except IntegrityError:
+            metrics.RESERVATION_CONFLICTS.inc()
+            raise
+
+
+def return_stock(quantities):
+    """Add quantities, a dict by book id, back to stock of the books."""
+    returned = Case(
+        *[When(id=book_id, then=quantity)
+          for book_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    Book.objects.filter(id__in=quantities).update(
+        available_quantity=F('available_quantity') + returned,
+    )
 
 
 @receiver(post_delete, sender=OrderItem)
 def orderitem_deleted_handler(sender, instance, *args, **kwargs):
-    """Handle create orderitem event to recalculate book quantity"""
-    book = Book.objects.get(id=instance.book.id)
-    book.available_quantity = book.available_quantity+instance.quantity
-    book.full_clean()  # ADD SERIALIZER VALIDAION
-    book.save()
+    """Return stock of the book removed from the cart."""
+    quantities = batched(return_stock)
+    if quantities is None:
+        return_stock({instance.book_id: instance.quantity})
+    else:
+        quantities[instance.book_id] = \
+            quantities.get(instance.book_id, 0) + instance.quantity
 
 
 class LikedItem(models.Model):
@@ -299,3 +729,72 @@ class Order(models.Model):
             sum += ordereditem.book.price * ordereditem.quantity
 
         return f"Count: {str(self.ordered_items.count())} | Total Price: {sum}"
+
+
+class Job(models.Model):
+    """Background job claimed and run by `manage.py run_workers`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    result = models.JSONField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.id} | {self.status}"
+
+    class Meta:
+        # workers look up due jobs by status and run_at
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+
+class BookRanking(models.Model):
+    """Precomputed position of a book in a popularity ranking."""
+    BESTSELLERS = 'bestsellers'
+    MOST_LIKED = 'most_liked'
+    TOP_RATED = 'top_rated'
+    KIND_CHOICES = [
+        (BESTSELLERS, 'Bestsellers'),
+        (MOST_LIKED, 'Most liked'),
+        (TOP_RATED, 'Top rated'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # ranking of books in genre, or of all books when null
+    genre = models.ForeignKey(
+        Genre,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+    position = models.IntegerField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    score = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.kind} #{self.position} | {str(self.book)}"
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'genre', 'position'])]
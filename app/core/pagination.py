@@ -0,0 +1,140 @@
+"""
+Keyset pagination.
+
+Pages are fetched with a WHERE clause continuing after the last row of
+the previous page instead of an OFFSET, so every page costs one index
+range scan however deep into the results it is.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset pagination with a choice of orderings.
+
+    orderings maps ?ordering= values to model fields ordering the rows,
+    the last of which must be unique. All fields of an ordering must
+    sort in the same direction.
+    """
+    orderings = {}
+    default_ordering = None
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request):
+        """Return name of the ordering requested."""
+        name = request.query_params.get(
+            self.ordering_query_param, self.default_ordering
+        )
+        if name not in self.orderings:
+            raise ValidationError({self.ordering_query_param: [
+                f'Choose one of {", ".join(sorted(self.orderings))}.'
+            ]})
+        return name
+
+    def get_page_size(self, request):
+        """Return page size requested, capped at max_page_size."""
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, name, fields, model):
+        """Return field values of the last row of the previous page."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if data['o'] != name or len(data['v']) != len(fields):
+                raise ValueError
+            values = []
+            for field, value in zip(fields, data['v']):
+                value = model._meta.get_field(field.lstrip('-')) \
+                    .to_python(value)
+                if value is None:
+                    raise ValueError
+                values.append(value)
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, name, fields, row):
+        """Return cursor continuing after row."""
+        values = [_encode(getattr(row, field.lstrip('-'))) for field in fields]
+        data = json.dumps({'o': name, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def after(self, fields, values):
+        """Return filter matching rows after values in fields order.
+
+        The OR chain alone does not bound an index scan, so the first
+        field is also bounded on its own, inclusive of values.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(fields, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first = fields[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        name = self.get_ordering(request)
+        fields = self.orderings[name]
+        size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*fields)
+        values = self.decode_cursor(request, name, fields, queryset.model)
+        if values is not None:
+            queryset = queryset.filter(self.after(fields, values))
+
+        # One extra row tells whether there is a next page.
+        rows = list(queryset[:size + 1])
+        self.next_cursor = None
+        if len(rows) > size:
+            rows = rows[:size]
+            self.next_cursor = self.encode_cursor(name, fields, rows[-1])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor,
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,111 @@
+"""
+Sampling profiler for slow requests.
+
+A background thread samples the stack of the thread serving a request
+every PROFILING_INTERVAL seconds. Samples are kept as collapsed stacks
+(``frame;frame;frame count`` lines), the input format of flamegraph.pl
+and speedscope.
+"""
+import sys
+import threading
+import uuid
+from collections import Counter, deque
+
+from django.conf import settings
+
+
+def frame_name(frame):
+    """Return 'module.function' name of a stack frame."""
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f'{frame.f_globals.get("__name__", "?")}.{name}'
+
+
+class StackSampler:
+    """Sample the stack of one thread from a background thread.
+
+    Frames from ``root`` outwards are left out, so stacks start at the
+    code the profiled block runs.
+    """
+
+    def __init__(self, interval, root=None, thread_id=None):
+        self.interval = interval
+        self.root = root
+        self.thread_id = thread_id or threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.collapse(frame)] += 1
+
+    def collapse(self, frame):
+        """Return ';' separated frame names from outermost to frame."""
+        names = []
+        while frame is not None and frame.f_code is not self.root:
+            names.append(frame_name(frame))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class ProfileBuffer:
+    """Ring buffer of the last slow-request profiles of this process.
+
+    Profiles get random UUIDs, so ids logged by different worker
+    processes never collide.
+    """
+
+    def __init__(self):
+        self._profiles = None
+        self._lock = threading.Lock()
+
+    def _buffer(self):
+        if self._profiles is None:
+            self._profiles = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+        return self._profiles
+
+    def add(self, profile):
+        """Store profile and return the id assigned to it."""
+        with self._lock:
+            profile['id'] = str(uuid.uuid4())
+            self._buffer().append(profile)
+        return profile['id']
+
+    def all(self):
+        """Return stored profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._buffer()))
+
+    def get(self, profile_id):
+        """Return the profile with profile_id, or None if it is gone."""
+        for profile in self.all():
+            if profile['id'] == profile_id:
+                return profile
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._buffer().clear()
+
+
+def collapsed(profile):
+    """Return profile stacks as collapsed stack lines tagged by view."""
+    tag = profile['view'].replace(';', ':').replace(' ', '_')
+    return ''.join(
+        f'{tag};{stack} {count}\n' if stack else f'{tag} {count}\n'
+        for stack, count in profile['stacks'].most_common()
+    )
+
+
+PROFILES = ProfileBuffer()
@@ -0,0 +1,388 @@
+"""
+Process-local cache of small reference tables.
+
+Models decorated with register (genres, authors, languages, bookshelves
+and publishers) change rarely and are read on every book render. Every
+process keeps up to REFERENCE_CACHE_SIZE rows of each of them, dropping
+the least recently used first. Books fetched with with_references() get
+those relations from one query of the join tables plus the cache.
+
+Saving or deleting a row drops the model's rows in the process at once
+and, when the transaction commits, bumps a version key in the default
+cache. Other processes compare that version every
+REFERENCE_CACHE_CHECK_INTERVAL seconds and drop their rows when it
+moved, the default cache must be shared between processes for this.
+Cached rows are dropped REFERENCE_CACHE_TTL seconds after the first of
+them was cached in any case. Rows read while the transaction has
+uncommitted changes of a model are not cached. Writes bypassing
+signals, like bulk_create, must call invalidate().
+
+Reference rows are unique by NameKeyField, a normalized copy of their
+name, and resolve() finds or inserts them by name.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models, transaction
+from django.db.models import IntegerField, Value
+from django.db.models.query import ModelIterable
+from django.db.models.signals import post_delete, post_save
+
+from core import metrics
+
+_state = threading.local()
+_caches = {}
+
+
+def normalize_name(name):
+    """Return name folded for case and whitespace insensitive matching."""
+    return ' '.join(name.split()).casefold()
+
+
+class NameKeyField(models.CharField):
+    """Normalized copy of the name field, refreshed whenever rows are saved.
+
+    Saves with update_fields must list it to store a changed name, and
+    QuerySet.update() leaves it as it is.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', 255)
+        kwargs['editable'] = False
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        del kwargs['editable']
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = normalize_name(model_instance.name)
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def _pending():
+    """Return models with uncommitted changes in this thread."""
+    pending = getattr(_state, 'pending', None)
+    if pending is None:
+        pending = _state.pending = set()
+    if pending and not transaction.get_connection().in_atomic_block:
+        # The transaction that changed them rolled back, rows cached
+        # since may be gone.
+        for model in pending:
+            _caches[model].clear()
+        pending.clear()
+    return pending
+
+
+class ReferenceCache:
+    """Least recently used rows of a model by id and by name."""
+
+    def __init__(self, model):
+        self.model = model
+        self.version_key = f'references:version:{model._meta.label_lower}'
+        self.lock = threading.Lock()
+        self.rows = OrderedDict()
+        self.lookups = OrderedDict()
+        self.loaded_at = None
+        self.version = None
+        self.checked_at = None
+        # Bumped by clear(), rows loaded before are not stored.
+        self.generation = 0
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.lookups.clear()
+            self.loaded_at = None
+            self.generation += 1
+
+    def usable(self):
+        """Sync with the shared version, return whether caching is safe."""
+        if self.model in _pending():
+            return False
+        now = time.monotonic()
+        if self.loaded_at is not None and \
+                now - self.loaded_at >= settings.REFERENCE_CACHE_TTL:
+            self.clear()
+        if self.checked_at is None or \
+                now - self.checked_at >= \
+                settings.REFERENCE_CACHE_CHECK_INTERVAL:
+            version = cache.get(self.version_key, 0)
+            if version != self.version:
+                self.clear()
+                self.version = version
+            self.checked_at = now
+        return True
+
+    def is_warm(self):
+        """Return whether rows were cached since the last change."""
+        return self.usable() and self.loaded_at is not None
+
+    def _put(self, instance):
+        self.rows[instance.pk] = instance
+        self.rows.move_to_end(instance.pk)
+        while len(self.rows) > settings.REFERENCE_CACHE_SIZE:
+            self.rows.popitem(last=False)
+
+    def store(self, instances, generation):
+        """Cache instances and their name lookups.
+
+        generation is the one read before the instances were loaded, they
+        may be stale and are not cached when the rows were cleared since.
+        """
+        if not self.usable():
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            for instance in instances:
+                self._put(instance)
+                self.lookups[instance.name_key] = instance.pk
+                self.lookups.move_to_end(instance.name_key)
+            while len(self.lookups) > settings.REFERENCE_CACHE_SIZE:
+                self.lookups.popitem(last=False)
+            if self.loaded_at is None:
+                self.loaded_at = time.monotonic()
+
+    def get_many(self, ids):
+        """Return dict of instances by id, loading missing ones at once."""
+        usable = self.usable()
+        found, missing = {}, []
+        with self.lock:
+            generation = self.generation
+            for pk in set(ids):
+                instance = self.rows.get(pk) if usable else None
+                if instance is None:
+                    missing.append(pk)
+                else:
+                    self.rows.move_to_end(pk)
+                    found[pk] = instance
+        metrics.CACHE_REQUESTS.inc(len(found), cache='references',
+                                   result='hit')
+        if missing:
+            metrics.CACHE_REQUESTS.inc(len(missing), cache='references',
+                                       result='miss')
+            loaded = list(self.model.objects.filter(pk__in=missing))
+            if usable:
+                self.store(loaded, generation)
+            found.update((instance.pk, instance) for instance in loaded)
+        return found
+
+    def resolve(self, items):
+        """Return rows named like items, inserting the missing ones.
+
+        items are dicts of field values with a name. Names match whatever
+        their case and spacing, other values only apply to new rows.
+        """
+        wanted = {}
+        for item in items:
+            wanted.setdefault(normalize_name(item['name']), item)
+        found = {}
+        usable = self.usable()
+        generation = self.generation
+        if usable:
+            with self.lock:
+                for key in wanted:
+                    instance = self.rows.get(self.lookups.get(key))
+                    if instance is not None:
+                        self.lookups.move_to_end(key)
+                        self.rows.move_to_end(instance.pk)
+                        found[key] = instance
+        metrics.CACHE_REQUESTS.inc(len(found), cache='references',
+                                   result='hit')
+
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            metrics.CACHE_REQUESTS.inc(len(missing), cache='references',
+                                       result='miss')
+            loaded = self.model.objects.filter(name_key__in=missing)
+            found.update((row.name_key, row) for row in loaded)
+            new = [key for key in missing if key not in found]
+            if new:
+                # ON CONFLICT DO NOTHING: a concurrent request may insert
+                # the same names, the unique index keeps one row of each
+                # and both read it back.
+                self.model.objects.bulk_create(
+                    [self.model(**wanted[key]) for key in new],
+                    ignore_conflicts=True,
+                )
+                mark_changed(self.model)
+                loaded = self.model.objects.filter(name_key__in=new)
+                found.update((row.name_key, row) for row in loaded)
+            self.store((found[key] for key in missing), generation)
+        return [found[key] for key in wanted]
+
+    def bump(self):
+        """Tell every process the rows of the model changed."""
+        cache.add(self.version_key, 0, None)
+        self.version = cache.incr(self.version_key)
+        self.checked_at = time.monotonic()
+        self.clear()
+
+
+def mark_changed(model):
+    """Drop cached rows of model now and everywhere on commit."""
+    reference_cache = _caches[model]
+    reference_cache.clear()
+    _pending().add(model)
+
+    def committed():
+        reference_cache.bump()
+        getattr(_state, 'pending', set()).discard(model)
+
+    transaction.on_commit(committed)
+
+
+def _changed_handler(sender, *args, **kwargs):
+    mark_changed(sender)
+
+
+def register(model):
+    """Class decorator caching rows of a reference model."""
+    _caches[model] = ReferenceCache(model)
+    post_save.connect(_changed_handler, sender=model)
+    post_delete.connect(_changed_handler, sender=model)
+    return model
+
+
+def is_reference(model, lookup):
+    """Return whether lookup is a many to many field to a reference."""
+    if '__' in lookup:
+        return False
+    try:
+        field = model._meta.get_field(lookup)
+    except FieldDoesNotExist:
+        return False
+    return field.many_to_many and not field.auto_created \
+        and field.related_model in _caches
+
+
+def resolve(model, items):
+    """Return reference rows named like items, inserting missing ones."""
+    return _caches[model].resolve(items)
+
+
+def invalidate(*reference_models):
+    """Drop cached rows of models, every reference model by default."""
+    for model in reference_models or list(_caches):
+        _caches[model].bump()
+
+
+def clear():
+    """Drop rows cached by this process only."""
+    for reference_cache in _caches.values():
+        reference_cache.clear()
+    getattr(_state, 'pending', set()).clear()
+
+
+def _set_related(instance, name, rows):
+    """Store rows as the prefetched name relation of instance."""
+    queryset = getattr(instance, name).get_queryset()
+    queryset._result_cache = rows
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+def attach(instances, names):
+    """Fill the named reference relations of instances.
+
+    Relations to warm caches come from a single UNION ALL of their join
+    tables, the rest are prefetched as usual and fill the caches. Related
+    rows are ordered by id either way.
+    """
+    if not instances:
+        return
+    model = type(instances[0])
+    fields = [model._meta.get_field(name) for name in names]
+    warm = [field for field in fields if _caches[field.related_model]
+            .is_warm()]
+    cold = [field.name for field in fields if field not in warm]
+
+    if cold:
+        generations = {
+            name: _caches[model._meta.get_field(name).related_model]
+            .generation
+            for name in cold
+        }
+        models.prefetch_related_objects(instances, *(
+            models.Prefetch(
+                name,
+                queryset=model._meta.get_field(name).related_model
+                .objects.order_by('pk'),
+            )
+            for name in cold
+        ))
+        for name in cold:
+            reference_cache = _caches[model._meta.get_field(name)
+                                      .related_model]
+            reference_cache.store({
+                row.pk: row
+                for instance in instances
+                for row in instance._prefetched_objects_cache[name]
+            }.values(), generations[name])
+    if not warm:
+        return
+
+    pks = [instance.pk for instance in instances]
+    queries = [
+        field.remote_field.through.objects
+        .filter(**{f'{field.m2m_field_name()}__in': pks})
+        .annotate(relation=Value(index, output_field=IntegerField()))
+        .values_list(
+            field.m2m_field_name(),
+            field.m2m_reverse_field_name(),
+            'relation',
+        )
+        for index, field in enumerate(warm)
+    ]
+    related = defaultdict(list)
+    for pk, related_pk, index in queries[0].union(*queries[1:], all=True):
+        related[pk, index].append(related_pk)
+
+    for index, field in enumerate(warm):
+        rows = _caches[field.related_model].get_many(
+            related_pk
+            for (pk, relation), related_pks in related.items()
+            if relation == index
+            for related_pk in related_pks
+        )
+        for instance in instances:
+            _set_related(instance, field.name, [
+                rows[related_pk]
+                for related_pk in sorted(related.get((instance.pk, index), []))
+                if related_pk in rows
+            ])
+
+
+class ReferenceQuerySet(models.QuerySet):
+    """QuerySet able to fill reference relations from the cache."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reference_lookups = ()
+
+    def with_references(self, *lookups):
+        """Fill the lookups relations from the reference cache."""
+        clone = self._chain()
+        clone._reference_lookups += lookups
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._reference_lookups = self._reference_lookups
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super()._fetch_all()
+        if not fetched and self._reference_lookups and \
+                self._iterable_class is ModelIterable:
+            attach(self._result_cache, self._reference_lookups)
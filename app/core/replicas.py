@@ -0,0 +1,161 @@
+"""
+Read replica routing.
+
+Views mixing in ReplicaReadMixin serve their replica_actions from one of
+the DATABASE_REPLICAS, everything else, including signal handlers, the
+deferred work thread and background jobs, reads and writes the default
+database. After a successful write a user is pinned to the default
+database for REPLICA_STICKY_SECONDS, so they read their own writes.
+
+The lag of each replica is checked every REPLICA_LAG_CHECK_INTERVAL
+seconds and replicas lagging more than REPLICA_MAX_LAG seconds behind,
+or not answering, are left out until the next check.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_checked = {}
+
+LAG_SQL = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class use_replica:
+    """Context manager routing reads of the current thread to replicas."""
+
+    def __enter__(self):
+        self.previous = getattr(_state, 'replica', False)
+        _state.replica = True
+
+    def __exit__(self, *exc_info):
+        _state.replica = self.previous
+
+
+def replica_lag(alias):
+    """Return seconds replica alias is behind the default database."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+def available_replicas():
+    """Return replicas not lagging behind more than REPLICA_MAX_LAG."""
+    now = time.monotonic()
+    available = []
+    for alias in settings.DATABASE_REPLICAS:
+        checked_at, lag = _checked.get(alias, (None, None))
+        if checked_at is None or \
+                now - checked_at >= settings.REPLICA_LAG_CHECK_INTERVAL:
+            try:
+                lag = replica_lag(alias)
+            except DatabaseError:
+                logger.warning('Replica %s is not available', alias)
+                lag = None
+            else:
+                metrics.REPLICA_LAG.set(lag, database=alias)
+            _checked[alias] = (now, lag)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            available.append(alias)
+    return available
+
+
+def _pin_key(user):
+    return f'replicas:pin:{user.pk}'
+
+
+def pin(user):
+    """Send reads of user to the default database for a while."""
+    if settings.DATABASE_REPLICAS:
+        cache.set(_pin_key(user), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user):
+    """Return whether user wrote within REPLICA_STICKY_SECONDS."""
+    return user.is_authenticated and cache.get(_pin_key(user), False)
+
+
+class ReplicaRouter:
+    """Route reads to replicas while use_replica is active."""
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False):
+            replicas = available_replicas()
+            if replicas:
+                return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica are still saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve replica_actions of a viewset from replicas.
+
+    Requests of users pinned by a recent write are served from the
+    default database, as are authentication and permission checks.
+    """
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        # Leave the replica in a finally block, exceptions DRF does not
+        # handle skip finalize_response and would leak the routing into
+        # the next request served by this thread.
+        self._replica = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica is not None:
+                self._replica.__exit__(None, None, None)
+                self._replica = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not settings.DATABASE_REPLICAS \
+                or self.action not in self.replica_actions:
+            return
+        if is_pinned(request.user):
+            metrics.REPLICA_READS.inc(target='primary')
+            return
+        self._replica = use_replica()
+        self._replica.__enter__()
+        metrics.REPLICA_READS.inc(target='replica')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS \
+                and response.status_code < 400 \
+                and request.user.is_authenticated:
+            pin(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
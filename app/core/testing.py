@@ -0,0 +1,211 @@
+"""
+Helpers for measuring the query cost of API endpoints in tests.
+"""
+import json
+import os
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import URLResolver
+
+from core import instrumentation, references
+from core.models import (
+    Author,
+    Book,
+    BookShelf,
+    Genre,
+    Language,
+    LikedItem,
+    OrderItem,
+    Publisher,
+    Review,
+    recompute_review_stats,
+)
+
+ATTRIBUTES = {
+    'genres': Genre,
+    'authors': Author,
+    'languages': Language,
+    'bookshelves': BookShelf,
+    'publishers': Publisher,
+}
+
+
+def seed_dataset(books=10, attributes_per_book=2):
+    """Create a catalog where list sizes grow with ``books``.
+
+    Every book gets ``attributes_per_book`` of each attribute and one
+    review per reviewer; there are ``books`` reviewers, and the shopper
+    has every book in cart and liked list. Rows are bulk inserted, so no
+    signal handlers run.
+    """
+    User = get_user_model()
+    shopper = User.objects.create_user('shopper@example.com', 'testpass123')
+    admin = User.objects.create_superuser('admin@example.com', 'testpass123')
+    User.objects.bulk_create(
+        User(email=f'reviewer{i}@example.com', name=f'Reviewer {i}')
+        for i in range(books)
+    )
+    reviewers = list(User.objects.filter(email__startswith='reviewer'))
+
+    Book.objects.bulk_create(
+        Book(
+            title=f'Book {i}',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=100,
+            price=Decimal('5.50'),
+        )
+        for i in range(books)
+    )
+    book_ids = list(Book.objects.order_by('id').values_list('id', flat=True))
+
+    for name, model in ATTRIBUTES.items():
+        model.objects.bulk_create(
+            model(name=f'{model.__name__} {i}')
+            for i in range(books // 2 + attributes_per_book)
+        )
+        attr_ids = list(model.objects.values_list('id', flat=True))
+        through = getattr(Book, name).through
+        attr_column = f'{model._meta.model_name}_id'
+        through.objects.bulk_create(
+            through(
+                book_id=book_id,
+                **{attr_column: attr_ids[(i + offset) % len(attr_ids)]}
+            )
+            for i, book_id in enumerate(book_ids)
+            for offset in range(attributes_per_book)
+        )
+    references.invalidate()
+
+    Review.objects.bulk_create(
+        Review(user=reviewer, book_id=book_id, value=i % 6, comment='Ok.')
+        for i, reviewer in enumerate(reviewers)
+        for book_id in book_ids
+    )
+    recompute_review_stats(book_ids)
+    OrderItem.objects.bulk_create(
+        OrderItem(user=shopper, book_id=book_id, quantity=1)
+        for book_id in book_ids
+    )
+    LikedItem.objects.bulk_create(
+        LikedItem(user=shopper, book_id=book_id) for book_id in book_ids
+    )
+
+    return SimpleNamespace(
+        shopper=shopper,
+        admin=admin,
+        book=Book.objects.get(id=book_ids[0]),
+        review=Review.objects.filter(user=reviewers[0]).first(),
+        orderitem=OrderItem.objects.filter(user=shopper).first(),
+        likeditem=LikedItem.objects.filter(user=shopper).first(),
+        **{
+            name: model.objects.first()
+            for name, model in ATTRIBUTES.items()
+        },
+    )
+
+
+def measure_queries(func):
+    """Call func and return RequestStats of the queries it ran."""
+    stats = instrumentation.RequestStats()
+    with instrumentation.collect(stats, timers=False):
+        func()
+    return stats
+
+
+def route_names(urlconf_module):
+    """Return namespaced names of every route in a urls module."""
+    names = set()
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+            elif pattern.name:
+                names.add(f'{urlconf_module.app_name}:{pattern.name}')
+
+    walk(urlconf_module.urlpatterns)
+    return names
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting endpoints stay within query budgets.
+
+    Budgets live in a JSON file mapping case names to query counts. Run
+    the tests with UPDATE_QUERY_BUDGETS=1 to rewrite the file from the
+    current counts, or with QUERY_REPORT=<path> to save the query count
+    and SQL time measured for every case.
+    """
+    budget_file = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(cls.budget_file) as budget_file:
+            cls.budgets = json.load(budget_file)
+        cls.measured = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('UPDATE_QUERY_BUDGETS') == '1':
+            budgets = dict(cls.budgets, **{
+                name: stats.queries
+                for name, stats in cls.measured.items()
+            })
+            with open(cls.budget_file, 'w') as budget_file:
+                json.dump(budgets, budget_file, indent=2, sort_keys=True)
+                budget_file.write('\n')
+        report_path = os.environ.get('QUERY_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump({
+                    name: {
+                        'queries': stats.queries,
+                        'sql_ms': round(stats.sql_time * 1000, 2),
+                    }
+                    for name, stats in cls.measured.items()
+                }, report_file, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def measure(self, size, func, setup=None):
+        """Seed a dataset of size books, measure func and roll back."""
+        # Cached responses would hide the queries behind them.
+        cache.clear()
+        references.clear()
+        with transaction.atomic():
+            data = seed_dataset(books=size)
+            if setup is not None:
+                setup(data)
+            stats = measure_queries(lambda: func(data))
+            transaction.set_rollback(True)
+        return stats
+
+    def assertQueryBudget(self, name, func, sizes=(3, 8), setup=None):
+        """Assert func's query count is flat in dataset size and budget.
+
+        setup(data) runs on the seeded data before func, unmeasured.
+        """
+        counts = []
+        for size in sizes:
+            stats = self.measure(size, func, setup)
+            counts.append(stats.queries)
+        self.measured[name] = stats
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'{name} query count grows with dataset size: '
+            f'{dict(zip(sizes, counts))}'
+        )
+        if os.environ.get('UPDATE_QUERY_BUDGETS') == '1':
+            return
+        self.assertIn(name, self.budgets, f'{name} has no query budget')
+        self.assertLessEqual(
+            counts[-1], self.budgets[name],
+            f'{name} runs {counts[-1]} queries, '
+            f'budget is {self.budgets[name]}'
+        )
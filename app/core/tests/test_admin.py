@@ -1,12 +1,15 @@
 """
 Tests for the Django admin modifications.
 """
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core import batching
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -45,3 +48,21 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_delete_selected_users_batched(self):
+        """Test deleting users from the list deletes them in one batch."""
+        url = reverse('admin:core_user_changelist')
+        with patch(
+            'core.models.signals_batched', wraps=batching.signals_batched
+        ) as signals_batched:
+            res = self.client.post(url, {
+                'action': 'delete_selected',
+                '_selected_action': [self.user.id],
+                'post': 'yes',
+            })
+
+        self.assertEqual(res.status_code, 302)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists()
+        )
+        signals_batched.assert_called_once_with()
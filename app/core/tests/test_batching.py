@@ -0,0 +1,117 @@
+"""
+Tests for batching of signal handler work.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.batching import signals_batched
+from core.models import Book, BookReviewStats, OrderItem, Review
+
+
+def create_book(number):
+    """Create and return a sample book."""
+    return Book.objects.create(
+        title=f'Book {number}',
+        isbn13='978-3-16-148410-0',
+        available_quantity=10,
+        price=Decimal('5.50'),
+    )
+
+
+class SignalsBatchedTests(TestCase):
+    """Test stock is returned once per batch of deleted cart items."""
+
+    def setUp(self):
+        self.books = [create_book(i) for i in range(8)]
+
+    def fill_cart(self, email, size):
+        """Create and return a user with size cart items."""
+        user = get_user_model().objects.create_user(email, 'testpass123')
+        for book in self.books[:size]:
+            OrderItem.objects.create(user=user, book=book, quantity=2)
+        return user
+
+    def test_user_delete_queries_independent_of_cart(self):
+        """Test deleting a user runs as many queries for any cart size."""
+        small = self.fill_cart('small@example.com', 3)
+        large = self.fill_cart('large@example.com', 8)
+
+        counts = []
+        for user in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                user.delete()
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        for book in self.books:
+            book.refresh_from_db()
+            self.assertEqual(book.available_quantity, 10)
+
+    def review_books(self, email, size):
+        """Create and return a user with size reviews."""
+        user = get_user_model().objects.create_user(email, 'testpass123')
+        for book in self.books[:size]:
+            Review.objects.create(user=user, book=book, value=4)
+        return user
+
+    def test_review_delete_queries_independent_of_reviews(self):
+        """Test deleting reviews runs as many queries for any count."""
+        small = self.review_books('small@example.com', 3)
+        large = self.review_books('large@example.com', 8)
+
+        counts = []
+        for user in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                Review.objects.filter(user=user).delete()
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(
+            BookReviewStats.objects.exclude(review_count=0).exists()
+        )
+
+    def test_users_delete_queries_independent_of_reviews(self):
+        """Test deleting users in bulk runs as many queries for any count."""
+        counts = []
+        for size in (3, 8):
+            self.review_books(f'user{size}@example.com', size)
+            self.fill_cart(f'cart{size}@example.com', size)
+            users = get_user_model().objects.filter(
+                email__endswith=f'{size}@example.com'
+            )
+            with CaptureQueriesContext(connection) as queries:
+                users.delete()
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            set(Book.objects.values_list('available_quantity', flat=True)),
+            {10},
+        )
+
+    def test_queryset_delete_returns_stock(self):
+        """Test deleting cart items in bulk returns their stock."""
+        self.fill_cart('user@example.com', 4)
+
+        OrderItem.objects.filter(book__in=self.books[:2]).delete()
+
+        quantities = Book.objects.order_by('id') \
+            .values_list('available_quantity', flat=True)
+        self.assertEqual(list(quantities)[:5], [10, 10, 8, 8, 10])
+
+    def test_failed_batch_rolled_back(self):
+        """Test an error in a batch leaves cart and stock untouched."""
+        user = self.fill_cart('user@example.com', 2)
+
+        with self.assertRaises(RuntimeError), signals_batched():
+            OrderItem.objects.filter(user=user).delete()
+            raise RuntimeError
+
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertEqual(
+            Book.objects.get(id=self.books[0].id).available_quantity, 8
+        )
@@ -0,0 +1,22 @@
+"""
+Tests for deployment system checks.
+"""
+from django.test import SimpleTestCase, override_settings
+
+from core.checks import shared_cache_check
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test the default cache must be shared when required."""
+
+    @override_settings(REQUIRE_SHARED_CACHE=True)
+    def test_local_cache_rejected(self):
+        """Test a local memory default cache is an error."""
+        errors = shared_cache_check(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+    @override_settings(REQUIRE_SHARED_CACHE=False)
+    def test_local_cache_allowed(self):
+        """Test a local memory cache is fine when not required."""
+        self.assertEqual(shared_cache_check(None), [])
@@ -1,13 +1,24 @@
 """
 Test custom Django managment commands.
 """
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import Book, BookReviewStats, Order, OrderItem, Review
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +43,168 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ExpireCartsCommandTests(TestCase):
+    """Test expire_carts command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        self.user2 = get_user_model().objects.create_user(
+            'test2@example.com',
+            'testpass123',
+        )
+        self.book = Book.objects.create(
+            title='Sample book title',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=25,
+            price=Decimal('5.50'),
+        )
+
+    def _age(self, orderitem, minutes):
+        """Move orderitem reservation time into the past."""
+        OrderItem.objects.filter(id=orderitem.id).update(
+            reserved_at=timezone.now() - timedelta(minutes=minutes)
+        )
+
+    def test_expire_carts_releases_stale_items(self):
+        """Test stale cart items are deleted and stock is returned."""
+        stale1 = OrderItem.objects.create(
+            user=self.user, book=self.book, quantity=2
+        )
+        stale2 = OrderItem.objects.create(
+            user=self.user2, book=self.book, quantity=3
+        )
+        fresh = OrderItem.objects.create(
+            user=get_user_model().objects.create_user('t3@example.com'),
+            book=self.book,
+            quantity=4,
+        )
+        self._age(stale1, 120)
+        self._age(stale2, 120)
+
+        call_command('expire_carts', ttl=60, batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(OrderItem.objects.values_list('id', flat=True)),
+            [fresh.id]
+        )
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_quantity, 25 - 4)
+
+    def test_expire_carts_keeps_ordered_items(self):
+        """Test cart items attached to an order are not released."""
+        orderitem = OrderItem.objects.create(
+            user=self.user, book=self.book, quantity=2
+        )
+        order = Order.objects.create(user=self.user)
+        order.ordered_items.add(orderitem)
+        self._age(orderitem, 120)
+
+        call_command('expire_carts', ttl=60, stdout=StringIO())
+
+        self.assertTrue(OrderItem.objects.filter(id=orderitem.id).exists())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_quantity, 25 - 2)
+
+
+class SeedCatalogCommandTests(TestCase):
+    """Test generating a synthetic catalog."""
+
+    def test_seed_catalog_creates_related_rows(self):
+        """Test books come with attributes, reviews, carts and orders."""
+        out = StringIO()
+        call_command(
+            'seed_catalog', books=12, users=4, attributes=3,
+            reviews_per_book=2, cart_items=2, orders=1, items_per_order=2,
+            batch_size=5, stdout=out,
+        )
+
+        self.assertEqual(Book.objects.count(), 12)
+        self.assertEqual(get_user_model().objects.count(), 4)
+        self.assertEqual(Review.objects.count(), 12 * 2)
+        self.assertEqual(Order.objects.count(), 4)
+        self.assertEqual(
+            Order.ordered_items.through.objects.count(), 4 * 2
+        )
+        self.assertEqual(
+            OrderItem.objects.filter(order__isnull=True).count(), 4 * 2
+        )
+        for book in Book.objects.prefetch_related('review_set', 'genres'):
+            self.assertEqual(book.genres.count(), 2)
+            values = [review.value for review in book.review_set.all()]
+            self.assertEqual(
+                book.rating,
+                round(Decimal(sum(values)) / len(values), 1)
+            )
+        self.assertIn('12 books', out.getvalue())
+
+    def test_seed_catalog_reserves_stock(self):
+        """Test cart and order items are taken from stock of books."""
+        options = {'books': 12, 'users': 4, 'attributes': 3, 'seed': 7}
+        call_command(
+            'seed_catalog', cart_items=0, orders=0, stdout=StringIO(),
+            **options,
+        )
+        stock = dict(Book.objects.values_list('title', 'available_quantity'))
+        Book.objects.all().delete()
+
+        call_command(
+            'seed_catalog', cart_items=2, orders=1, items_per_order=2,
+            stdout=StringIO(), **options,
+        )
+
+        self.assertTrue(OrderItem.objects.exists())
+        for book in Book.objects.annotate(reserved=Sum('orderitem__quantity')):
+            self.assertEqual(
+                book.available_quantity + (book.reserved or 0),
+                stock[book.title],
+            )
+
+
+class ImportReviewsCommandTests(TestCase):
+    """Test importing reviews from a file."""
+
+    def test_import_reviews_from_file(self):
+        """Test reviews of a JSON lines file are imported once."""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        book = Book.objects.create(
+            title='Sample book title',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=100,
+            price=Decimal('5.50'),
+        )
+        row = {'user': user.email, 'book': book.id, 'value': 4}
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.jsonl', delete=False) as reviews_file:
+            reviews_file.write(json.dumps(row) + '\n')
+        self.addCleanup(os.remove, reviews_file.name)
+
+        out = StringIO()
+        call_command('import_reviews', reviews_file.name, stdout=out)
+        call_command('import_reviews', reviews_file.name, stdout=out)
+
+        self.assertEqual(Review.objects.filter(book=book).count(), 1)
+        self.assertEqual(
+            BookReviewStats.objects.get(book=book).review_count, 1
+        )
+        self.assertIn('Imported 1 reviews', out.getvalue())
+        self.assertIn('1 duplicates', out.getvalue())
+
+    def test_import_reviews_invalid_encoding(self):
+        """Test a file that is not UTF-8 is an error."""
+        with tempfile.NamedTemporaryFile(
+                'wb', suffix='.csv', delete=False) as reviews_file:
+            reviews_file.write(b'\xff\xfeuser,book,value\n')
+        self.addCleanup(os.remove, reviews_file.name)
+
+        with self.assertRaises(CommandError):
+            call_command('import_reviews', reviews_file.name)
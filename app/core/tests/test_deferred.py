@@ -0,0 +1,144 @@
+"""
+Tests for deferred work queues.
+"""
+from datetime import date
+from decimal import Decimal
+from unittest.mock import Mock, call, patch
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+
+from core import metrics
+from core.deferred import DeferredQueue
+from core.models import Book, Review
+
+
+class DeferredQueueTests(TestCase):
+    """Test coalescing and batching of deferred work."""
+
+    def setUp(self):
+        self.handler = Mock()
+        self.queue = DeferredQueue('test', self.handler, batch_size=2)
+
+    def test_work_runs_after_commit(self):
+        """Test keys are handled once the transaction commits."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.queue.add(1)
+            self.handler.assert_not_called()
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.handler.assert_called_once_with([1])
+
+    def test_keys_of_one_transaction_coalesce(self):
+        """Test repeated keys are handled once, in batches."""
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for key in (3, 1, 3, 2, 1):
+                self.queue.add(key)
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.handler.call_args_list, [call([1, 2]),
+                                                       call([3])])
+        self.assertEqual(
+            metrics.DEFERRED_TASKS_COALESCING._values[('test',)], 5 / 3
+        )
+
+    def test_rolled_back_keys_are_dropped(self):
+        """Test keys queued in a rolled back savepoint are not handled."""
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.queue.add(1)
+                transaction.set_rollback(True)
+            self.queue.add(2)
+
+        self.handler.assert_called_once_with([2])
+
+    def test_failed_work_after_commit_logged(self):
+        """Test handler errors after commit are logged, not raised."""
+        self.handler.side_effect = RuntimeError
+        with self.assertLogs('core.deferred', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(1)
+
+        self.handler.assert_called_once_with([1])
+
+    @override_settings(DEFERRED_TASKS_DELAY=60)
+    @patch('core.deferred.atexit.register')
+    def test_drained_at_exit(self, register):
+        """Test keys still queued are handled when the process exits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(2)
+
+        register.assert_called_once_with(self.queue._drain_at_exit)
+        self.handler.assert_not_called()
+        with patch('core.deferred.connections'):
+            self.queue._drain_at_exit()
+        self.handler.assert_called_once_with([1, 2])
+
+    @override_settings(DEFERRED_TASKS_DELAY=1)
+    @patch.object(DeferredQueue, '_ensure_worker')
+    def test_delayed_work_waits_for_drain(self, patched_worker):
+        """Test committed keys wait in the queue with a delay set."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(1)
+            self.queue.add(2)
+
+        self.handler.assert_not_called()
+        patched_worker.assert_called()
+        self.assertEqual(metrics.DEFERRED_TASKS_DEPTH._values[('test',)], 2)
+
+        self.queue.drain()
+
+        self.handler.assert_called_once_with([1, 2])
+        self.assertEqual(metrics.DEFERRED_TASKS_DEPTH._values[('test',)], 0)
+
+    @override_settings(DEFERRED_TASKS_DELAY=1)
+    @patch.object(DeferredQueue, '_ensure_worker')
+    def test_failed_drain_keeps_keys(self, patched_worker):
+        """Test keys stay queued when the handler fails."""
+        self.handler.side_effect = [RuntimeError, None]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.queue.add(1)
+
+        with self.assertRaises(RuntimeError):
+            self.queue.drain()
+        self.queue.drain()
+
+        self.assertEqual(self.handler.call_args_list, [call([1]),
+                                                       call([1])])
+
+
+class RatingUpdateTests(TestCase):
+    """Test deferred book rating recalculation."""
+
+    def test_review_burst_recomputes_rating_once(self):
+        """Test many reviews of a book in one transaction update it once."""
+        book = Book.objects.create(
+            title='Test Book',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=25,
+            price=Decimal('5.50'),
+        )
+        users = [
+            get_user_model().objects.create_user(f'test{i}@example.com')
+            for i in range(3)
+        ]
+        before = metrics.RATING_RECOMPUTES._values.get((), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for user, value in zip(users, (5, 4, 4)):
+                Review.objects.create(user=user, book=book, value=value)
+            book.refresh_from_db()
+            self.assertEqual(book.rating, 0)
+
+        book.refresh_from_db()
+        self.assertEqual(book.rating, Decimal('4.3'))
+        self.assertEqual(
+            metrics.RATING_RECOMPUTES._values.get((), 0), before + 1
+        )
@@ -0,0 +1,51 @@
+"""
+Tests for API exceptions.
+"""
+from types import SimpleNamespace
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase
+
+from core.exceptions import Conflict, constraint_error
+
+
+def integrity_error(message, constraint=None):
+    """Return IntegrityError raised from a driver error naming constraint."""
+    exc = IntegrityError(message)
+    if constraint is not None:
+        exc.__cause__ = Exception(message)
+        exc.__cause__.diag = SimpleNamespace(constraint_name=constraint)
+    return exc
+
+
+class ConstraintErrorTests(SimpleTestCase):
+    """Test mapping constraint violations to API errors."""
+
+    def test_constraint_named_by_driver(self):
+        """Test the constraint named by the driver decides the error."""
+        exc = integrity_error(
+            'violates check constraint "review_value_range"',
+            'book_available_quantity_non_negative',
+        )
+
+        error = constraint_error(exc)
+
+        self.assertIsInstance(error, Conflict)
+        self.assertEqual(error.detail.code, 'out_of_stock')
+
+    def test_unknown_constraint_named_by_driver(self):
+        """Test other constraints named by the driver are not reported."""
+        exc = integrity_error(
+            'violates check constraint "review_value_range"',
+            'other_constraint',
+        )
+
+        self.assertIsNone(constraint_error(exc))
+
+    def test_constraint_in_message(self):
+        """Test the message is searched when the driver names nothing."""
+        exc = integrity_error(
+            'violates check constraint "book_available_quantity_non_negative"'
+        )
+
+        self.assertIsInstance(constraint_error(exc), Conflict)
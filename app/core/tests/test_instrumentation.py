@@ -0,0 +1,98 @@
+"""
+Tests for request instrumentation.
+"""
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.instrumentation import RequestStats, fingerprint
+from core.models import Book, Genre
+
+BOOK_URL = reverse('book:book-list')
+
+
+def execute(sql, params, many, context):
+    """Stand-in for the database execute call."""
+    return None
+
+
+class RequestStatsTests(TestCase):
+    """Test query recording."""
+
+    def test_fingerprint_collapses_in_lists(self):
+        """Test IN lists of any length share a fingerprint."""
+        self.assertEqual(
+            fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT 1 WHERE id IN (%s)'),
+        )
+
+    def test_duplicates(self):
+        """Test repeated queries are reported as duplicates."""
+        stats = RequestStats()
+        for i in range(3):
+            stats.execute_wrapper(
+                execute, 'SELECT * FROM core_genre WHERE id = %s',
+                (i,), False, {}
+            )
+        stats.execute_wrapper(execute, 'SELECT 1', (), False, {})
+
+        self.assertEqual(stats.queries, 4)
+        self.assertEqual(
+            stats.duplicates(),
+            [('SELECT * FROM core_genre WHERE id = %s', 3)]
+        )
+
+
+@override_settings(QUERY_INSTRUMENTATION=True)
+class QueryInstrumentationMiddlewareTests(TestCase):
+    """Test instrumentation middleware."""
+
+    def setUp(self):
+        self.client = APIClient()
+        genre = Genre.objects.create(name='Fiction')
+        for i in range(2):
+            Book.objects.create(
+                title=f'Book {i}',
+                isbn13='978-3-16-148410-0',
+                publication_date=date(2022, 5, 7),
+                price=Decimal('5.50'),
+            ).genres.add(genre)
+
+    def test_server_timing_header(self):
+        """Test Server-Timing header reports queries and serializer time."""
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            res = self.client.get(BOOK_URL)
+
+        self.assertIn('db;dur=', res['Server-Timing'])
+        self.assertIn('desc="6 queries"', res['Server-Timing'])
+        self.assertIn('serializer;dur=', res['Server-Timing'])
+        self.assertIn('total;dur=', res['Server-Timing'])
+        self.assertEqual(logs.records[0].view, 'BookViewSet.list')
+        self.assertEqual(logs.records[0].queries, 6)
+
+    @override_settings(QUERY_INSTRUMENTATION_DUPLICATES=2)
+    @patch('book.views.optimize_queryset', lambda queryset, _: queryset)
+    def test_duplicate_queries_logged(self):
+        """Test N+1 queries in a request are logged with the view."""
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            self.client.get(BOOK_URL)
+
+        warnings = [r for r in logs.records if r.levelname == 'WARNING']
+        self.assertEqual(len(warnings), 5)
+        self.assertEqual(warnings[0].view, 'BookViewSet.list')
+        self.assertEqual(warnings[0].count, 2)
+
+
+class QueryInstrumentationDisabledTests(TestCase):
+    """Test instrumentation is off by default."""
+
+    def test_no_server_timing_header(self):
+        """Test Server-Timing header is not added when disabled."""
+        res = APIClient().get(BOOK_URL)
+
+        self.assertFalse(res.has_header('Server-Timing'))
@@ -0,0 +1,235 @@
+"""
+Tests for metrics.
+"""
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Book, OrderItem, Review
+
+METRICS_URL = reverse('metrics')
+
+
+def create_book(**params):
+    """Create and return a sample book."""
+    defaults = {
+        'title': 'Sample book title',
+        'isbn13': '978-3-16-148410-0',
+        'publication_date': date(2022, 5, 7),
+        'available_quantity': 25,
+        'price': Decimal('5.50'),
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+def value(metric, **labels):
+    """Return current value of metric in this process."""
+    return metric._values.get(metric._key(labels), 0)
+
+
+class RegistryTests(SimpleTestCase):
+    """Test metric registry."""
+
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.counter = self.registry.counter(
+            'test_total', 'Test counter.', ['kind']
+        )
+        self.histogram = self.registry.histogram(
+            'test_seconds', 'Test histogram.', buckets=(0.1, 1.0)
+        )
+
+    def test_render(self):
+        """Test metrics are rendered in the Prometheus text format."""
+        self.counter.inc(kind='a')
+        self.counter.inc(2, kind='a')
+        self.histogram.observe(0.5)
+
+        text = self.registry.render()
+
+        self.assertIn('# TYPE test_total counter', text)
+        self.assertIn('test_total{kind="a"} 3', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 0', text)
+        self.assertIn('test_seconds_bucket{le="1.0"} 1', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 1', text)
+        self.assertIn('test_seconds_count 1', text)
+
+    def test_merge_processes(self):
+        """Test snapshots of other processes in METRICS_DIR are merged."""
+        other = metrics.Registry()
+        other.counter('test_total', 'Test counter.', ['kind']).inc(kind='a')
+        other.histogram(
+            'test_seconds', 'Test histogram.', buckets=(0.1, 1.0)
+        ).observe(0.05)
+        self.counter.inc(kind='a')
+        self.histogram.observe(0.5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'metrics_1.json'), 'w') as f:
+                json.dump(other.snapshot(), f)
+            with override_settings(METRICS_DIR=directory):
+                self.registry.flush(force=True)
+                text = self.registry.render()
+
+        self.assertIn('test_total{kind="a"} 2', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_seconds_count 2', text)
+
+    @override_settings(METRICS_SNAPSHOT_TTL=60)
+    def test_merge_exited_and_old_processes(self):
+        """Test counters of exited and old processes keep being counted."""
+        other = metrics.Registry()
+        other.counter('test_total', 'Test counter.', ['kind']).inc(kind='a')
+        other.gauge('test_depth', 'Test gauge.').set(5)
+        exited = subprocess.Popen(['true'])
+        exited.wait()
+        self.counter.inc(kind='a')
+
+        with tempfile.TemporaryDirectory() as directory:
+            dead = os.path.join(directory, f'metrics_{exited.pid}.json')
+            old = os.path.join(directory, 'metrics_1.json')
+            for path in (dead, old):
+                with open(path, 'w') as f:
+                    json.dump(other.snapshot(), f)
+            os.utime(old, (time.time() - 61, time.time() - 61))
+            with override_settings(METRICS_DIR=directory):
+                first = self.registry.render()
+                second = self.registry.render()
+
+            self.assertFalse(os.path.exists(dead))
+            self.assertTrue(os.path.exists(old))
+            self.assertTrue(
+                os.path.exists(os.path.join(directory, 'metrics_dead.json'))
+            )
+        self.assertEqual(first, second)
+        self.assertIn('test_total{kind="a"} 3', first)
+        self.assertNotIn('test_depth', first)
+
+    def test_flush_periodically(self):
+        """Test snapshots are flushed while a process is idle."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+            with override_settings(
+                METRICS_DIR=directory, METRICS_FLUSH_INTERVAL=0.01
+            ):
+                self.registry.flush()
+                self.counter.inc(kind='a')
+                time.sleep(0.1)
+                with open(path) as f:
+                    snapshot = json.load(f)
+
+        self.assertEqual(
+            snapshot['test_total']['values'], [[['a'], 1]]
+        )
+
+
+class MetricsEndpointTests(TestCase):
+    """Test /metrics endpoint and instrumented events."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+
+    def test_metrics_forbidden(self):
+        """Test metrics require a token, an allowed IP or staff."""
+        self.client.force_login(self.user)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong'
+        )
+
+        self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_metrics_allowed_ip(self):
+        """Test metrics are served to allowed IP addresses."""
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='10.0.0.1')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_metrics_staff(self):
+        """Test metrics are served to staff users."""
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_request_latency(self):
+        """Test request latency is recorded per view action."""
+        self.client.get(reverse('book:book-list'))
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            'http_request_duration_seconds_count{route="book:book-list",'
+            'view="BookViewSet.list",method="GET"}',
+            res.content.decode()
+        )
+
+    def test_token_auth_lookups(self):
+        """Test token lookups are counted by result."""
+        token = Token.objects.create(user=self.user)
+        success = value(metrics.TOKEN_AUTH_LOOKUPS, result='success')
+        failure = value(metrics.TOKEN_AUTH_LOOKUPS, result='failure')
+        url = reverse('user:me')
+
+        self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.client.get(url, HTTP_AUTHORIZATION='Token invalid')
+
+        self.assertEqual(
+            value(metrics.TOKEN_AUTH_LOOKUPS, result='success'),
+            success + 1
+        )
+        self.assertEqual(
+            value(metrics.TOKEN_AUTH_LOOKUPS, result='failure'),
+            failure + 1
+        )
+
+    def test_rating_recomputes(self):
+        """Test review signals count rating recomputes."""
+        before = value(metrics.RATING_RECOMPUTES)
+        with self.captureOnCommitCallbacks(execute=True):
+            review = Review.objects.create(
+                user=self.user, book=create_book(), value=4
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            review.delete()
+
+        self.assertEqual(value(metrics.RATING_RECOMPUTES), before + 2)
+
+    def test_reservation_conflicts(self):
+        """Test out of stock cart items are counted."""
+        before = value(metrics.RESERVATION_CONFLICTS)
+
+        with self.assertRaises(IntegrityError):
+            OrderItem.objects.create(
+                user=self.user,
+                book=create_book(available_quantity=1),
+                quantity=2,
+            )
+
+        self.assertEqual(value(metrics.RESERVATION_CONFLICTS), before + 1)
@@ -0,0 +1,104 @@
+"""
+Tests for API middleware.
+"""
+import gzip
+from unittest.mock import patch
+
+import brotli
+from django.core.cache import caches
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import CompressionMiddleware, accepted_encodings
+
+BODY = b'{"title": "Sample book title"}' * 100
+
+
+def compress(response, accept='gzip, deflate'):
+    """Run response through CompressionMiddleware and return it."""
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+    middleware = CompressionMiddleware(lambda request: response)
+    return middleware(request)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test response compression."""
+
+    def setUp(self):
+        caches['compression'].clear()
+
+    def test_accepted_encodings(self):
+        """Test parsing Accept-Encoding with quality values."""
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br;q=0, identity'),
+            {'gzip', 'identity'}
+        )
+
+    def test_compress_gzip(self):
+        """Test large responses are gzipped."""
+        res = compress(HttpResponse(BODY))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_compress_brotli(self):
+        """Test brotli is preferred when the client accepts it."""
+        res = compress(HttpResponse(BODY), accept='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertEqual(brotli.decompress(res.content), BODY)
+
+    def test_skip_small_response(self):
+        """Test responses below the threshold are not compressed."""
+        res = compress(HttpResponse(b'{"id": 1}'))
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, b'{"id": 1}')
+
+    def test_skip_not_accepted(self):
+        """Test nothing is compressed without a matching encoding."""
+        res = compress(HttpResponse(BODY), accept='gzip;q=0')
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+
+    def test_compress_streaming(self):
+        """Test streaming responses are compressed chunk by chunk."""
+        res = compress(StreamingHttpResponse(iter([BODY, BODY])))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        content = b''.join(res.streaming_content)
+        self.assertEqual(gzip.decompress(content), BODY + BODY)
+
+    def test_compress_streaming_brotli(self):
+        """Test streaming responses are compressed with brotli."""
+        res = compress(StreamingHttpResponse(iter([BODY, BODY])), 'br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        content = b''.join(res.streaming_content)
+        self.assertEqual(brotli.decompress(content), BODY + BODY)
+
+    def test_cached_compression(self):
+        """Test repeated bodies are compressed once."""
+        with patch('core.middleware.compress_string',
+                   wraps=gzip.compress) as patched_compress:
+            first = compress(HttpResponse(BODY))
+            second = compress(HttpResponse(BODY))
+
+        self.assertEqual(patched_compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    @override_settings(COMPRESSION_CACHE_ALIAS='')
+    def test_cache_disabled(self):
+        """Test bodies are compressed every time without cache."""
+        with patch('core.middleware.compress_string',
+                   wraps=gzip.compress) as patched_compress:
+            compress(HttpResponse(BODY))
+            compress(HttpResponse(BODY))
+
+        self.assertEqual(patched_compress.call_count, 2)
@@ -0,0 +1,82 @@
+"""
+Tests for data migrations.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+
+class UniqueAttributeNamesMigrationTests(TransactionTestCase):
+    """Test merging duplicate attribute names in migration 0012."""
+
+    before = [('core', '0011_review_created_at_default')]
+    after = [('core', '0012_unique_attribute_names')]
+
+    def migrate(self, targets):
+        """Migrate to targets and return the apps of that state."""
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_merge_duplicates(self):
+        """Test duplicates are merged and their links repointed."""
+        apps = self.migrate(self.before)
+        Genre = apps.get_model('core', 'Genre')
+        Book = apps.get_model('core', 'Book')
+        BookRanking = apps.get_model('core', 'BookRanking')
+        fantasy = Genre.objects.create(name='Fantasy')
+        duplicate = Genre.objects.create(
+            name='fantasy ', description='Dragons'
+        )
+        horror = Genre.objects.create(name='Horror')
+        books = [
+            Book.objects.create(
+                title=f'Book {i}',
+                isbn13='978-3-16-148410-0',
+                publication_date=date(2022, 5, 7),
+                available_quantity=10,
+                price=Decimal('5.50'),
+            )
+            for i in range(2)
+        ]
+        books[0].genres.add(fantasy, duplicate, horror)
+        books[1].genres.add(duplicate)
+        BookRanking.objects.create(
+            kind='most_liked',
+            genre=duplicate,
+            position=1,
+            book=books[1],
+            score=1,
+            refreshed_at=timezone.now(),
+        )
+
+        apps = self.migrate(self.after)
+        Genre = apps.get_model('core', 'Genre')
+        Book = apps.get_model('core', 'Book')
+        BookRanking = apps.get_model('core', 'BookRanking')
+
+        self.assertQuerysetEqual(
+            Genre.objects.order_by('id').values_list(
+                'id', 'name_key', 'description'
+            ),
+            [(fantasy.id, 'fantasy', 'Dragons'), (horror.id, 'horror', '')],
+            transform=tuple,
+        )
+        self.assertCountEqual(
+            Book.genres.through.objects.values_list('book_id', 'genre_id'),
+            [
+                (books[0].id, fantasy.id),
+                (books[0].id, horror.id),
+                (books[1].id, fantasy.id),
+            ],
+        )
+        self.assertFalse(BookRanking.objects.exists())
@@ -4,6 +4,7 @@ Tests for models.
 from datetime import datetime
 from decimal import Decimal
 
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -157,19 +158,20 @@ class ModelTests(TestCase):
             description='Sample Book description',
         )
 
-        review1 = models.Review.objects.create(
-            user=user,
-            book=book,
-            comment='Test comment',
-            value=4
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            review1 = models.Review.objects.create(
+                user=user,
+                book=book,
+                comment='Test comment',
+                value=4
+            )
 
-        review2 = models.Review.objects.create(
-            user=user2,
-            book=book,
-            comment='Test comment',
-            value=3
-        )
+            review2 = models.Review.objects.create(
+                user=user2,
+                book=book,
+                comment='Test comment',
+                value=3
+            )
 
         avg = (review1.value+review2.value)/2
 
@@ -196,28 +198,31 @@ class ModelTests(TestCase):
             description='Sample Book description',
         )
 
-        review1 = models.Review.objects.create(
-            user=user,
-            book=book,
-            comment='Test comment',
-            value=4
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            review1 = models.Review.objects.create(
+                user=user,
+                book=book,
+                comment='Test comment',
+                value=4
+            )
 
-        review2 = models.Review.objects.create(
-            user=user2,
-            book=book,
-            comment='Test comment',
-            value=3
-        )
+            review2 = models.Review.objects.create(
+                user=user2,
+                book=book,
+                comment='Test comment',
+                value=3
+            )
 
-        review2.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            review2.delete()
 
         avg = review1.value
 
         book.refresh_from_db()
         self.assertEqual(book.rating, avg)
 
-        review1.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            review1.delete()
         book.refresh_from_db()
         self.assertEqual(book.rating, 0)
 
@@ -251,6 +256,102 @@ class ModelTests(TestCase):
                 f"Quantity: {orderitem.quantity} | {orderitem.book.price}")
         )
 
+    def test_book_save_stale_version(self):
+        """Test saving a book changed since it was loaded fails."""
+        book = models.Book.objects.create(
+            title='Test Book',
+            isbn13='978-3-16-148410-0',
+            available_quantity=25,
+            price=Decimal('5.50'),
+        )
+        stale = models.Book.objects.get(id=book.id)
+        book.price = Decimal('6.00')
+        book.save(update_fields=['price'])
+
+        stale.title = 'Changed'
+        with self.assertRaises(models.StaleBookError), transaction.atomic():
+            stale.save()
+
+        book.refresh_from_db()
+        self.assertEqual(book.version, 2)
+        self.assertEqual(book.title, 'Test Book')
+
+    def test_book_save_keeps_reservations(self):
+        """Test saving a book keeps stock reserved since it was loaded."""
+        users = [
+            get_user_model().objects.create_user(
+                f'test{i}@example.com',
+                'testpass123'
+            )
+            for i in range(2)
+        ]
+        book = models.Book.objects.create(
+            title='Test Book',
+            isbn13='978-3-16-148410-0',
+            available_quantity=25,
+            price=Decimal('5.50'),
+        )
+        models.OrderItem.objects.create(user=users[0], book=book, quantity=3)
+        book.title = 'Changed'
+        book.save()
+
+        loaded = models.Book.objects.get(id=book.id)
+        models.OrderItem.objects.create(user=users[1], book=book, quantity=2)
+        loaded.price = Decimal('6.00')
+        loaded.save()
+
+        book.refresh_from_db()
+        self.assertEqual(book.available_quantity, 20)
+        self.assertEqual(book.version, 3)
+        self.assertEqual(book.title, 'Changed')
+        self.assertEqual(book.price, Decimal('6.00'))
+
+    def test_orderitem_reserves_stock(self):
+        """Test cart items reserve stock only while enough is left."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        book = models.Book.objects.create(
+            title='Test Book',
+            isbn13='978-3-16-148410-0',
+            available_quantity=3,
+            price=Decimal('5.50'),
+        )
+
+        orderitem = models.OrderItem.objects.create(
+            user=user, book=book, quantity=2
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.OrderItem.objects.create(
+                user=get_user_model().objects.create_user(
+                    'other@example.com', 'testpass123'
+                ),
+                book=book,
+                quantity=2,
+            )
+        book.refresh_from_db()
+        self.assertEqual(book.available_quantity, 1)
+
+        orderitem.delete()
+        book.refresh_from_db()
+        self.assertEqual(book.available_quantity, 3)
+
+    def test_review_value_constraint(self):
+        """Test the database rejects review values outside 0 to 5."""
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123'
+        )
+        book = models.Book.objects.create(
+            title='Test Book',
+            isbn13='978-3-16-148410-0',
+            price=Decimal('5.50'),
+        )
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Review.objects.create(user=user, book=book, value=6)
+
     def test_create_likeditem(self):
         """Test creating a likeditem is successful."""
 
@@ -0,0 +1,145 @@
+"""
+Tests for the slow-request profiler.
+"""
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, \
+    override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import profiling
+from core.middleware import ProfilingMiddleware
+
+PROFILES_URL = reverse('profiles')
+
+
+def slow_view(request):
+    """Sleep long enough to be sampled."""
+    time.sleep(0.05)
+    return HttpResponse('ok')
+
+
+def profile_url(profile_id):
+    """Create and return a profile detail URL."""
+    return reverse('profile', args=[profile_id])
+
+
+@override_settings(
+    PROFILING=True,
+    PROFILING_SAMPLE_RATE=1.0,
+    PROFILING_INTERVAL=0.001,
+    PROFILING_SLOW_THRESHOLD_MS=10,
+)
+class ProfilingMiddlewareTests(SimpleTestCase):
+    """Test profiling requests."""
+
+    def setUp(self):
+        profiling.PROFILES.clear()
+        self.factory = RequestFactory()
+
+    def call(self, view):
+        middleware = ProfilingMiddleware(
+            lambda request: view(request)
+        )
+        request = self.factory.get('/api/book/books/?fields=id')
+        middleware.process_view(request, view, (), {})
+        return middleware(request)
+
+    def test_slow_request_is_profiled(self):
+        """Test slow requests keep collapsed stacks of the view."""
+        self.call(slow_view)
+
+        profile, = profiling.PROFILES.all()
+        self.assertEqual(profile['view'], 'slow_view')
+        self.assertEqual(profile['path'], '/api/book/books/?fields=id')
+        self.assertGreater(profile['samples'], 0)
+        self.assertTrue(any(
+            f'{__name__}.slow_view' in stack
+            for stack in profile['stacks']
+        ))
+        self.assertFalse(any(
+            'core.middleware' in stack for stack in profile['stacks']
+        ))
+
+    @override_settings(PROFILING_SLOW_THRESHOLD_MS=1000)
+    def test_fast_request_is_not_kept(self):
+        """Test requests below the threshold are dropped."""
+        self.call(slow_view)
+
+        self.assertEqual(profiling.PROFILES.all(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_is_not_profiled(self):
+        """Test requests outside the sample rate are not profiled."""
+        self.call(slow_view)
+
+        self.assertEqual(profiling.PROFILES.all(), [])
+
+    def test_collapsed_output_is_tagged_with_view(self):
+        """Test collapsed stacks start with the view action."""
+        output = profiling.collapsed({
+            'view': 'BookViewSet.list',
+            'stacks': Counter({'a.f;a.g': 3, 'a.f': 1}),
+        })
+
+        self.assertEqual(
+            output,
+            'BookViewSet.list;a.f;a.g 3\nBookViewSet.list;a.f 1\n'
+        )
+
+
+class ProfileViewTests(TestCase):
+    """Test retrieving profiles."""
+
+    def setUp(self):
+        profiling.PROFILES.clear()
+        self.profile_id = profiling.PROFILES.add({
+            'view': 'BookViewSet.list',
+            'method': 'GET',
+            'path': '/api/book/books/',
+            'status': 200,
+            'duration_ms': 812.5,
+            'samples': 2,
+            'stacks': Counter({'book.views.BookViewSet.list': 2}),
+        })
+        self.client = APIClient()
+
+    def test_profiles_require_admin(self):
+        """Test profiles are not available to regular users."""
+        res = self.client.get(PROFILES_URL)
+        self.assertIn(res.status_code, (401, 403))
+
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client.force_authenticate(user)
+        res = self.client.get(profile_url(self.profile_id))
+        self.assertEqual(res.status_code, 403)
+
+    def test_admin_lists_and_downloads_profiles(self):
+        """Test admins list profiles and get collapsed stacks."""
+        admin = get_user_model().objects.create_superuser(
+            'admin@example.com', 'testpass123'
+        )
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(PROFILES_URL)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]['id'], self.profile_id)
+        self.assertNotIn('stacks', res.data[0])
+
+        res = self.client.get(profile_url(self.profile_id))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res.content,
+            b'BookViewSet.list;book.views.BookViewSet.list 2\n'
+        )
+
+        res = self.client.get(profile_url(uuid.uuid4()))
+        self.assertEqual(res.status_code, 404)
@@ -0,0 +1,131 @@
+"""
+Query count budgets of every API endpoint.
+
+Each case seeds datasets of two sizes, calls the endpoint and checks the
+number of queries does not grow with the data and stays within the
+budget in query_budgets.json. Run with UPDATE_QUERY_BUDGETS=1 to rewrite
+the budget file after an intended change.
+"""
+import os
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from book import rankings, urls as book_urls
+from order import urls as order_urls
+from user import urls as user_urls
+from core.testing import QueryBudgetMixin, route_names
+
+
+def case(method, route, user=None, args=None, data=None, setup=None):
+    """Describe one request of the budget suite."""
+    return {
+        'method': method,
+        'route': route,
+        'user': user,
+        'args': args or (lambda data: []),
+        'data': data or (lambda data: None),
+        'setup': setup,
+    }
+
+
+def attribute_cases(basename, attr):
+    """Describe list and rename requests of a book attribute API."""
+    return [
+        case('get', f'book:{basename}-list'),
+        case('patch', f'book:{basename}-detail', user='admin',
+             args=lambda data: [getattr(data, attr).id],
+             data=lambda data: {'name': 'Renamed'}),
+    ]
+
+
+CASES = [
+    case('get', 'book:api-root'),
+    case('get', 'book:book-list'),
+    case('get', 'book:book-detail', args=lambda data: [data.book.id]),
+    case('patch', 'book:book-detail', user='admin',
+         args=lambda data: [data.book.id],
+         data=lambda data: {'title': 'Renamed'}),
+    case('get', 'book:book-reviews', args=lambda data: [data.book.id]),
+    case('get', 'book:book-review-stats', args=lambda data: [data.book.id]),
+    case('get', 'book:book-popular',
+         setup=lambda data: rankings.refresh()),
+    case('post', 'book:book-create-review', user='shopper',
+         args=lambda data: [data.book.id],
+         data=lambda data: {'value': 4, 'comment': 'Good.'}),
+    *attribute_cases('genre', 'genres'),
+    *attribute_cases('author', 'authors'),
+    *attribute_cases('language', 'languages'),
+    *attribute_cases('bookshelf', 'bookshelves'),
+    *attribute_cases('publisher', 'publishers'),
+    case('get', 'book:review-list'),
+    case('post', 'book:review-import-reviews', user='admin',
+         data=lambda data: [
+             {'user': data.shopper.id, 'book': data.book.id, 'value': 4},
+         ]),
+    case('patch', 'book:review-detail', user='review',
+         args=lambda data: [data.review.id],
+         data=lambda data: {'comment': 'Changed my mind.'}),
+    case('get', 'order:api-root', user='shopper'),
+    case('get', 'order:orderitem-list', user='shopper'),
+    case('get', 'order:orderitem-summary', user='shopper'),
+    case('patch', 'order:orderitem-detail', user='shopper',
+         args=lambda data: [data.orderitem.id],
+         data=lambda data: {'quantity': 2}),
+    case('get', 'order:likeditem-list', user='shopper'),
+    case('delete', 'order:likeditem-detail', user='shopper',
+         args=lambda data: [data.likeditem.id]),
+    case('post', 'user:create',
+         data=lambda data: {
+             'email': 'new@example.com',
+             'password': 'testpass123',
+             'name': 'New',
+         }),
+    case('post', 'user:token',
+         data=lambda data: {
+             'email': 'shopper@example.com',
+             'password': 'testpass123',
+         }),
+    case('get', 'user:me', user='shopper'),
+]
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test query counts of API endpoints."""
+    budget_file = os.path.join(os.path.dirname(__file__),
+                               'query_budgets.json')
+
+    def request(self, spec, data):
+        """Perform request described by spec against seeded data."""
+        client = APIClient()
+        if spec['user'] == 'review':
+            client.force_authenticate(data.review.user)
+        elif spec['user'] is not None:
+            client.force_authenticate(getattr(data, spec['user']))
+
+        url = reverse(spec['route'], args=spec['args'](data))
+        res = getattr(client, spec['method'])(
+            url, spec['data'](data), format='json'
+        )
+        self.assertLess(res.status_code, 300, f'{url}: {res.status_code}')
+
+    def test_every_route_has_a_case(self):
+        """Test budget suite covers every named API route."""
+        routes = set()
+        for urls in (book_urls, order_urls, user_urls):
+            routes |= route_names(urls)
+
+        self.assertEqual(routes - {spec['route'] for spec in CASES}, set())
+
+    def test_query_budgets(self):
+        """Test endpoints query counts are flat and within budget."""
+        for spec in CASES:
+            name = f'{spec["method"].upper()} {spec["route"]}'
+            with self.subTest(name):
+                self.assertQueryBudget(
+                    name,
+                    lambda data, spec=spec: self.request(spec, data),
+                    setup=spec['setup'],
+                )
@@ -0,0 +1,162 @@
+"""
+Tests for the reference cache.
+"""
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import references
+from core.models import Author, Book, Genre, Language
+
+BOOKS_URL = reverse('book:book-list')
+
+
+class ReferenceCacheTests(TestCase):
+    """Test caching reference rows in the process."""
+
+    def setUp(self):
+        cache.clear()
+        references.clear()
+        self.client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genres = [
+                Genre.objects.create(name=f'Genre {i}') for i in range(3)
+            ]
+            self.author = Author.objects.create(name='Author')
+        for i in range(3):
+            book = Book.objects.create(
+                title=f'Book {i}',
+                isbn13='978-3-16-148410-0',
+                publication_date=date(2022, 5, 7),
+                available_quantity=10,
+                price=Decimal('5.50'),
+            )
+            book.genres.add(self.genres[i], self.genres[(i + 1) % 3])
+            book.authors.add(self.author)
+
+    def tearDown(self):
+        references.clear()
+
+    def test_warm_list_reads_join_tables_once(self):
+        """Test attribute lists come from the cache once it is warm."""
+        cold = self.client.get(BOOKS_URL)
+
+        with self.assertNumQueries(2):
+            warm = self.client.get(BOOKS_URL)
+
+        self.assertEqual(warm.json(), cold.json())
+        self.assertEqual(
+            {genre['name'] for genre in warm.json()[0]['genres']},
+            {'Genre 2', 'Genre 0'},
+        )
+
+    def test_save_drops_cached_rows(self):
+        """Test renaming a reference row is seen by the next request."""
+        self.client.get(BOOKS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.genres[0].name = 'Renamed'
+            self.genres[0].save()
+        res = self.client.get(BOOKS_URL)
+
+        names = {
+            genre['name'] for book in res.json() for genre in book['genres']
+        }
+        self.assertIn('Renamed', names)
+        self.assertNotIn('Genre 0', names)
+
+    @override_settings(REFERENCE_CACHE_CHECK_INTERVAL=0)
+    def test_version_bump_drops_cached_rows(self):
+        """Test rows changed by another process are dropped."""
+        ids = [genre.id for genre in self.genres]
+        references._caches[Genre].get_many(ids)
+        Genre.objects.filter(id=ids[0]).update(name='Elsewhere')
+
+        references.invalidate(Genre)
+
+        with self.assertNumQueries(1):
+            rows = references._caches[Genre].get_many(ids)
+        self.assertEqual(rows[ids[0]].name, 'Elsewhere')
+
+    def test_rows_loaded_before_change_not_cached(self):
+        """Test rows read before a concurrent change are not cached."""
+        genres = references._caches[Genre]
+        ids = [genre.id for genre in self.genres]
+        queryset = Genre.objects.filter(id__in=ids)
+
+        def load(*args, **kwargs):
+            rows = list(queryset)
+            # Another thread commits a change while the rows are read.
+            references.invalidate(Genre)
+            return rows
+
+        with patch.object(Genre.objects, 'filter', side_effect=load):
+            genres.get_many(ids)
+
+        self.assertFalse(genres.rows)
+
+    @override_settings(REFERENCE_CACHE_TTL=60)
+    def test_rows_expire(self):
+        """Test rows are dropped REFERENCE_CACHE_TTL seconds after caching."""
+        genres = references._caches[Genre]
+        with patch('core.references.time.monotonic', return_value=1000):
+            genres.get_many([self.genres[0].id])
+        with patch('core.references.time.monotonic', return_value=1059):
+            self.assertTrue(genres.is_warm())
+
+        with patch('core.references.time.monotonic', return_value=1060):
+            self.assertFalse(genres.is_warm())
+        self.assertFalse(genres.rows)
+
+    def test_uncommitted_rows_not_cached(self):
+        """Test rows read after an uncommitted change are not kept."""
+        Language.objects.create(name='Latin')
+
+        languages = references._caches[Language]
+        languages.get_many([Language.objects.get().id])
+
+        self.assertFalse(languages.rows)
+
+    @override_settings(REFERENCE_CACHE_SIZE=2)
+    def test_least_recently_used_rows_dropped(self):
+        """Test the cache keeps at most REFERENCE_CACHE_SIZE rows."""
+        genres = references._caches[Genre]
+        genres.get_many([self.genres[0].id])
+        genres.get_many([self.genres[1].id])
+        genres.get_many([self.genres[0].id])
+        genres.get_many([self.genres[2].id])
+
+        self.assertEqual(
+            list(genres.rows), [self.genres[0].id, self.genres[2].id]
+        )
+
+    def test_resolve_cached(self):
+        """Test name lookups of existing rows hit the cache."""
+        first, = references.resolve(Genre, [{'name': 'Genre 1'}])
+
+        with self.assertNumQueries(0):
+            second, = references.resolve(Genre, [{'name': ' genre  1'}])
+
+        self.assertEqual(first, self.genres[1])
+        self.assertIs(second, first)
+
+    def test_resolve_inserts_missing(self):
+        """Test unknown names are inserted once, known ones kept."""
+        rows = references.resolve(Genre, [
+            {'name': 'GENRE 0', 'description': 'Ignored.'},
+            {'name': 'Poetry', 'description': 'Verse.'},
+            {'name': 'poetry'},
+        ])
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0], self.genres[0])
+        self.assertEqual(rows[0].description, '')
+        self.assertEqual(rows[1].name, 'Poetry')
+        self.assertEqual(rows[1].description, 'Verse.')
+        self.assertEqual(Genre.objects.filter(name_key='poetry').count(), 1)
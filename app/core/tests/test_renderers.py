@@ -0,0 +1,73 @@
+"""
+Tests for JSON renderer and parser.
+"""
+import io
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import FastJSONParser, FastJSONRenderer
+
+PAYLOAD = {
+    'price': Decimal('5.50'),
+    'created_at': datetime(2022, 5, 7, 10, 30, 1, 123456, tzinfo=timezone.utc),
+    'publication_date': date(2022, 5, 7),
+    'label': _('Important dates'),
+    'comment': 'line separator ąę',
+    'items': [{'id': 1}, {'id': 2}],
+    3: None,
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test FastJSONRenderer output."""
+
+    def test_render_matches_json_renderer(self):
+        """Test output is identical to JSONRenderer."""
+        expected = JSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(FastJSONRenderer().render(PAYLOAD), expected)
+
+    @patch('core.renderers.orjson', None)
+    def test_render_without_orjson(self):
+        """Test stdlib fallback output is identical to JSONRenderer."""
+        expected = JSONRenderer().render(PAYLOAD)
+
+        self.assertEqual(FastJSONRenderer().render(PAYLOAD), expected)
+
+    def test_render_indent(self):
+        """Test pretty printed output is left to JSONRenderer."""
+        media_type = 'application/json; indent=4'
+        expected = JSONRenderer().render(PAYLOAD, media_type)
+
+        self.assertEqual(
+            FastJSONRenderer().render(PAYLOAD, media_type),
+            expected
+        )
+
+    def test_render_none(self):
+        """Test None renders an empty body."""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test FastJSONParser."""
+
+    def test_parse(self):
+        """Test parsing a JSON body."""
+        stream = io.BytesIO('{"name": "Żeromski", "value": 4}'.encode())
+
+        data = FastJSONParser().parse(stream)
+
+        self.assertEqual(data, {'name': 'Żeromski', 'value': 4})
+
+    def test_parse_error(self):
+        """Test invalid JSON raises ParseError."""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(io.BytesIO(b'{"name": '))
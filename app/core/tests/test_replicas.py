@@ -0,0 +1,130 @@
+"""
+Tests for read replica routing.
+"""
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import metrics, replicas
+from core.models import Book
+
+BOOKS_URL = reverse('book:book-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'], REPLICA_MAX_LAG=10)
+class ReplicaRouterTests(TestCase):
+    """Test choosing databases for reads and writes."""
+
+    def setUp(self):
+        replicas._checked.clear()
+        self.router = replicas.ReplicaRouter()
+
+    def tearDown(self):
+        replicas._checked.clear()
+
+    @patch('core.replicas.replica_lag', return_value=0.5)
+    def test_reads_from_replica(self, replica_lag):
+        """Test reads go to a replica only while use_replica is active."""
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(Book), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Book), 'default')
+
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+        self.assertEqual(
+            metrics.REPLICA_LAG._values[('replica_1',)], 0.5
+        )
+
+    @override_settings(REPLICA_LAG_CHECK_INTERVAL=60)
+    @patch('core.replicas.replica_lag', return_value=0.5)
+    def test_lag_checked_periodically(self, replica_lag):
+        """Test replica lag is not checked on every read."""
+        with replicas.use_replica():
+            self.router.db_for_read(Book)
+            self.router.db_for_read(Book)
+
+        replica_lag.assert_called_once_with('replica_1')
+
+    @patch('core.replicas.replica_lag', return_value=60)
+    def test_lagging_replica_skipped(self, replica_lag):
+        """Test replicas too far behind are not read from."""
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    @patch('core.replicas.replica_lag', side_effect=DatabaseError)
+    def test_unavailable_replica_skipped(self, replica_lag):
+        """Test replicas that cannot be reached are not read from."""
+        with replicas.use_replica():
+            self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run on the primary."""
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+@patch('core.replicas.available_replicas', return_value=['default'])
+class ReplicaReadTests(TestCase):
+    """Test which API requests are served from replicas."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.book = Book.objects.create(
+            title='Sample book title',
+            isbn13='978-3-16-148410-0',
+            publication_date=date(2022, 5, 7),
+            available_quantity=100,
+            price=Decimal('5.50'),
+        )
+
+    def test_reads_served_from_replica(self, available_replicas):
+        """Test read-only actions are served from replicas."""
+        self.client.get(BOOKS_URL)
+
+        available_replicas.assert_called()
+
+    def test_writes_served_from_primary(self, available_replicas):
+        """Test writing actions never read from replicas."""
+        self.client.force_authenticate(self.user)
+        url = reverse('book:book-create-review', args=[self.book.id])
+
+        self.client.post(url, {'value': 4, 'comment': 'Good.'})
+
+        available_replicas.assert_not_called()
+
+    def test_reads_sticky_after_write(self, available_replicas):
+        """Test users read from the primary right after writing."""
+        self.client.force_authenticate(self.user)
+        url = reverse('book:book-create-review', args=[self.book.id])
+        self.client.post(url, {'value': 4, 'comment': 'Good.'})
+
+        self.client.get(BOOKS_URL)
+        available_replicas.assert_not_called()
+
+        cache.clear()
+        self.client.get(BOOKS_URL)
+        available_replicas.assert_called()
+
+    def test_replica_left_after_unhandled_error(self, available_replicas):
+        """Test an error raised by a replica action ends replica reads."""
+        with patch(
+            'book.views.BookViewSet.list', side_effect=RuntimeError('boom')
+        ), self.assertRaises(RuntimeError):
+            self.client.get(BOOKS_URL)
+
+        self.assertFalse(getattr(replicas._state, 'replica', False))
@@ -0,0 +1,114 @@
+"""
+Tests for shared serializer helpers.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Author, Book, Genre, Publisher, Review
+from core.serializers import parse_field_paths
+from book.serializers import (
+    BookDetailSerializer,
+    BookSerializer,
+    ReviewDetailSerializer,
+)
+
+
+def create_book(**params):
+    """Create and return a sample book."""
+    defaults = {
+        'title': 'Sample book title',
+        'isbn13': '978-3-16-148410-0',
+        'publication_date': date(2022, 5, 7),
+        'available_quantity': 25,
+        'price': Decimal('5.50'),
+        'description': 'Sample Book description'
+    }
+    defaults.update(params)
+    return Book.objects.create(**defaults)
+
+
+def request_context(**params):
+    """Return serializer context with a GET request carrying params."""
+    request = APIRequestFactory().get('/', params)
+    return {'request': Request(request)}
+
+
+class ParseFieldPathsTests(TestCase):
+    """Test parsing of dotted field lists."""
+
+    def test_parse_field_paths(self):
+        """Test nested paths are merged into one tree."""
+        tree = parse_field_paths('id, book.title,book.price,,')
+
+        self.assertEqual(tree, {
+            'id': {},
+            'book': {'title': {}, 'price': {}},
+        })
+
+
+class CompiledListSerializerTests(TestCase):
+    """Test compiled list rendering matches DRF rendering."""
+
+    def setUp(self):
+        genre = Genre.objects.create(name='Fiction', description='Made up')
+        author = Author.objects.create(name='Author')
+        publisher = Publisher.objects.create(name='Publisher')
+        user = get_user_model().objects.create_user('test@example.com')
+        for i in range(3):
+            book = create_book(
+                title=f'Book {i}',
+                price=Decimal('1.10') * (i + 1),
+                publication_date=None if i else date(2022, 5, 7),
+            )
+            book.genres.add(genre)
+            book.authors.add(author)
+            book.publishers.add(publisher)
+            Review.objects.create(user=user, book=book, value=i, comment='')
+
+    def assertSameJSON(self, serializer_class, queryset, context=None):
+        """Assert compiled and DRF list rendering give the same bytes."""
+        context = context or {}
+        compiled = serializer_class(queryset, many=True, context=context)
+        stock = serializers.ListSerializer(
+            queryset,
+            child=serializer_class(context=context),
+            context=context,
+        )
+        renderer = JSONRenderer()
+
+        self.assertEqual(
+            renderer.render(compiled.data),
+            renderer.render(stock.data)
+        )
+
+    def test_books_render_same_json(self):
+        """Test book list renders identical JSON."""
+        books = Book.objects.order_by('id')
+
+        self.assertSameJSON(BookSerializer, books)
+        self.assertSameJSON(BookDetailSerializer, books)
+
+    def test_sparse_books_render_same_json(self):
+        """Test pruned book list renders identical JSON."""
+        context = request_context(fields='id,price,genres.name')
+
+        self.assertSameJSON(BookSerializer, Book.objects.all(), context)
+
+    def test_reviews_render_same_json(self):
+        """Test review list renders identical JSON."""
+        reviews = Review.objects.order_by('id')
+
+        self.assertSameJSON(ReviewDetailSerializer, reviews)
+        self.assertSameJSON(
+            ReviewDetailSerializer,
+            reviews,
+            request_context(expand='book')
+        )
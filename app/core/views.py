@@ -0,0 +1,63 @@
+"""
+Views for service endpoints.
+"""
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core import metrics, profiling
+from core.authentication import TokenAuthentication
+
+
+def metrics_allowed(request):
+    """Return whether request may read metrics."""
+    if settings.METRICS_TOKEN and constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return True
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    return request.user.is_staff
+
+
+def metrics_view(request):
+    """Expose metrics in the Prometheus text format."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.REGISTRY.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAdminUser])
+def profiles_view(request):
+    """List slow-request profiles kept by this process."""
+    return Response([
+        {key: value for key, value in profile.items() if key != 'stacks'}
+        for profile in profiling.PROFILES.all()
+    ])
+
+
+@api_view(['GET'])
+@authentication_classes([TokenAuthentication, SessionAuthentication])
+@permission_classes([IsAdminUser])
+def profile_view(request, profile_id):
+    """Return a profile as collapsed stacks for flame graph tools."""
+    profile = profiling.PROFILES.get(str(profile_id))
+    if profile is None:
+        raise Http404
+    return HttpResponse(
+        profiling.collapsed(profile),
+        content_type='text/plain; charset=utf-8',
+    )
@@ -0,0 +1,206 @@
+"""
+Claiming and running background jobs.
+
+Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any
+number of worker processes on any number of hosts can share one
+database without running a job twice. While a job runs its worker renews
+the lease every JOBS_HEARTBEAT_INTERVAL seconds. A job whose worker died
+is claimed again once its lease was not renewed for JOBS_TIMEOUT
+seconds, or marked failed when it has no attempts left, so a job
+crashing its workers is not retried forever.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import metrics
+from core.models import Job
+from job.tasks import TASKS
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name(index=0):
+    """Return name identifying a worker process across hosts."""
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def backoff(attempts):
+    """Return delay before retrying a job that failed attempts times."""
+    delay = min(
+        settings.JOBS_BACKOFF_BASE * 2 ** (attempts - 1),
+        settings.JOBS_BACKOFF_MAX,
+    )
+    # Jitter spreads retries of jobs that failed together.
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def fail_lost(now):
+    """Mark jobs whose worker was lost on their last attempt as failed."""
+    stale = now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    lost = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=stale,
+        attempts__gte=F('max_attempts'),
+    )
+    failed = lost.update(
+        status=Job.FAILED,
+        last_error=f'Worker lost for over {settings.JOBS_TIMEOUT} seconds.',
+        finished_at=now,
+        locked_by='',
+        locked_at=None,
+    )
+    if failed:
+        logger.error('%s jobs failed for good with their workers', failed)
+    return failed
+
+
+def claim(worker, limit=1):
+    """Mark up to limit due jobs as running by worker and return them."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_TIMEOUT)
+    with transaction.atomic():
+        fail_lost(now)
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=Job.QUEUED, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_at__lt=stale,
+                    attempts__lt=F('max_attempts'))
+            )
+            .order_by('run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+class Lease:
+    """Renew the lease of a running job from a background thread.
+
+    Jobs running longer than JOBS_TIMEOUT are not taken over by other
+    workers as long as the lease keeps being renewed.
+    """
+
+    def __init__(self, job, interval=None):
+        self.job = job
+        self.interval = interval or settings.JOBS_HEARTBEAT_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    def renew(self):
+        """Move locked_at of the job to now, return False if it was lost."""
+        return bool(
+            Job.objects.filter(id=self.job.id, locked_by=self.job.locked_by)
+            .update(locked_at=timezone.now())
+        )
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    if not self.renew():
+                        logger.warning('Job %s was taken over', self.job)
+                        return
+                except DatabaseError:
+                    logger.exception('Renewing lease of %s failed', self.job)
+                    connection.close()
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f'job-lease-{self.job.id}',
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def execute(job):
+    """Run a claimed job and record its outcome."""
+    start = time.perf_counter()
+    try:
+        func = TASKS[job.name]
+        with Lease(job):
+            result = func(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error('Job %s failed for good', job)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+            logger.warning('Job %s failed, retrying at %s', job, job.run_at)
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.finished_at = timezone.now()
+    metrics.JOBS_RUN.inc(name=job.name, status=job.status)
+    metrics.JOB_DURATION.observe(time.perf_counter() - start, name=job.name)
+
+    # Only the worker holding the job may record the outcome, a job taken
+    # over after JOBS_TIMEOUT belongs to its new worker.
+    Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+        status=job.status,
+        result=job.result,
+        last_error=job.last_error,
+        run_at=job.run_at,
+        finished_at=job.finished_at,
+        locked_by='',
+        locked_at=None,
+    )
+    return job
+
+
+def work(worker, poll_interval=None, burst=False, stop=None):
+    """Claim and run jobs until stop is set, or the queue is empty.
+
+    stop is a threading or multiprocessing Event. With burst the worker
+    returns once no job is due. Returns the number of jobs run.
+    """
+    poll_interval = poll_interval or settings.JOBS_POLL_INTERVAL
+    count = 0
+    while stop is None or not stop.is_set():
+        try:
+            jobs = claim(worker)
+        except DatabaseError:
+            # Keep the worker alive through database restarts.
+            logger.exception('Claiming jobs failed')
+            connection.close()
+            jobs = []
+        if not jobs:
+            if burst:
+                break
+            if stop is None:
+                time.sleep(poll_interval)
+            else:
+                stop.wait(poll_interval)
+            continue
+        for job in jobs:
+            execute(job)
+            count += 1
+        metrics.REGISTRY.flush()
+    return count
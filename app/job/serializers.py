@@ -0,0 +1,40 @@
+"""
+Serializers for job APIs.
+"""
+from rest_framework import serializers
+
+from core.models import Job
+from job.tasks import TASKS, check_payload
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs."""
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'payload', 'status', 'attempts', 'max_attempts',
+            'run_at', 'locked_by', 'locked_at', 'result', 'last_error',
+            'created_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'id', 'status', 'attempts', 'locked_by', 'locked_at', 'result',
+            'last_error', 'created_at', 'finished_at',
+        ]
+        extra_kwargs = {'run_at': {'required': False}}
+
+    def validate_name(self, value):
+        """Check the job runs a registered task."""
+        if value not in TASKS:
+            raise serializers.ValidationError(f'Unknown task {value!r}.')
+        return value
+
+    def validate(self, attrs):
+        """Check the payload matches the parameters of the task."""
+        name = attrs.get('name', getattr(self.instance, 'name', None))
+        payload = attrs.get('payload', {})
+        try:
+            check_payload(name, payload)
+        except TypeError as exc:
+            raise serializers.ValidationError({'payload': [str(exc)]})
+        return attrs
@@ -0,0 +1,82 @@
+"""
+Registry of tasks that background jobs can run.
+"""
+import inspect
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from book import rankings
+from core.models import (
+    Book,
+    Job,
+    OrderItem,
+    recompute_ratings,
+    recompute_review_stats,
+)
+
+TASKS = {}
+
+
+def task(name):
+    """Register the decorated function as task name.
+
+    Tasks are called with the job payload as keyword arguments and
+    should be safe to run again, as failed jobs are retried.
+    """
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def check_payload(name, payload):
+    """Raise TypeError if task name cannot be called with payload."""
+    if not isinstance(payload, dict):
+        raise TypeError('Payload must be an object.')
+    try:
+        inspect.signature(TASKS[name]).bind(**payload)
+    except TypeError as exc:
+        raise TypeError(f'Invalid payload for task {name!r}: {exc}.')
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """Create and return a queued job running task name."""
+    if name not in TASKS:
+        raise KeyError(f'Unknown task {name!r}')
+    payload = payload or {}
+    check_payload(name, payload)
+    job = Job(name=name, payload=payload)
+    if run_at is not None:
+        job.run_at = run_at
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+@task('expire_carts')
+def expire_carts(ttl=None, batch_size=5000):
+    """Release stock reserved by cart items older than ttl minutes."""
+    ttl = settings.CART_RESERVATION_TTL_MINUTES if ttl is None else ttl
+    cutoff = timezone.now() - timedelta(minutes=ttl)
+    return {'released': OrderItem.objects.release_stale(cutoff, batch_size)}
+
+
+@task('recompute_ratings')
+def reconcile_ratings(book_ids=None, batch_size=1000):
+    """Recompute ratings and review statistics of book_ids, or all."""
+    if book_ids is None:
+        book_ids = Book.objects.order_by('id').values_list('id', flat=True)
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), batch_size):
+        recompute_ratings(book_ids[start:start + batch_size])
+        recompute_review_stats(book_ids[start:start + batch_size])
+    return {'books': len(book_ids)}
+
+
+@task('refresh_rankings')
+def refresh_rankings(kinds=None, size=None):
+    """Recompute book popularity rankings."""
+    return {'rankings': rankings.refresh(kinds, size)}
@@ -0,0 +1,118 @@
+"""
+Tests for the jobs API.
+"""
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Job
+
+JOBS_URL = reverse('job:job-list')
+
+
+def detail_url(job_id):
+    return reverse('job:job-detail', args=[job_id])
+
+
+def retry_url(job_id):
+    return reverse('job:job-retry', args=[job_id])
+
+
+class PublicJobsApiTests(TestCase):
+    """Test jobs API for non admin users."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_jobs_require_admin(self):
+        """Test regular users can not see or queue jobs."""
+        res = self.client.get(JOBS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(user)
+        res = self.client.post(JOBS_URL, {'name': 'expire_carts'})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Job.objects.exists())
+
+
+class PrivateJobsApiTests(TestCase):
+    """Test jobs API for admin users."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_job(self):
+        """Test queueing a job."""
+        payload = {'name': 'recompute_ratings', 'payload': {'book_ids': [1]}}
+
+        res = self.client.post(JOBS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        job = Job.objects.get(id=res.data['id'])
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.payload, {'book_ids': [1]})
+
+    def test_create_unknown_task_fails(self):
+        """Test jobs must run a registered task."""
+        res = self.client.post(JOBS_URL, {'name': 'rm_rf'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_create_invalid_payload_fails(self):
+        """Test job payloads must match the parameters of the task."""
+        payload = {'name': 'recompute_ratings', 'payload': {'books': [1]}}
+
+        res = self.client.post(JOBS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('payload', res.data)
+        self.assertFalse(Job.objects.exists())
+
+    def test_list_jobs_by_status(self):
+        """Test listing jobs filtered by status."""
+        Job.objects.create(name='expire_carts')
+        failed = Job.objects.create(name='expire_carts', status=Job.FAILED)
+
+        res = self.client.get(JOBS_URL, {'status': Job.FAILED})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([job['id'] for job in res.data], [failed.id])
+
+    def test_retrieve_job(self):
+        """Test getting the status of a job."""
+        job = Job.objects.create(name='expire_carts', attempts=2)
+
+        res = self.client.get(detail_url(job.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['status'], Job.QUEUED)
+        self.assertEqual(res.data['attempts'], 2)
+
+    def test_retry_failed_job(self):
+        """Test failed jobs can be queued again, others can not."""
+        failed = Job.objects.create(
+            name='expire_carts', status=Job.FAILED, attempts=5
+        )
+        running = Job.objects.create(name='expire_carts', status=Job.RUNNING)
+
+        res = self.client.post(retry_url(failed.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, Job.QUEUED)
+        self.assertEqual(failed.attempts, 0)
+
+        res = self.client.post(retry_url(running.id))
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
@@ -0,0 +1,181 @@
+"""
+Tests for claiming and running background jobs.
+"""
+from datetime import timedelta
+from io import StringIO
+import time
+from unittest.mock import Mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import Job
+from job import runner
+from job.tasks import TASKS, enqueue
+
+
+@override_settings(JOBS_BACKOFF_BASE=10, JOBS_BACKOFF_MAX=60,
+                   JOBS_TIMEOUT=600)
+class RunnerTests(TestCase):
+    """Test job runner."""
+
+    def setUp(self):
+        self.task = Mock(return_value={'ok': True})
+        TASKS['test_task'] = self.task
+        self.addCleanup(TASKS.pop, 'test_task')
+
+    def test_claim_due_jobs_once(self):
+        """Test due jobs are claimed once, oldest first."""
+        later = enqueue(
+            'test_task', run_at=timezone.now() + timedelta(hours=1)
+        )
+        first = enqueue('test_task')
+        second = enqueue('test_task')
+
+        claimed = runner.claim('worker-1', limit=5)
+
+        self.assertEqual([job.id for job in claimed], [first.id, second.id])
+        self.assertEqual(claimed[0].status, Job.RUNNING)
+        self.assertEqual(claimed[0].locked_by, 'worker-1')
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(runner.claim('worker-2', limit=5), [])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_reclaim_job_of_lost_worker(self):
+        """Test jobs running past JOBS_TIMEOUT are claimed again."""
+        job = enqueue('test_task')
+        runner.claim('worker-1')
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(minutes=11)
+        )
+
+        claimed, = runner.claim('worker-2')
+
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.locked_by, 'worker-2')
+        self.assertEqual(claimed.attempts, 2)
+
+    def test_lost_job_out_of_attempts_fails(self):
+        """Test jobs of lost workers fail when out of attempts."""
+        job = enqueue('test_task', max_attempts=1)
+        runner.claim('worker-1')
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(minutes=11)
+        )
+
+        self.assertEqual(runner.claim('worker-2'), [])
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn('Worker lost', job.last_error)
+
+    def test_execute_success(self):
+        """Test successful jobs store their result."""
+        enqueue('test_task', payload={'book_ids': [1, 2]})
+        job, = runner.claim('worker-1')
+
+        runner.execute(job)
+
+        self.task.assert_called_once_with(book_ids=[1, 2])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result, {'ok': True})
+        self.assertEqual(job.locked_by, '')
+        self.assertIsNotNone(job.finished_at)
+
+    def test_execute_failure_retries_with_backoff(self):
+        """Test failed jobs are queued again later until out of attempts."""
+        self.task.side_effect = ValueError('boom')
+        enqueue('test_task', max_attempts=2)
+
+        job, = runner.claim('worker-1')
+        before = timezone.now()
+        runner.execute(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertLessEqual(
+            job.run_at, timezone.now() + timedelta(seconds=10)
+        )
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        job, = runner.claim('worker-1')
+        runner.execute(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_backoff_doubles_up_to_max(self):
+        """Test retry delays grow exponentially and are capped."""
+        for attempts, low, high in ((1, 5, 10), (3, 20, 40), (9, 30, 60)):
+            delay = runner.backoff(attempts).total_seconds()
+            self.assertGreaterEqual(delay, low)
+            self.assertLessEqual(delay, high)
+
+    def test_enqueue_invalid_payload_fails(self):
+        """Test jobs are not queued with arguments the task does not take."""
+        with self.assertRaises(TypeError):
+            enqueue('expire_carts', payload={'minutes': 5})
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_lost_job_outcome_is_not_recorded(self):
+        """Test a worker whose job was taken over does not overwrite it."""
+        enqueue('test_task')
+        job, = runner.claim('worker-1')
+        Job.objects.filter(id=job.id).update(locked_by='worker-2')
+
+        runner.execute(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.locked_by, 'worker-2')
+
+    def test_run_workers_burst(self):
+        """Test run_workers runs every due job and exits when burst."""
+        for _ in range(3):
+            enqueue('test_task')
+        out = StringIO()
+
+        call_command('run_workers', burst=True, stdout=out)
+
+        self.assertEqual(self.task.call_count, 3)
+        self.assertEqual(
+            Job.objects.filter(status=Job.SUCCEEDED).count(), 3
+        )
+        self.assertIn('Ran 3 jobs.', out.getvalue())
+
+
+@override_settings(JOBS_HEARTBEAT_INTERVAL=0.05)
+class LeaseTests(TransactionTestCase):
+    """Test leases of running jobs are renewed."""
+
+    def setUp(self):
+        self.seen = []
+        TASKS['slow_task'] = self.slow_task
+        self.addCleanup(TASKS.pop, 'slow_task')
+
+    def slow_task(self):
+        """Record locked_at of the running job after a while."""
+        time.sleep(0.3)
+        self.seen.append(Job.objects.get().locked_at)
+
+    def test_lease_renewed_while_running(self):
+        """Test long jobs are not taken for lost by other workers."""
+        enqueue('slow_task')
+        job, = runner.claim('worker-1')
+
+        runner.execute(job)
+
+        self.assertGreater(self.seen[0], job.locked_at)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertIsNone(job.locked_at)
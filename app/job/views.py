@@ -0,0 +1,50 @@
+"""
+Views for the job APIs.
+"""
+from django.utils import timezone
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core.authentication import TokenAuthentication
+from core.models import Job
+from job import serializers
+
+
+class JobViewSet(mixins.CreateModelMixin,
+                 mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Queue background jobs and follow their status."""
+    serializer_class = serializers.JobSerializer
+    queryset = Job.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        """Return jobs, newest first, filtered by ?status= and ?name=."""
+        queryset = self.queryset.order_by('-id')
+        for field in ('status', 'name'):
+            value = self.request.query_params.get(field)
+            if value:
+                queryset = queryset.filter(**{field: value})
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """Queue a failed job to run again now."""
+        job = self.get_object()
+        if job.status != Job.FAILED:
+            return Response(
+                {'detail': 'Only failed jobs can be retried.'},
+                status.HTTP_409_CONFLICT,
+            )
+        job.status = Job.QUEUED
+        job.attempts = 0
+        job.run_at = timezone.now()
+        job.finished_at = None
+        job.save(update_fields=[
+            'status', 'attempts', 'run_at', 'finished_at'
+        ])
+        return Response(self.get_serializer(job).data)
@@ -2,12 +2,13 @@
 Serializers for order APIs
 """
 from rest_framework import serializers
+from core.serializers import CompiledListSerializer, DynamicFieldsMixin
 from core.models import (
     OrderItem,
     LikedItem
 )
 
-from book.serializers import BookSerializer
+from book.serializers import BookSerializer, BookSummarySerializer
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -19,15 +20,36 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class OrderItemDetailSerializer(serializers.ModelSerializer):
-    """Serializer for book orderitems."""
+class OrderItemDetailSerializer(DynamicFieldsMixin,
+                                serializers.ModelSerializer):
+    """Serializer for book orderitems with full books."""
 
-    book = BookSerializer(many=False, required=True)
+    book = BookSerializer(many=False, read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ['id', 'book', 'quantity']
         read_only_fields = ['id', 'book']
+        list_serializer_class = CompiledListSerializer
+
+
+class OrderItemSlimSerializer(OrderItemDetailSerializer):
+    """Serializer for book orderitems, ?expand=book renders full book."""
+
+    book = BookSummarySerializer(many=False, read_only=True)
+
+    expandable_fields = {'book': BookSerializer}
+
+
+class CartSummarySerializer(serializers.Serializer):
+    """Serializer for shopping cart totals."""
+    item_count = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.IntegerField(read_only=True)
+    total_price = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        read_only=True
+    )
 
 
 class LikedItemSerializer(serializers.ModelSerializer):
@@ -39,12 +61,22 @@ class LikedItemSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class LikedItemDetailSerializer(serializers.ModelSerializer):
-    """Serializer for book likeditems."""
+class LikedItemDetailSerializer(DynamicFieldsMixin,
+                                serializers.ModelSerializer):
+    """Serializer for book likeditems with full books."""
 
-    book = BookSerializer(many=False, required=True)
+    book = BookSerializer(many=False, read_only=True)
 
     class Meta:
         model = LikedItem
         fields = ['id', 'book']
         read_only_fields = ['id', 'book']
+        list_serializer_class = CompiledListSerializer
+
+
+class LikedItemSlimSerializer(LikedItemDetailSerializer):
+    """Serializer for book likeditems, ?expand=book renders full book."""
+
+    book = BookSummarySerializer(many=False, read_only=True)
+
+    expandable_fields = {'book': BookSerializer}
@@ -11,7 +11,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import LikedItem, Book
+from core.models import LikedItem, Book, Author, Genre
 
 from order.serializers import LikedItemDetailSerializer
 
@@ -114,3 +114,78 @@ class PrivateLikedItemsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         likeditems = LikedItem.objects.all()
         self.assertFalse(likeditems.exists())
+
+    def _like_books(self, count):
+        """Like count books, each with an author and a genre."""
+        genre = Genre.objects.create(name='Fiction')
+        for i in range(count):
+            book = sample_book(title=f'Book {i}')
+            book.authors.add(Author.objects.create(name=f'Author {i}'))
+            book.genres.add(genre)
+            LikedItem.objects.create(user=self.user, book=book)
+
+    def test_retrieve_likeditems_full_book(self):
+        """Test liked list renders full books by default."""
+        self._like_books(1)
+
+        res = self.client.get(LIKEDITEM_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['book']['genres'][0]['name'], 'Fiction')
+        self.assertEqual(len(res.data[0]['book']['authors']), 1)
+
+    def test_retrieve_likeditems_slim(self):
+        """Test ?slim=true renders compact books."""
+        book = sample_book()
+        book.authors.add(Author.objects.create(name='Second'))
+        book.authors.add(Author.objects.create(name='First'))
+        first = book.authors.order_by('id').first()
+        LikedItem.objects.create(user=self.user, book=book)
+
+        res = self.client.get(LIKEDITEM_URL, {'slim': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(res.data[0]['book']),
+            {'id', 'title', 'price', 'rating', 'author'}
+        )
+        self.assertEqual(res.data[0]['book']['author'], first.name)
+
+    def test_retrieve_likeditems_expand_book(self):
+        """Test ?expand=book renders the full book in slim lists."""
+        self._like_books(1)
+
+        res = self.client.get(
+            LIKEDITEM_URL, {'slim': 'true', 'expand': 'book'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['book']['genres'][0]['name'], 'Fiction')
+        self.assertEqual(len(res.data[0]['book']['authors']), 1)
+
+    def test_retrieve_likeditems_sparse_fields(self):
+        """Test ?fields= limits top level and nested fields."""
+        self._like_books(1)
+
+        res = self.client.get(LIKEDITEM_URL, {'fields': 'id,book.title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(res.data[0]), {'id', 'book'})
+        self.assertEqual(res.data[0]['book'], {'title': 'Book 0'})
+
+    def test_retrieve_likeditems_query_count(self):
+        """Test liked list query count does not grow with list size."""
+        self._like_books(10)
+
+        with self.assertNumQueries(6):
+            res = self.client.get(LIKEDITEM_URL)
+        self.assertEqual(len(res.data), 10)
+
+        with self.assertNumQueries(2):
+            self.client.get(LIKEDITEM_URL, {'slim': 'true'})
+
+        with self.assertNumQueries(6):
+            self.client.get(LIKEDITEM_URL, {'slim': 'true', 'expand': 'book'})
+
+        with self.assertNumQueries(1):
+            self.client.get(LIKEDITEM_URL, {'fields': 'id,book.title'})
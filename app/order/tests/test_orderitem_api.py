@@ -16,6 +16,7 @@ from core.models import OrderItem, Book
 from order.serializers import OrderItemDetailSerializer
 
 ORDERITEM_URL = reverse('order:orderitem-list')
+SUMMARY_URL = reverse('order:orderitem-summary')
 
 
 def detail_url(orderitem_id):
@@ -170,6 +171,24 @@ class PrivateOrderItemsApiTests(TestCase):
             old_quantity-payload['quantity']
         )
 
+    def test_orderitem_out_of_stock(self):
+        """Test adding more copies than available is a conflict."""
+        user = sample_user()
+        self.client.force_authenticate(user)
+        book = sample_book(available_quantity=1)
+        payload = {
+            'book': book.id,
+            'quantity': 2
+        }
+
+        res = self.client.post(ORDERITEM_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['detail'].code, 'out_of_stock')
+        self.assertFalse(OrderItem.objects.exists())
+        book.refresh_from_db()
+        self.assertEqual(book.available_quantity, 1)
+
     def test_orderitem_delete_book_quantity(self):
         """Test deleting a orderitems with book quantity recalculation."""
         user = sample_user()
@@ -191,3 +210,57 @@ class PrivateOrderItemsApiTests(TestCase):
 
         book.refresh_from_db()
         self.assertEqual(book.available_quantity, old_quantity)
+
+    def test_cart_summary(self):
+        """Test cart totals are computed in one query."""
+        user = sample_user()
+        book1 = sample_book(price=Decimal('5.50'))
+        book2 = sample_book(title='Second book', price=Decimal('10.25'))
+        self.client.force_authenticate(user)
+
+        OrderItem.objects.create(user=user, book=book1, quantity=2)
+        OrderItem.objects.create(user=user, book=book2, quantity=1)
+        OrderItem.objects.create(user=self.user, book=book2, quantity=4)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['item_count'], 2)
+        self.assertEqual(res.data['total_quantity'], 3)
+        self.assertEqual(res.data['total_price'], '21.25')
+
+    def test_cart_summary_empty(self):
+        """Test cart totals for an empty cart."""
+        res = self.client.get(SUMMARY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['item_count'], 0)
+        self.assertEqual(res.data['total_quantity'], 0)
+        self.assertEqual(res.data['total_price'], '0.00')
+
+    def test_retrieve_orderitems_slim(self):
+        """Test slim list of orderitems skips book attribute lists."""
+        book = sample_book()
+        OrderItem.objects.create(user=self.user, book=book, quantity=2)
+
+        res = self.client.get(ORDERITEM_URL, {'slim': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['book']['id'], book.id)
+        self.assertEqual(res.data[0]['book']['price'], '5.50')
+        self.assertNotIn('genres', res.data[0]['book'])
+
+    def test_retrieve_orderitems_expand_book(self):
+        """Test ?expand=book renders book attribute lists in slim lists."""
+        book = sample_book()
+        OrderItem.objects.create(user=self.user, book=book, quantity=2)
+
+        res = self.client.get(
+            ORDERITEM_URL, {'slim': 'true', 'expand': 'book'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['book']['genres'], [])
+        self.assertEqual(res.data[0]['quantity'], 2)
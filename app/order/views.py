@@ -2,18 +2,35 @@
 Views for the order APIs.
 """
 
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+
 from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
 from core.models import (
     OrderItem,
     LikedItem
 )
+from core.authentication import TokenAuthentication
+from core.replicas import ReplicaReadMixin
+from core.serializers import optimize_queryset
 from order import serializers
 
 
-class BaseOrderAttrViewSet(mixins.DestroyModelMixin,
+def is_slim(request):
+    """Return True if client asked for list items with compact books."""
+    slim = request.query_params.get('slim', '')
+    return slim.lower() in ('1', 'true', 'yes')
+
+
+class BaseOrderAttrViewSet(ReplicaReadMixin,
+                           mixins.DestroyModelMixin,
                            mixins.UpdateModelMixin,
                            mixins.ListModelMixin,
                            mixins.CreateModelMixin,
@@ -21,30 +38,63 @@ class BaseOrderAttrViewSet(mixins.DestroyModelMixin,
     """Base ViewSet for order attributes."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list',)
 
     def get_queryset(self):
         """Return query filtered by id."""
-        return self.queryset.filter(user=self.request.user) \
+        queryset = self.queryset.filter(user=self.request.user) \
             .order_by('-book__title')
+        return optimize_queryset(queryset, self.get_serializer())
 
 
 class CartViewSet(BaseOrderAttrViewSet):
     """Manage orderitems in database."""
     serializer_class = serializers.OrderItemSerializer
     queryset = OrderItem.objects.all()
+    replica_actions = ('list', 'summary')
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        """Add item to cart, reserving stock in the same transaction."""
+        # An out of stock book fails the reservation with a constraint
+        # violation, roll back to here so the request can still respond.
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
         if self.action == 'list':
+            if is_slim(self.request):
+                return serializers.OrderItemSlimSerializer
             return serializers.OrderItemDetailSerializer
+        elif self.action == 'summary':
+            return serializers.CartSummarySerializer
 
         return self.serializer_class
 
-
-class LikedCartViewSet(mixins.DestroyModelMixin,
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Return cart totals computed in a single aggregate query."""
+        totals = OrderItem.objects.filter(user=request.user).aggregate(
+            item_count=Count('id'),
+            total_quantity=Coalesce(Sum('quantity'), 0),
+            total_price=Coalesce(
+                Sum(
+                    F('quantity') * F('book__price'),
+                    output_field=DecimalField(
+                        max_digits=12,
+                        decimal_places=2
+                    )
+                ),
+                Decimal('0.00'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+        serializer = self.get_serializer(totals)
+        return Response(serializer.data)
+
+
+class LikedCartViewSet(ReplicaReadMixin,
+                       mixins.DestroyModelMixin,
                        mixins.ListModelMixin,
                        mixins.CreateModelMixin,
                        viewsets.GenericViewSet):
@@ -53,11 +103,13 @@ class LikedCartViewSet(mixins.DestroyModelMixin,
     queryset = LikedItem.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    replica_actions = ('list',)
 
     def get_queryset(self):
         """Return query filtered by id."""
-        return self.queryset.filter(user=self.request.user) \
+        queryset = self.queryset.filter(user=self.request.user) \
             .order_by('-book__title')
+        return optimize_queryset(queryset, self.get_serializer())
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -65,6 +117,8 @@ class LikedCartViewSet(mixins.DestroyModelMixin,
     def get_serializer_class(self):
         """Return the serializer class for request."""
         if self.action == 'list':
+            if is_slim(self.request):
+                return serializers.LikedItemSlimSerializer
             return serializers.LikedItemDetailSerializer
 
         return self.serializer_class